@@ -2,10 +2,8 @@ import os
 import sys
 from pathlib import Path
 import logging
-from collections import defaultdict, namedtuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict, namedtuple, Counter
 import time
-from functools import lru_cache
 
 # 配置日志
 logging.basicConfig(
@@ -22,14 +20,22 @@ add_path = str(Path(__file__).parent.parent)
 sys.path.append(add_path)
 os.chdir(add_path)
 
-from utils.es import search_documents
+from utils.es import search_documents, msearch_documents
 from utils.mysql_util import chinascope_search, wind_search
-from utils.mongo import search_company_data, insert_data, upsert_data
+from utils.mongo import find_company_data_batch, bulk_write_data, ensure_unique_index
+from pymongo import UpdateOne
 from tqdm import tqdm
 
 # 数据结构优化：使用namedtuple提高性能
 CompanyInfo = namedtuple('CompanyInfo', ['tar_name', 'abbr', 'subs_orig'])
 BaseInfo = namedtuple('BaseInfo', ['stock_code', 'zh_company_name', 'exchange_name', 'search_company_name'])
+# 新增记录的唯一键：分片并行时不同母公司可能产生相同简称，按该键upsert保证同一简称同一股票代码只写入一条
+COMPANY_UNIQUE_KEYS = ['company_name', 'stock_code']
+
+
+def ensure_company_index():
+    """company集合上的唯一索引，配合 $setOnInsert upsert 使并发新增幂等"""
+    return ensure_unique_index("company", COMPANY_UNIQUE_KEYS)
 
 class CompanyProcessor:
     def __init__(self):
@@ -41,21 +47,38 @@ class CompanyProcessor:
         # 批量操作缓存
         self.batch_insert_queue = []
         self.batch_update_queue = []
-        self.batch_size = 100
+        self.batch_size = 1000
+        # 单次 $in 查询的简称个数上限
+        self.mongo_batch_size = 1000
+        # 规范化信息按窗口批量预取，一个窗口的母公司合并为少量 _msearch 请求
+        self.prefetch_size = 500
+
+        # 各阶段实际调用次数；*_rowwise 为按行处理时会产生的调用次数，用于对比
+        self.stats = Counter()
         
-    @lru_cache(maxsize=1000)
     def get_norm_company_info(self, company_name):
         """缓存norm company信息查询"""
         if company_name not in self.norm_company_cache:
+            self.stats['es_single'] += 1
             self.norm_company_cache[company_name] = search_documents("company_norm", "zh_company_name", company_name)
         return self.norm_company_cache[company_name]
     
-    @lru_cache(maxsize=1000)
+    def prefetch_norm_company_info(self, company_names):
+        """批量查询未缓存的norm company信息，写入缓存"""
+        missing = [name for name in dict.fromkeys(company_names) if name not in self.norm_company_cache]
+        if not missing:
+            return
+        self.stats['es_msearch_names'] += len(missing)
+        hits = msearch_documents("company_norm", "zh_company_name", missing)
+        for name in missing:
+            self.norm_company_cache[name] = hits.get(name) or {}
+    
     def get_wind_abbr(self, company_name):
         """缓存wind abbreviation查询"""
         if company_name not in self.wind_abbr_cache:
+            self.stats['wind'] += 1
             try:
-                result = wind_search(f"select PREVIOUS_COMP_NAME from ASHAREINTRODUCTIONE_EXT_DF where COMP_NAME = '{company_name}'")
+                result = wind_search("select PREVIOUS_COMP_NAME from ASHAREINTRODUCTIONE_EXT_DF where COMP_NAME = %s", (company_name,))
                 self.wind_abbr_cache[company_name] = result[0][0].split(",") if result else []
             except Exception as e:
                 logger.warning(f"Wind查询失败 {company_name}: {e}")
@@ -103,26 +126,10 @@ class CompanyProcessor:
         return list(abbrs)
     
     def batch_mongo_search(self, abbrs):
-        """批量MongoDB查询"""
-        batch_results = {}
-        
-        # 使用线程池并发查询
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_abbr = {
-                executor.submit(search_company_data, abbr, "company_name"): abbr 
-                for abbr in abbrs
-            }
-            
-            for future in as_completed(future_to_abbr):
-                abbr = future_to_abbr[future]
-                try:
-                    num, temp_info = future.result()
-                    batch_results[abbr] = (num, temp_info)
-                except Exception as e:
-                    logger.error(f"MongoDB查询失败 {abbr}: {e}")
-                    batch_results[abbr] = (0, [])
-                    
-        return batch_results
+        """批量MongoDB查询：一次 $in 查询取回全部简称的记录"""
+        self.stats['mongo'] += (len(abbrs) + self.mongo_batch_size - 1) // self.mongo_batch_size
+        documents = find_company_data_batch(abbrs, "company_name", self.mongo_batch_size)
+        return {abbr: (len(documents.get(abbr, [])), documents.get(abbr, [])) for abbr in abbrs}
     
     def create_base_record(self, abbr, parent_com, code, base_info):
         """创建基础记录"""
@@ -182,140 +189,224 @@ class CompanyProcessor:
         return base
     
     def flush_batch_operations(self):
-        """执行批量操作"""
-        if self.batch_insert_queue:
-            logger.info(f"批量插入 {len(self.batch_insert_queue)} 条记录")
-            for record in self.batch_insert_queue:
-                try:
-                    insert_data("company", record)
-                except Exception as e:
-                    logger.error(f"批量插入失败: {e}")
-            self.batch_insert_queue.clear()
-            
-        if self.batch_update_queue:
-            logger.info(f"批量更新 {len(self.batch_update_queue)} 条记录")
-            for record_id, record in self.batch_update_queue:
+        """
+        执行批量操作：新增和更新合并为一次无序 bulk_write
+        新增按 (company_name, stock_code) upsert 且只在插入时写入，其他分片已写入的同一记录保持不变
+        """
+        operations = [UpdateOne({key: record[key] for key in COMPANY_UNIQUE_KEYS},
+                                {'$setOnInsert': {k: v for k, v in record.items() if k not in COMPANY_UNIQUE_KEYS}},
+                                upsert=True)
+                      for record in self.batch_insert_queue]
+        operations += [UpdateOne({'_id': record_id}, {'$set': record}, upsert=True)
+                       for record_id, record in self.batch_update_queue]
+        if not operations:
+            return
+        logger.info(f"批量写入 {len(operations)} 条记录（新增 {len(self.batch_insert_queue)}，更新 {len(self.batch_update_queue)}）")
+        self.stats['mongo_write_rowwise'] += len(operations)
+        self.stats['mongo_write'] += 1
+        summary = bulk_write_data("company", operations)
+        self.stats['mongo_write_errors'] += len(summary['errors'])
+        logger.info(f"批量写入完成: 新增 {summary['upserted']}，已存在 {summary['matched'] - summary['modified']}，"
+                    f"更新 {summary['modified']}，失败 {len(summary['errors'])}")
+        self.batch_insert_queue.clear()
+        self.batch_update_queue.clear()
+    
+    @staticmethod
+    def group_by_parent(company_data):
+        """
+        按母公司分组，保持母公司首次出现的顺序
+
+        Returns:
+            list: [(母公司, [(简称, 子公司原始名称), ...])]
+        """
+        groups = {}
+        for parent_com, parent_abbr, subs_orig in company_data:
+            groups.setdefault(parent_com, []).append((parent_abbr, subs_orig))
+        return list(groups.items())
+
+    def shared_abbreviations(self, norm_company_infos, parent_com, stock_codes):
+        """母公司级别的简称：规范化索引中的检索名 + Wind曾用名，同一母公司只计算一次"""
+        return set(self.process_abbreviations(norm_company_infos, parent_com, None, stock_codes))
+
+    def process_parent(self, parent_com, subsidiaries):
+        """
+        处理一个母公司的全部子公司行
+
+        母公司的规范化信息、Wind简称和共享简称只解析一次；子公司原始名称是各行唯一不同的部分，
+        与共享简称合并去重后每个简称只查询和写入一次
+        """
+        logger.info(f"处理公司: {parent_com}, 子公司行数: {len(subsidiaries)}")
+
+        # 获取规范化公司信息
+        norm_company_infos = self.get_norm_company_info(parent_com)
+        if not norm_company_infos:
+            logger.warning(f"未找到规范化信息: {parent_com}")
+            return False
+
+        # 提取股票代码
+        stock_codes = list(set([info['stock_code'] for info in norm_company_infos]))
+        # 获取基础信息
+        base_infos = self.get_company_info_optimized(norm_company_infos, parent_com, stock_codes)
+
+        # 共享简称 + 各子公司原始名称
+        shared = self.shared_abbreviations(norm_company_infos, parent_com, stock_codes)
+        abbrs = set(shared)
+        for _, subs_orig in subsidiaries:
+            row_abbrs = set(shared)
+            if subs_orig and subs_orig != parent_com and subs_orig not in stock_codes:
+                row_abbrs.add(subs_orig)
+            abbrs |= row_abbrs
+            # 按行处理时每行都会对该行的全部简称各查询一次Mongo
+            self.stats['mongo_rowwise'] += len(row_abbrs)
+        abbrs = sorted(abbrs)
+
+        logger.info(f"股票代码: {stock_codes}")
+        logger.info(f"公司简称列表: {abbrs}")
+
+        if not abbrs:
+            logger.info("没有需要处理的简称")
+            return True
+
+        # 批量查询MongoDB
+        mongo_results = self.batch_mongo_search(abbrs)
+
+        # 处理每个简称
+        for abbr in abbrs:
+            num, temp_info = mongo_results.get(abbr, (0, []))
+
+            if num == 0:
+                # 新增记录
+                logger.info(f"新增公司记录: {abbr}")
+                for code in stock_codes:
+                    base_info = base_infos.get(code)
+                    if base_info:
+                        try:
+                            record = self.create_base_record(abbr, parent_com, code, base_info)
+                            self.batch_insert_queue.append(record)
+
+                            # 检查是否需要执行批量操作
+                            if len(self.batch_insert_queue) >= self.batch_size:
+                                self.flush_batch_operations()
+
+                        except Exception as e:
+                            logger.error(f"创建记录失败 {abbr}: {e}")
+
+            elif num > 0:
+                # 更新记录
+                base = temp_info[0]
                 try:
-                    upsert_data("company", record_id, record)
+                    stock_code = base.get('stock_code')
+                    base_info = base_infos.get(stock_code)
+
+                    if base_info:
+                        updated_base = self.update_parent_info(base, base_info, parent_com)
+                        self.batch_update_queue.append((base['_id'], updated_base))
+
+                        # 检查是否需要执行批量操作
+                        if len(self.batch_update_queue) >= self.batch_size:
+                            self.flush_batch_operations()
+
                 except Exception as e:
-                    logger.error(f"批量更新失败: {e}")
-            self.batch_update_queue.clear()
-    
-    def process_companies(self, company_data, start_index=0):
-        """主处理函数"""
+                    logger.error(f"更新记录失败 {abbr}: {e}")
+        return True
+
+    def report_stats(self):
+        """输出各阶段调用次数与按行处理时的对比"""
+        stats = self.stats
+        es_calls = stats['es_single'] + stats['es_msearch_names']
+        logger.info("=" * 50)
+        logger.info(f"子公司行数: {stats['rows']}，母公司数: {stats['parents']}")
+        logger.info(f"ES规范化查询: 按行 {stats['rows']} 次 → 实际 {es_calls} 个名称"
+                    f"（其中批量 {stats['es_msearch_names']}，单条 {stats['es_single']}）")
+        logger.info(f"Wind简称查询: 按行 {stats['wind_rowwise']} 次 → 实际 {stats['wind']} 次")
+        logger.info(f"Mongo简称查询: 按行 {stats['mongo_rowwise']} 次 → 实际 {stats['mongo']} 次")
+        logger.info(f"Mongo写入: 逐条 {stats['mongo_write_rowwise']} 次 → 实际 {stats['mongo_write']} 次bulk_write，"
+                    f"失败 {stats['mongo_write_errors']} 条")
+        logger.info("=" * 50)
+
+    def process_companies(self, company_data, start_index=0, on_checkpoint=None):
+        """
+        主处理函数：先按母公司分组，每个母公司只解析一次
+
+        Args:
+            company_data: (母公司, 简称, 子公司原始名称) 列表
+            start_index: 从第几个母公司分组开始处理
+            on_checkpoint: 每次批量写入完成后以"下一个待处理分组下标"回调，用于持久化断点
+        """
         processed_count = 0
-        
-        for i, (parent_com, parent_abbr, subs_orig) in enumerate(tqdm(company_data[start_index:], desc="处理公司")):
+        groups = self.group_by_parent(company_data)
+        logger.info(f"{len(company_data)} 行子公司数据，归并为 {len(groups)} 个母公司")
+
+        for i, (parent_com, subsidiaries) in enumerate(tqdm(groups[start_index:], desc="处理公司")):
             current_index = i + start_index
+            if i % self.prefetch_size == 0:
+                self.prefetch_norm_company_info(group[0] for group in groups[current_index:current_index + self.prefetch_size])
             logger.info(f'====================={current_index}=============================')
-            logger.info(f"处理公司: {parent_com}, 简称: {parent_abbr}, 子公司: {subs_orig}")
-            
-            # 获取规范化公司信息
-            norm_company_infos = self.get_norm_company_info(parent_com)
-            
-            if not norm_company_infos:
-                logger.warning(f"未找到规范化信息: {parent_com}")
-                continue
-                
-            # 提取股票代码
-            stock_codes = list(set([info['stock_code'] for info in norm_company_infos]))
-            
-            # 处理简称
-            abbrs = self.process_abbreviations(norm_company_infos, parent_com, subs_orig, stock_codes)
-            
-            # 获取基础信息
-            base_infos = self.get_company_info_optimized(norm_company_infos, parent_com, stock_codes)
-            
-            logger.info(f"股票代码: {stock_codes}")
-            logger.info(f"公司简称列表: {abbrs}")
-            
-            if not abbrs:
-                logger.info("没有需要处理的简称")
+
+            self.stats['rows'] += len(subsidiaries)
+            self.stats['parents'] += 1
+            if not self.process_parent(parent_com, subsidiaries):
                 continue
-            
-            # 批量查询MongoDB
-            mongo_results = self.batch_mongo_search(abbrs)
-            
-            # 处理每个简称
-            for abbr in abbrs:
-                num, temp_info = mongo_results.get(abbr, (0, []))
-                
-                if num == 0:
-                    # 新增记录
-                    logger.info(f"新增公司记录: {abbr}")
-                    for code in stock_codes:
-                        base_info = base_infos.get(code)
-                        if base_info:
-                            try:
-                                record = self.create_base_record(abbr, parent_com, code, base_info)
-                                self.batch_insert_queue.append(record)
-                                
-                                # 检查是否需要执行批量操作
-                                if len(self.batch_insert_queue) >= self.batch_size:
-                                    self.flush_batch_operations()
-                                    
-                            except Exception as e:
-                                logger.error(f"创建记录失败 {abbr}: {e}")
-                                
-                elif num > 0:
-                    # 更新记录
-                    base = temp_info[0]
-                    try:
-                        stock_code = base.get('stock_code')
-                        base_info = base_infos.get(stock_code)
-                        
-                        if base_info:
-                            updated_base = self.update_parent_info(base, base_info, parent_com)
-                            self.batch_update_queue.append((base['_id'], updated_base))
-                            
-                            # 检查是否需要执行批量操作
-                            if len(self.batch_update_queue) >= self.batch_size:
-                                self.flush_batch_operations()
-                                
-                    except Exception as e:
-                        logger.error(f"更新记录失败 {abbr}: {e}")
-            
+            self.stats['wind_rowwise'] += len(subsidiaries)
+
             processed_count += 1
-            
+
             # 定期执行批量操作
             if processed_count % 50 == 0:
                 self.flush_batch_operations()
                 logger.info(f"已处理 {processed_count} 个公司")
+                if on_checkpoint:
+                    on_checkpoint(current_index + 1)
         
         # 处理完成后执行剩余的批量操作
         self.flush_batch_operations()
+        if on_checkpoint:
+            on_checkpoint(len(groups))
         logger.info(f"总共处理了 {processed_count} 个公司")
+        self.report_stats()
+
+# 母公司 - 简称 - 子公司原始名称
+SUBSIDIARY_SQL = """
+WITH C AS (SELECT a.secu,a.ticker, a.rpt, s.std_sch as subs_orig, a.subs_cat,a.subs_id, a.reg_std, a.bizzplace_std,a.directrate ,a.indirectrate ,a.totalrate
+FROM equity_subsidiary_base a
+JOIN std_org s ON a.subs_id = s.ref_company_id and a.subs_orig != s.std_sch and a.subs_cat = 2)
+SELECT DISTINCT b.org as tar_name,b.abbr,C.subs_orig
+FROM C
+JOIN base_stock b ON b.code = C.secu
+"""
+
+
+def load_company_rows():
+    """查询待规范化的子公司数据"""
+    logger.info("开始查询子公司数据...")
+    res = chinascope_search(SUBSIDIARY_SQL) or []
+    logger.info(f"查询到 {len(res)} 条子公司数据")
+    if res:
+        logger.debug(f"第一条数据示例: {res[0]}")
+    return res
+
 
 def main():
-    """主函数"""
+    """主函数（单进程）；全量处理请使用 company_norm/sharded_runner.py"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="公司名称规范化（单进程）")
+    parser.add_argument("--start-group", type=int, default=0, help="从第几个母公司分组开始处理")
+    args = parser.parse_args()
+
     start_time = time.time()
     
     # 初始化处理器
+    ensure_company_index()
     processor = CompanyProcessor()
     
-    # 执行SQL查询
-    subidiary_search = """
-    WITH C AS (SELECT a.secu,a.ticker, a.rpt, s.std_sch as subs_orig, a.subs_cat,a.subs_id, a.reg_std, a.bizzplace_std,a.directrate ,a.indirectrate ,a.totalrate
-    FROM equity_subsidiary_base a
-    JOIN std_org s ON a.subs_id = s.ref_company_id and a.subs_orig != s.std_sch and a.subs_cat = 2)
-    SELECT DISTINCT b.org as tar_name,b.abbr,C.subs_orig
-    FROM C
-    JOIN base_stock b ON b.code = C.secu
-    """
-    
-    logger.info("开始查询子公司数据...")
-    res = chinascope_search(subidiary_search)
-    logger.info(f"查询到 {len(res)} 条子公司数据")
-    
+    res = load_company_rows()
     if res:
-        logger.debug(f"第一条数据示例: {res[0]}")
-        
         # 开始处理
-        start_index = 28477
-        processor.process_companies(res, start_index)
+        processor.process_companies(res, args.start_group)
     
     end_time = time.time()
     logger.info(f"总执行时间: {end_time - start_time:.2f} 秒")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+公司名称规范化分片运行器
+- 按母公司名称的md5将子公司数据划分为固定数量的分片，同一母公司的所有行落在同一分片
+- 各分片在独立的子进程中处理（spawn启动），每个进程各自创建ES/MySQL/Mongo连接
+- 每个分片维护独立的断点文件（下一个待处理的母公司分组），批量写入完成后更新，中断后重跑自动从断点继续
+
+用法：
+    python company_norm/sharded_runner.py --shards 32 --workers 8
+    python company_norm/sharded_runner.py --reset      # 清空断点重新处理
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+add_path = str(Path(__file__).parent.parent)
+sys.path.append(add_path)
+
+from configs.config import COMPANY_NORM_SHARDS, COMPANY_NORM_WORKERS, COMPANY_NORM_CHECKPOINT_DIR
+
+
+def shard_of(parent_com, num_shards):
+    """母公司名称 → 分片号，跨进程、跨运行保持稳定"""
+    return int(hashlib.md5(str(parent_com).encode('utf-8')).hexdigest()[:8], 16) % num_shards
+
+
+def partition_rows(rows, num_shards):
+    """按母公司分片，分片内排序保证断点下标在重跑时仍然有效"""
+    shards = [[] for _ in range(num_shards)]
+    for row in rows:
+        shards[shard_of(row[0], num_shards)].append(tuple(row))
+    for shard_rows in shards:
+        shard_rows.sort(key=lambda row: tuple(str(value) for value in row))
+    return shards
+
+
+class ShardCheckpoint:
+    """分片断点：记录下一个待处理的母公司分组下标，以及分片数据的行数和摘要，数据变化时从头处理"""
+
+    def __init__(self, checkpoint_dir, shard_id, rows):
+        self.path = Path(checkpoint_dir) / f"shard_{shard_id:04d}.json"
+        self.shard_id = shard_id
+        self.total = len(rows)
+        self.groups = len({row[0] for row in rows})
+        self.digest = hashlib.md5(json.dumps(rows, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+    def load(self):
+        """返回断点分组下标，断点不存在或数据已变化时返回0"""
+        if not self.path.exists():
+            return 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return 0
+        if state.get("total") != self.total or state.get("digest") != self.digest:
+            return 0
+        return int(state.get("next_group", 0))
+
+    def save(self, next_group):
+        state = {
+            "shard": self.shard_id,
+            "next_group": next_group,
+            "groups": self.groups,
+            "total": self.total,
+            "digest": self.digest,
+            "done": next_group >= self.groups,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def run_shard(shard_id, rows, checkpoint_dir):
+    """
+    子进程入口：处理一个分片
+
+    在子进程内导入处理器，ES/MySQL/Mongo客户端随模块导入在本进程内创建
+    """
+    from company_norm.norm_optimized import CompanyProcessor
+
+    checkpoint = ShardCheckpoint(checkpoint_dir, shard_id, rows)
+    start_group = checkpoint.load()
+    if start_group >= checkpoint.groups:
+        return shard_id, checkpoint.groups, 0, 0.0
+
+    start_time = time.time()
+    processor = CompanyProcessor()
+    processor.process_companies(rows, start_group, on_checkpoint=checkpoint.save)
+    return shard_id, checkpoint.groups, checkpoint.groups - start_group, time.time() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="公司名称规范化分片运行")
+    parser.add_argument("--shards", type=int, default=COMPANY_NORM_SHARDS, help="分片数，修改后断点全部失效")
+    parser.add_argument("--workers", type=int, default=COMPANY_NORM_WORKERS, help="并行进程数")
+    parser.add_argument("--checkpoint-dir", default=COMPANY_NORM_CHECKPOINT_DIR, help="分片断点目录")
+    parser.add_argument("--reset", action="store_true", help="清空断点重新处理")
+    args = parser.parse_args()
+
+    from company_norm.norm_optimized import load_company_rows, ensure_company_index, logger
+
+    checkpoint_dir = Path(args.checkpoint_dir) / f"shards_{args.shards}"
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    if args.reset:
+        for path in checkpoint_dir.glob("shard_*.json"):
+            path.unlink()
+
+    start_time = time.time()
+    # 各分片共用company集合，新增记录依赖唯一索引去重，在启动分片前创建
+    ensure_company_index()
+    shards = partition_rows(load_company_rows(), args.shards)
+    logger.info(f"共 {args.shards} 个分片，每片行数: 最少 {min(map(len, shards))}，最多 {max(map(len, shards))}")
+
+    # 各进程需要独立的Mongo/MySQL连接，fork会复制父进程的连接和锁，使用spawn
+    context = multiprocessing.get_context("spawn")
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+        futures = {executor.submit(run_shard, shard_id, shard_rows, str(checkpoint_dir)): shard_id
+                   for shard_id, shard_rows in enumerate(shards) if shard_rows}
+        for future in as_completed(futures):
+            shard_id = futures[future]
+            try:
+                _, total, processed, elapsed = future.result()
+                logger.info(f"分片 {shard_id} 完成: 共 {total} 个母公司，本次处理 {processed} 个，耗时 {elapsed:.1f} 秒")
+            except Exception as e:
+                failed.append(shard_id)
+                logger.error(f"分片 {shard_id} 处理失败: {e}")
+
+    logger.info(f"全部分片结束，失败 {len(failed)} 个{': ' + str(sorted(failed)) if failed else ''}，"
+                f"总执行时间: {time.time() - start_time:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,89 @@ REDIS_PROCESSING_KEY = "anno:processing"
 REDIS_DATA_KEY_PREFIX = "anno:data:"
 # 异常解析文献列表
 REDIS_MISS_DATA_KEY = "anno:error_data"
+# 已领取未确认的任务租约（Hash：uid → 主机名:pid）
+REDIS_LEASE_KEY = "anno:lease"
 
 QWEN_INFERENCE_JSON_PATH = "/data/share2/yy/workspace/data/wind_anno_qwen_json"
 QWEN_INFERENCE_MD_PATH = "/data/share2/yy/workspace/data/wind_anno_md"
-QWEN_FILE_SUFFIX = "_qwen_thinking.json"
\ No newline at end of file
+QWEN_FILE_SUFFIX = "_qwen_thinking.json"
+
+# 抽取上下文打包：本地tokenizer路径、单次抽取的token预算、单篇文档最多拆分的抽取调用次数
+QWEN_TOKENIZER_PATH = os.getenv("QWEN_TOKENIZER_PATH", "Qwen/Qwen3-30B-A3B-Thinking-2507")
+QWEN_CONTEXT_TOKEN_BUDGET = int(os.getenv("QWEN_CONTEXT_TOKEN_BUDGET", 32768))
+QWEN_MAX_EXTRACTION_CALLS = int(os.getenv("QWEN_MAX_EXTRACTION_CALLS", 4))
+# 章节与报告标签的rerank分数阈值，高于该值的章节参与抽取
+RERANK_SCORE_THRESHOLD = 0.7
+# 抽取模式：single 为整体抽取，grouped 为按实体组拆分并发抽取，stream 为流式抽取并边解码边入库；分组抽取的最大并发数
+QWEN_EXTRACTION_MODE = os.getenv("QWEN_EXTRACTION_MODE", "single")
+QWEN_GROUP_MAX_WORKERS = int(os.getenv("QWEN_GROUP_MAX_WORKERS", 6))
+# US3下载缓存：缓存目录（多个worker进程共享）、缓存总大小上限、预取任务数、并发下载线程数
+US3_CACHE_DIR = os.getenv("US3_CACHE_DIR", "/data/share2/yy/workspace/data/us3_cache")
+US3_CACHE_MAX_BYTES = int(os.getenv("US3_CACHE_MAX_BYTES", 20 * 1024 ** 3))
+US3_PREFETCH_LOOKAHEAD = int(os.getenv("US3_PREFETCH_LOOKAHEAD", 4))
+US3_PREFETCH_WORKERS = int(os.getenv("US3_PREFETCH_WORKERS", 4))
+# 文档读取方式：cache 为预取到本地缓存后读取，stream 为直接从US3流式读入内存；流式读取时按Range分段请求的大小
+US3_SOURCE_MODE = os.getenv("US3_SOURCE_MODE", "cache")
+US3_STREAM_PART_SIZE = int(os.getenv("US3_STREAM_PART_SIZE", 16 * 1024 * 1024))
+# nGQL模板查询结果缓存：Redis键前缀、缓存有效期（秒）；是否在图谱写入后使对应公司的缓存失效
+NGQL_CACHE_PREFIX = os.getenv("NGQL_CACHE_PREFIX", "ngql:")
+NGQL_CACHE_TTL = int(os.getenv("NGQL_CACHE_TTL", 7 * 24 * 3600))
+NGQL_CACHE_INVALIDATE = os.getenv("NGQL_CACHE_INVALIDATE", "1") == "1"
+# 公司名称规范化分片运行：分片数、并行进程数、分片断点目录
+COMPANY_NORM_SHARDS = int(os.getenv("COMPANY_NORM_SHARDS", 32))
+COMPANY_NORM_WORKERS = int(os.getenv("COMPANY_NORM_WORKERS", 8))
+COMPANY_NORM_CHECKPOINT_DIR = os.getenv("COMPANY_NORM_CHECKPOINT_DIR", "/data/share2/yy/workspace/data/company_norm_checkpoints")
+# 公司别名解析：映射表快照路径、快照有效期（秒）；图谱写入前是否把公司别名解析为规范化名称
+COMPANY_RESOLVER_SNAPSHOT = os.getenv("COMPANY_RESOLVER_SNAPSHOT", "/data/share2/yy/workspace/data/company_resolver.pkl")
+COMPANY_RESOLVER_MAX_AGE = int(os.getenv("COMPANY_RESOLVER_MAX_AGE", 24 * 3600))
+COMPANY_RESOLVER_ENABLED = os.getenv("COMPANY_RESOLVER_ENABLED", "1") == "1"
+# 年报章节标签：Excel源文件、预构建的JSON（worker启动时只读JSON）
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+REPORT_LABELS_XLSX = os.getenv("REPORT_LABELS_XLSX", os.path.join(DATA_DIR, "report.xlsx"))
+REPORT_LABELS_PATH = os.getenv("REPORT_LABELS_PATH", os.path.join(DATA_DIR, "report_labels.json"))
+# Qwen抽取服务：OpenAI兼容接口地址、API Key、模型名
+QWEN_BASE_URL = os.getenv("QWEN_BASE_URL", "http://10.100.0.205:4000")
+QWEN_API_KEY = os.getenv("QWEN_API_KEY", "sk-1234")
+QWEN_MODEL = os.getenv("QWEN_MODEL", "Qwen3-30B-A3B-Thinking-2507")
+# 抽取worker管理：worker数上下限、每个worker对应的排队任务数、调度间隔（秒）、停止时等待worker处理完当前任务的最长时间（秒）
+SUPERVISOR_MIN_WORKERS = int(os.getenv("SUPERVISOR_MIN_WORKERS", 4))
+SUPERVISOR_MAX_WORKERS = int(os.getenv("SUPERVISOR_MAX_WORKERS", 31))
+SUPERVISOR_ITEMS_PER_WORKER = int(os.getenv("SUPERVISOR_ITEMS_PER_WORKER", 20))
+SUPERVISOR_INTERVAL = int(os.getenv("SUPERVISOR_INTERVAL", 30))
+SUPERVISOR_DRAIN_TIMEOUT = int(os.getenv("SUPERVISOR_DRAIN_TIMEOUT", 1800))
+# LLM探测延迟（秒，EWMA平滑）：高于上限时停止扩容并逐个缩容，低于下限时才允许扩容
+SUPERVISOR_LATENCY_HIGH = float(os.getenv("SUPERVISOR_LATENCY_HIGH", 10.0))
+SUPERVISOR_LATENCY_LOW = float(os.getenv("SUPERVISOR_LATENCY_LOW", 2.0))
+SUPERVISOR_LATENCY_ALPHA = float(os.getenv("SUPERVISOR_LATENCY_ALPHA", 0.3))
+# 配置了QWEN_BACKEND_HOSTS时改用负载均衡器统计的健康后端单位耗时EWMA均值（秒/生成token），上下限含义同上
+SUPERVISOR_BACKEND_LATENCY_HIGH = float(os.getenv("SUPERVISOR_BACKEND_LATENCY_HIGH", 0.1))
+SUPERVISOR_BACKEND_LATENCY_LOW = float(os.getenv("SUPERVISOR_BACKEND_LATENCY_LOW", 0.03))
+SUPERVISOR_PID_FILE = os.getenv("SUPERVISOR_PID_FILE", "/data/share2/yy/workspace/logs/supervisor.pid")
+# LLM/rerank自适应并发（AIMD）：初始、最小、最大并发数；收缩系数、单位耗时超过基线该倍数时收缩、两次收缩最小间隔（秒）
+QWEN_CONCURRENCY_INITIAL = int(os.getenv("QWEN_CONCURRENCY_INITIAL", 16))
+QWEN_CONCURRENCY_MIN = int(os.getenv("QWEN_CONCURRENCY_MIN", 2))
+QWEN_CONCURRENCY_MAX = int(os.getenv("QWEN_CONCURRENCY_MAX", 64))
+RERANK_CONCURRENCY_INITIAL = int(os.getenv("RERANK_CONCURRENCY_INITIAL", 8))
+RERANK_CONCURRENCY_MIN = int(os.getenv("RERANK_CONCURRENCY_MIN", 1))
+RERANK_CONCURRENCY_MAX = int(os.getenv("RERANK_CONCURRENCY_MAX", 32))
+CONCURRENCY_BACKOFF = float(os.getenv("CONCURRENCY_BACKOFF", 0.7))
+CONCURRENCY_LATENCY_TOLERANCE = float(os.getenv("CONCURRENCY_LATENCY_TOLERANCE", 2.0))
+CONCURRENCY_COOLDOWN = float(os.getenv("CONCURRENCY_COOLDOWN", 10.0))
+# 等待并发名额的最长时间（秒），超时的调用失败，任务归还队列
+CONCURRENCY_ACQUIRE_TIMEOUT = float(os.getenv("CONCURRENCY_ACQUIRE_TIMEOUT", 900))
+# Qwen推理容器负载均衡：主机列表（逗号分隔，为空时使用QWEN_BASE_URL代理）、每台主机的容器端口、容器OpenAI接口路径、API Key、模型名
+QWEN_BACKEND_HOSTS = os.getenv("QWEN_BACKEND_HOSTS", "")
+QWEN_BACKEND_PORTS = os.getenv("QWEN_BACKEND_PORTS", "7001,7002")
+QWEN_BACKEND_API_PATH = os.getenv("QWEN_BACKEND_API_PATH", "/v1")
+QWEN_BACKEND_API_KEY = os.getenv("QWEN_BACKEND_API_KEY", "EMPTY")
+QWEN_BACKEND_MODEL = os.getenv("QWEN_BACKEND_MODEL", QWEN_MODEL)
+# 后端健康探测间隔、/health/ 与 /health_generate/ 超时（秒）；请求连续失败该次数时立即摘除；单位耗时EWMA平滑系数
+BALANCER_PROBE_INTERVAL = int(os.getenv("BALANCER_PROBE_INTERVAL", 15))
+BALANCER_PROBE_TIMEOUT = int(os.getenv("BALANCER_PROBE_TIMEOUT", 10))
+BALANCER_GENERATE_TIMEOUT = int(os.getenv("BALANCER_GENERATE_TIMEOUT", 60))
+BALANCER_MAX_FAILURES = int(os.getenv("BALANCER_MAX_FAILURES", 3))
+BALANCER_LATENCY_ALPHA = float(os.getenv("BALANCER_LATENCY_ALPHA", 0.3))
+# 每个推理容器的自适应并发：初始、最小、最大并发数（配置了QWEN_BACKEND_HOSTS时代替QWEN_CONCURRENCY_*）
+QWEN_BACKEND_CONCURRENCY_INITIAL = int(os.getenv("QWEN_BACKEND_CONCURRENCY_INITIAL", 8))
+QWEN_BACKEND_CONCURRENCY_MIN = int(os.getenv("QWEN_BACKEND_CONCURRENCY_MIN", 1))
+QWEN_BACKEND_CONCURRENCY_MAX = int(os.getenv("QWEN_BACKEND_CONCURRENCY_MAX", 32))
@@ -399,17 +399,44 @@ def calculate_rank_from_date(date_str: str) -> int:
         logger.warning(f"计算日期rank时发生错误: {e}, 日期: {date_str}")
         return 0
 
+# 逐条插入的列表字段，顺序与insert_json_data的插入顺序一致
+ENTITY_LIST_FIELDS = (
+    'persons',
+    'shareholders',
+    'subsidiaries',
+    'related_companies',
+    'major_suppliers',
+    'major_customers',
+    'main_business_composition',
+)
+
+# 各字段中的公司名称键，写入前经别名解析统一为规范化名称
+COMPANY_NAME_FIELDS = {
+    'company_info': 'company_name',
+    'shareholders': 'name',
+    'subsidiaries': 'subsidiary_name',
+    'related_companies': 'related_party_name',
+    'major_suppliers': 'supplier_name',
+    'major_customers': 'customer_name',
+}
+
 class JSONToNebulaInserter:
-    def __init__(self, nebula_config: Dict, space_name: str = ""):
+    def __init__(self, nebula_config: Dict, space_name: str = "", ngql_cache=None, company_resolver=None):
         """
         初始化插入器
         
         Args:
             nebula_config: NebulaGraph数据库配置
             space_name: NebulaGraph space名称
+            ngql_cache: 可选的 utils.ngql_cache.NGQLResultCache，写入公司数据后使其模板查询缓存失效
+            company_resolver: 可选的 utils.company_resolver.CompanyResolver，生成VID前把公司别名解析为规范化名称
         """
         self.nebula_config = nebula_config
         self.space_name = space_name
+        self.ngql_cache = ngql_cache
+        self.company_resolver = company_resolver
+        # 当前文档的边键存在性缓存 {(边类型, 起点VID, 终点VID, rank): 是否存在}
+        self._edge_key_cache = {}
         self.nebula_pool = None
         self.nebula_session = None
         
@@ -418,7 +445,9 @@ class JSONToNebulaInserter:
             'vertices_inserted': 0,
             'vertices_skipped': 0,
             'edges_inserted': 0,
-            'edges_skipped': 0
+            'edges_updated': 0,
+            'edges_skipped': 0,
+            'names_resolved': 0
         }
     
     def connect_database(self):
@@ -464,9 +493,11 @@ class JSONToNebulaInserter:
         logger.info(f"  顶点插入: {self.stats['vertices_inserted']}")
         logger.info(f"  顶点跳过(已存在): {self.stats['vertices_skipped']}")
         logger.info(f"  边插入: {self.stats['edges_inserted']}")
+        logger.info(f"  边覆盖更新(键已存在): {self.stats['edges_updated']}")
         logger.info(f"  边跳过(已存在): {self.stats['edges_skipped']}")
+        logger.info(f"  公司名称解析为规范化名称: {self.stats['names_resolved']}")
         logger.info(f"  总顶点处理: {self.stats['vertices_inserted'] + self.stats['vertices_skipped']}")
-        logger.info(f"  总边处理: {self.stats['edges_inserted'] + self.stats['edges_skipped']}")
+        logger.info(f"  总边处理: {self.stats['edges_inserted'] + self.stats['edges_updated'] + self.stats['edges_skipped']}")
         logger.info("="*50)
     
     def execute_query(self, query: str, parameters: Dict = None, description: str = ""):
@@ -529,37 +560,122 @@ class JSONToNebulaInserter:
             logger.warning(f"检查顶点存在性时发生异常: {e}, 假设顶点不存在")
             return False
     
-    def edge_exists(self, from_vid_tag: str, from_vid_properties: dict, to_vid_tag: str, to_vid_properties: dict, edge_type: str, edge_properties: dict) -> bool:
-        """检查边是否存在"""
-        try:
-            # 构建属性字符串
-            def build_properties_string(props):
-                if not props:
-                    return ""
-                prop_parts = []
-                for key, value in props.items():
-                    prop_parts.append(f"{key}: {escape_string_for_nebula(value)}")
-                return "{" + ", ".join(prop_parts) + "}"
-            
-            from_props_str = build_properties_string(from_vid_properties)
-            to_props_str = build_properties_string(to_vid_properties)
-            edge_props_str = build_properties_string(edge_properties)
-            
-            # MATCH (a:Company {company_name: '北大荒农垦集团有限公司'})-[e:PARENT_OF {ticker: "600598",rpt:"2016-06-30"}]->(b:Company {company_name: '黑龙江北大荒农业股份有限公司'}) RETURN e
-            query = f'MATCH (a:{from_vid_tag} {from_props_str})-[e:{edge_type} {edge_props_str}]->(b:{to_vid_tag} {to_props_str}) RETURN e LIMIT 1'
-            logger.info(f"Query: {query}")
-            success, result = self.execute_query(query, {},f"检查边{from_vid_tag}-[{edge_type}]->{to_vid_tag}是否存在")
-            if success and result.row_size() > 0:
-                return True
-            return False
-        except Exception as e:
-            logger.warning(f"检查边存在性时发生异常: {e}, 假设边不存在")
-            return False
+    def edge_key_exists(self, edge_type: str, src_vid: str, dst_vid: str, rank: int) -> bool:
+        """
+        按边的唯一键 (src, dst, rank) 检查边是否存在
+
+        rank 由 calculate_rank_from_date(报告期) 计算，同一报告期的同一条关系键相同；
+        已预取过的键直接返回结果，否则执行 FETCH PROP ON edge src->dst@rank
+        仅用于统计新增/覆盖：INSERT EDGE 对相同键是覆盖写入，重跑时用修正后的属性更新已有边，不能因键存在而跳过
+        """
+        key = (edge_type, src_vid, dst_vid, int(rank))
+        if key not in self._edge_key_cache:
+            self.prefetch_edge_keys([key])
+        return self._edge_key_cache.get(key, False)
+
+    def prefetch_edge_keys(self, keys, batch_size: int = 500):
+        """
+        批量查询边键是否存在，结果写入 self._edge_key_cache
+
+        Args:
+            keys: [(边类型, 起点VID, 终点VID, rank)]
+        """
+        by_edge_type = {}
+        for key in keys:
+            if key not in self._edge_key_cache:
+                by_edge_type.setdefault(key[0], set()).add(key)
+        for edge_type, edge_keys in by_edge_type.items():
+            edge_keys = sorted(edge_keys)
+            for start in range(0, len(edge_keys), batch_size):
+                chunk = edge_keys[start:start + batch_size]
+                refs = ", ".join(f"{escape_string_for_nebula(src)}->{escape_string_for_nebula(dst)}@{rank}" for _, src, dst, rank in chunk)
+                query = f"FETCH PROP ON {edge_type} {refs} YIELD src(edge) AS src, dst(edge) AS dst, rank(edge) AS rank"
+                success, result = self.execute_query(query, {}, f"批量检查{edge_type}边是否存在({len(chunk)}条)")
+                if not success:
+                    # 查询失败时不缓存，按不存在处理；INSERT EDGE 对相同键是覆盖写入，重复插入不会产生重复边
+                    continue
+                for key in chunk:
+                    self._edge_key_cache[key] = False
+                for src, dst, rank in zip(result.column_values('src'), result.column_values('dst'), result.column_values('rank')):
+                    self._edge_key_cache[(edge_type, src.as_string(), dst.as_string(), rank.as_int())] = True
+
+    def document_edge_keys(self, data: dict, company_name: str, report_last_date: str) -> list:
+        """计算一篇文档将要写入的全部边键，键的构造与各 insert_*_edge 方法一致"""
+        keys = []
+        company_vid = self.genegerate_vid(company_name)
+        report_rank = calculate_rank_from_date(report_last_date)
+
+        def item_rank(item):
+            return calculate_rank_from_date(report_last_date or item.get('report_period') or '')
+
+        stock_code = (data.get('stock_info') or {}).get('stock_code') or ''
+        for code in stock_code.split(','):
+            if code.strip():
+                keys.append(("Base_Stock_Info", self.genegerate_vid(code.strip()), company_vid, report_rank))
+        for item in data.get('persons') or []:
+            if item and item.get('person_name'):
+                keys.append(("Position_Info", self.genegerate_vid(item['person_name']), company_vid, report_rank))
+        for item in data.get('shareholders') or []:
+            if item and item.get('name'):
+                keys.append(("Shareholder", self.genegerate_vid(item['name']), company_vid, item_rank(item)))
+        for item in data.get('subsidiaries') or []:
+            if item and item.get('subsidiary_name'):
+                subsidiary_vid = self.genegerate_vid(item['subsidiary_name'])
+                keys.append(("Subsidiary", subsidiary_vid, company_vid, item_rank(item)))
+                keys.append(("Parent_Of", company_vid, subsidiary_vid, item_rank(item)))
+        for item in data.get('related_companies') or []:
+            if item and item.get('related_party_name'):
+                keys.append(("Related_Company", self.genegerate_vid(item['related_party_name']), company_vid, item_rank(item)))
+        for item in data.get('major_suppliers') or []:
+            if item and item.get('supplier_name'):
+                keys.append(("Suppiler", self.genegerate_vid(item['supplier_name']), company_vid, item_rank(item)))
+        for item in data.get('major_customers') or []:
+            if item and item.get('customer_name'):
+                keys.append(("Customer", self.genegerate_vid(item['customer_name']), company_vid, item_rank(item)))
+        for item in data.get('main_business_composition') or []:
+            if item and item.get('product_name'):
+                keys.append(("Main_Business_Composition", company_vid, self.genegerate_vid(item['product_name']), item_rank(item)))
+        return keys
 
     def genegerate_vid(self,name:str):
         vid = hashlib.md5(name.encode("utf-8")).hexdigest()
         return vid
 
+    def resolve_company_names(self, key: str, value, count: bool = True):
+        """
+        把字段或列表元素中的公司名称替换为规范化名称（原地修改）
+
+        公司信息的原名称在简称为空时写入company_abbr，保留按简称检索的入口；
+        count 为False时不计入统计，用于已按元素解析并计数过的同一批数据
+        """
+        name_key = COMPANY_NAME_FIELDS.get(key)
+        if not self.company_resolver or not name_key or not isinstance(value, dict):
+            return value
+        name = value.get(name_key)
+        if not name or not isinstance(name, str) or name == "null":
+            return value
+        norm_name = self.company_resolver.resolve(name.strip())
+        if norm_name != name:
+            value[name_key] = norm_name
+            if key == 'company_info' and not value.get('company_abbr'):
+                value['company_abbr'] = name
+            if count:
+                self.stats['names_resolved'] += 1
+            logger.debug(f"公司名称解析: {name} → {norm_name}")
+        return value
+
+    def resolve_document_names(self, data: dict, count: bool = True):
+        """解析整篇抽取结果中的公司名称"""
+        self.resolve_company_names('company_info', data.get('company_info'), count)
+        for key in ENTITY_LIST_FIELDS:
+            for item in data.get(key) or []:
+                self.resolve_company_names(key, item, count)
+
+    def invalidate_company_cache(self, company_name: str):
+        """公司数据写入后，使以该公司为中心的模板查询缓存失效"""
+        if self.ngql_cache and company_name:
+            self.ngql_cache.invalidate(self.genegerate_vid(company_name))
+
     def transfer_data(self,data:Dict):
         clean = {k: (v if v is not None and v != "null" and v != ":null" else '') for k, v in data.items()}
         return clean
@@ -705,16 +821,7 @@ class JSONToNebulaInserter:
             stock_vid = self.genegerate_vid(stock_code)
             company_vid = self.genegerate_vid(company_name)
             
-            if self.edge_exists("Stock",
-                {"stock_code":stock_code},
-                'Stock',
-                {"stock_code":stock_code},
-                "Base_Stock_Info",
-                {"total_share_num":total_share_capital,"circulating_share_number":circulating_share_capital,
-                    "stock_list_status":stock_list_status,"risk_warning_time":risk_warning_time,
-                    "cancel_risk_warning_time":cancel_risk_warning_time,"risk_warning_status":risk_warning_status}
-            ):
-                return True
+            existed = self.edge_key_exists("Base_Stock_Info", stock_vid, company_vid, rank)
             
             # 插入股权股本信息边 - 使用VID
             query = f"""
@@ -726,7 +833,7 @@ class JSONToNebulaInserter:
             
             success, _ = self.execute_query(query, {}, f"插入股权股本变更边: {stock_code}")
             if success:
-                self.stats['edges_inserted'] += 1
+                self.stats['edges_updated' if existed else 'edges_inserted'] += 1
         else:
             # 多个股票代码处理
             
@@ -738,18 +845,7 @@ class JSONToNebulaInserter:
                 stock_vid = self.genegerate_vid(code)
                 company_vid = self.genegerate_vid(company_name)
                 
-                if self.edge_exists("Stock",
-                    {"stock_code":code},
-                    'Stock',
-                    {"stock_code":code},
-                    "Base_Stock_Info",
-                    {"total_share_num":total_share_capital,"circulating_share_number":circulating_share_capital,
-                        "stock_list_status":stock_list_status,"risk_warning_time":risk_warning_time,
-                        "cancel_risk_warning_time":cancel_risk_warning_time,"risk_warning_status":risk_warning_status}
-                ):
-                    logger.info(f"股权股本信息边已存在: {code}")
-                    self.stats['edges_skipped'] += 1
-                    continue
+                existed = self.edge_key_exists("Base_Stock_Info", stock_vid, company_vid, rank)
                 
                 query = f"""
                 INSERT EDGE Base_Stock_Info(total_share_num, circulating_share_number, currency,risk_warning_time, cancel_risk_warning_time, risk_warning_status, stock_list_status,report_datetime) VALUES
@@ -760,7 +856,7 @@ class JSONToNebulaInserter:
                 
                 success, _ = self.execute_query(query, {}, f"插入股权股本变更边: {code}")
                 if success:
-                    self.stats['edges_inserted'] += 1
+                    self.stats['edges_updated' if existed else 'edges_inserted'] += 1
                 else:
                     logger.warning(f"插入股权股本变更边失败: {code}")
                     self.stats['edges_skipped'] += 1
@@ -857,14 +953,7 @@ class JSONToNebulaInserter:
             logger.warning("人员姓名为空，跳过插入")
             return False
 
-        if self.edge_exists("Person",
-            {"person_name":person_name},
-            'Company',
-            {"company_name":company_name},
-            "Position_Info",
-            {"position":position,"is_active":is_active,"status_change_time":status_change_time,"personal_salary":compensation}
-        ):
-            return True
+        existed = self.edge_key_exists("Position_Info", self.genegerate_vid(person_name), self.genegerate_vid(company_name), rank)
 
         person_vid = self.genegerate_vid(person_name)
         company_vid = self.genegerate_vid(company_name)
@@ -877,7 +966,7 @@ class JSONToNebulaInserter:
         
         success, _ = self.execute_query(query, {}, f"插入人员职位状态边: {person_name} -> {company_name}")
         if success:
-            self.stats['edges_inserted'] += 1
+            self.stats['edges_updated' if existed else 'edges_inserted'] += 1
         return success
     
     def insert_product_vertex(self, product_data: Dict):
@@ -935,36 +1024,10 @@ class JSONToNebulaInserter:
         if shareholder_type == '自然人':
             # 创建Person顶点
             self.insert_person_vertex({'person_name': shareholder_name})
-
-            if self.edge_exists("Person",
-                {"person_name":shareholder_name},
-                'Company',
-                {"company_name":company_name},
-                'Shareholder',
-                {"shareholder_type":shareholder_type,"shareholding_ratio":shareholding_percentage,"currency":currency,
-                    "is_major_shareholder":is_major_shareholder,"report_period_exchange_amount":report_period_change_amount,
-                    "holdings_of_period_end":period_end_holdings,"share_type":share_type,"share_ratio":share_percentage,
-                    "vote_ratio":vote_percentage}
-            ):
-                logger.info(f"控股关系边已存在: {shareholder_name} -> {company_name}")
-                self.stats['edges_skipped'] += 1
-                return True
         else:
             # 创建Company顶点  
             self.insert_company_vertex({'company_name': shareholder_name})
-            if self.edge_exists("Company",
-                {"company_name":shareholder_name},
-                'Company',
-                {"company_name":company_name},
-                'Shareholder',
-                {"shareholder_type":shareholder_type,"shareholding_ratio":shareholding_percentage,"currency":currency,
-                    "is_major_shareholder":is_major_shareholder,"report_period_exchange_amount":report_period_change_amount,
-                    "holdings_of_period_end":period_end_holdings,"share_type":share_type,"share_ratio":share_percentage,
-                    "vote_ratio":vote_percentage}
-            ):
-                logger.info(f"控股关系边已存在: {shareholder_name} -> {company_name}")
-                self.stats['edges_skipped'] += 1
-                return True
+        existed = self.edge_key_exists("Shareholder", self.genegerate_vid(shareholder_name), self.genegerate_vid(company_name), rank)
             
         # 生成VID
         shareholder_vid = self.genegerate_vid(shareholder_name)
@@ -980,7 +1043,7 @@ class JSONToNebulaInserter:
         
         success, _ = self.execute_query(query, {}, f"插入控股关系: {shareholder_name} -> {company_name}")
         if success:
-            self.stats['edges_inserted'] += 1
+            self.stats['edges_updated' if existed else 'edges_inserted'] += 1
         return success
     
     def insert_subsidiary_edge(self, subsidiary_data: Dict, parent_company: str, report_date: str = None):
@@ -1014,33 +1077,14 @@ class JSONToNebulaInserter:
         self.insert_company_vertex({'company_name': subsidiary_name})
         self.insert_company_vertex({'company_name': parent_company})
 
-        # 检查边是否已存在
-        sub_edge_exists = self.edge_exists("Company",
-            {"company_name":subsidiary_name},
-            'Company',
-            {"company_name":parent_company},
-            "Subsidiary",
-            {"is_wholly_owned":is_wholly_owned, "subsidiary_type":subsidiary_type, "vote_ratio":vote_percentage,
-                "subsidiary_relationship":subsidiary_relationship, "shareholding_ratio":ownership_percentage,
-                "is_consolidated":is_consolidated, "total_investment":investment_amount, "investment_method":investment_method}
-        )
-
-        parent_edge_exists = self.edge_exists("Company",
-            {"company_name":parent_company},
-            'Company',
-            {"company_name":subsidiary_name},
-            "Parent_Of",
-            {"is_wholly_owned":is_wholly_owned, "subsidiary_type":subsidiary_type, "vote_ratio":vote_percentage,
-                "subsidiary_relationship":subsidiary_relationship, "shareholding_ratio":ownership_percentage,
-                "is_consolidated":is_consolidated, "total_investment":investment_amount, "investment_method":investment_method}
-        )
-        
-        if sub_edge_exists and parent_edge_exists:
-            logger.info(f"子母公司关系边已存在: {subsidiary_name} <-> {parent_company}")
-            self.stats['edges_skipped'] += 2
-            return True
         # 计算rank
         rank = calculate_rank_from_date(report_date or subsidiary_data.get('report_period', ''))
+
+        # 边键是否已存在，仅用于统计；已存在时覆盖写入
+        sub_edge_exists = self.edge_key_exists("Subsidiary", self.genegerate_vid(subsidiary_name), self.genegerate_vid(parent_company), rank)
+
+        parent_edge_exists = self.edge_key_exists("Parent_Of", self.genegerate_vid(parent_company), self.genegerate_vid(subsidiary_name), rank)
+        
         report_date = convert_string_to_cypher_datetime(report_date)
         # 生成VID
         subsidiary_vid = self.genegerate_vid(subsidiary_name)
@@ -1055,7 +1099,7 @@ class JSONToNebulaInserter:
         
         success, _ = self.execute_query(subsidiary_query, {}, f"插入子公司关系: {subsidiary_name} -> {parent_company}")
         if success:
-            self.stats['edges_inserted'] += 1
+            self.stats['edges_updated' if sub_edge_exists else 'edges_inserted'] += 1
 
         # 插入母公司关系边 - 使用VID
         parent_query = f"""
@@ -1066,7 +1110,7 @@ class JSONToNebulaInserter:
         
         success, _ = self.execute_query(parent_query, {}, f"插入母公司关系: {parent_company} -> {subsidiary_name}")
         if success:
-            self.stats['edges_inserted'] += 1
+            self.stats['edges_updated' if parent_edge_exists else 'edges_inserted'] += 1
 
         # 查询Base_Compang_Info最新边,upsert total_assets, registered_capital!!!!!!!
         query = f"""
@@ -1113,16 +1157,7 @@ class JSONToNebulaInserter:
                 self.stats['edges_inserted'] += 1
         else:
             #关联公司
-            if self.edge_exists('Company',
-                {"company_name":company_name},
-                'Company',
-                {"company_name":related_company_name},
-                'Related_Company',
-                {"relationship":relationship,"related_ratio":relationship_percentage,"business_scope":business_scope}
-            ):
-                logger.info(f"关联公司关系边已存在: {company_name} -> {related_company_name}")
-                self.stats['edges_skipped'] += 1
-                return True
+            existed = self.edge_key_exists("Related_Company", self.genegerate_vid(related_company_name), self.genegerate_vid(company_name), rank)
                 
             # 确保关联公司顶点存在
             self.insert_company_vertex({'company_name': related_company_name})
@@ -1139,7 +1174,7 @@ class JSONToNebulaInserter:
             
             success, _ = self.execute_query(query, {}, f"插入关联公司关系: {company_name} -> {related_company_name}")
             if success:
-                self.stats['edges_inserted'] += 1
+                self.stats['edges_updated' if existed else 'edges_inserted'] += 1
         return success
     
     def insert_supplier_edge(self, supplier_data: Dict, company_name: str, report_date: str = None):
@@ -1157,23 +1192,15 @@ class JSONToNebulaInserter:
         if not supplier_name:
             return False
             
-        # 检查边是否已存在
-        if self.edge_exists('Company',
-            {"company_name":supplier_name},
-            'Company',
-            {"company_name":company_name},
-            'Suppiler',
-            {"supply_percentage":supply_percentage,"supplier_amount":supply_amount,"currency":currency,"supply_content":supply_content,"is_major_supplier":is_major_supplier}
-        ):
-            logger.info(f"供应商关系边已存在: {supplier_name} -> {company_name}")
-            self.stats['edges_skipped'] += 1
-            return True
+        # 计算rank
+        rank = calculate_rank_from_date(report_date or supplier_data.get('report_period', ''))
+
+        # 边键是否已存在，仅用于统计；已存在时覆盖写入
+        existed = self.edge_key_exists("Suppiler", self.genegerate_vid(supplier_name), self.genegerate_vid(company_name), rank)
             
         # 确保供应商顶点存在
         self.insert_company_vertex({'company_name': supplier_name})
         
-        # 计算rank
-        rank = calculate_rank_from_date(report_date or supplier_data.get('report_period', ''))
         report_date = convert_string_to_cypher_datetime(report_date)
         # 生成VID
         supplier_vid = self.genegerate_vid(supplier_name)
@@ -1187,7 +1214,7 @@ class JSONToNebulaInserter:
         
         success, _ = self.execute_query(query, {}, f"插入供应关系: {supplier_name} -> {company_name}")
         if success:
-            self.stats['edges_inserted'] += 1
+            self.stats['edges_updated' if existed else 'edges_inserted'] += 1
         return success
     
     def insert_customer_edge(self, customer_data: Dict, company_name: str, report_date: str = None):
@@ -1204,23 +1231,14 @@ class JSONToNebulaInserter:
         if not customer_name:
             return False
             
-        # 检查边是否已存在
-        if self.edge_exists('Company',
-            {"company_name":customer_name},
-            'Company',
-            {"company_name":company_name},
-            'Customer',
-            {"customer_percentage":customer_percentage,"customer_amount":customer_amount,"currency":currency,
-                "business_content":business_content,"is_major_customer":is_major_customer}
-        ):
-            logger.info(f"客户关系边已存在: {customer_name} -> {company_name}")
-            self.stats['edges_skipped'] += 1
-            return True
+        # 计算rank
+        rank = calculate_rank_from_date(report_date or customer_data.get('report_period', ''))
+
+        # 边键是否已存在，仅用于统计；已存在时覆盖写入
+        existed = self.edge_key_exists("Customer", self.genegerate_vid(customer_name), self.genegerate_vid(company_name), rank)
             
         # 确保客户顶点存在
         self.insert_company_vertex({'company_name': customer_name})
-        # 计算rank
-        rank = calculate_rank_from_date(report_date or customer_data.get('report_period', ''))
         report_date = convert_string_to_cypher_datetime(report_date)
         # 生成VID
         customer_vid = self.genegerate_vid(customer_name)
@@ -1235,7 +1253,7 @@ class JSONToNebulaInserter:
         
         success, _ = self.execute_query(query, {}, f"插入客户关系: {customer_name} -> {company_name}")
         if success:
-            self.stats['edges_inserted'] += 1
+            self.stats['edges_updated' if existed else 'edges_inserted'] += 1
         return success
     
     
@@ -1264,22 +1282,12 @@ class JSONToNebulaInserter:
         if not product_name:
             return False
             
-        # 检查边是否已存在
-        if self.edge_exists('Company',
-            {"company_name":company_name},
-            'Company',
-            {"company_name":product_name},
-            'Main_Business_Composition',
-            {"business_country":business_country,"revenue":revenue,"revenue_percentage":revenue_percentage,
-                "gross_profit_margin":gross_profit_margin,"cost":cost,"gross_profit":gross_profit,
-                "report_last_date":report_last_date,"business_description":business_description}
-        ):
-            logger.info(f"生产关系边已存在: {company_name} -> {product_name}")
-            self.stats['edges_skipped'] += 1
-            return True
-        
         # 计算rank
         rank = calculate_rank_from_date(report_date or product_data.get('report_period', ''))
+
+        # 边键是否已存在，仅用于统计；已存在时覆盖写入
+        existed = self.edge_key_exists("Main_Business_Composition", self.genegerate_vid(company_name), self.genegerate_vid(product_name), rank)
+        
         report_date = convert_string_to_cypher_datetime(report_date)    
         # 生成VID
         company_vid = self.genegerate_vid(company_name)
@@ -1295,9 +1303,53 @@ class JSONToNebulaInserter:
         
         success, _ = self.execute_query(query, {}, f"插入主营业务构成关系: {company_name} -> {product_name}")
         if success:
-            self.stats['edges_inserted'] += 1
+            self.stats['edges_updated' if existed else 'edges_inserted'] += 1
         return success
     
+    def insert_company_profile(self, company_info: Dict, stock_info: Dict, report_last_date: str) -> str:
+        """插入公司基本信息、股票信息及关系，返回公司名称（为空时返回空字符串）"""
+        company_name = company_info.get('company_name', '') if company_info else ''
+        if company_name == "null":
+            company_name = ""
+        if not company_name:
+            return ""
+
+        self.insert_company_vertex(company_info)
+        self.insert_base_company_edge(company_info, report_last_date)
+
+        # 插入股票信息及关系
+        if stock_info:
+            self.insert_stock_info(stock_info, company_info, report_last_date)
+        return company_name
+
+    def insert_stock_info(self, stock_info: Dict, company_info: Dict, report_last_date: str):
+        """插入股票顶点及股本信息边"""
+        if self.insert_stock_vertex(stock_info):
+            stock_code = stock_info.get('stock_code', '')
+            if stock_code:
+                self.insert_shareholder_vertex(stock_info, company_info, report_last_date)
+
+    def insert_entity(self, key: str, item: Dict, company_name: str, report_last_date: str):
+        """按字段名插入单个列表元素（董监高、股东、子公司、关联方、供应商、客户、主营构成）"""
+        if not item:
+            return
+        if key == 'persons':
+            self.insert_person_vertex(item)
+            self.insert_position_status_edge(item, company_name, report_last_date)
+        elif key == 'shareholders':
+            self.insert_control_stake_edge(item, company_name, report_last_date)
+        elif key == 'subsidiaries':
+            self.insert_subsidiary_edge(item, company_name, report_last_date)
+        elif key == 'related_companies':
+            self.insert_related_company_edge(item, company_name, report_last_date)
+        elif key == 'major_suppliers':
+            self.insert_supplier_edge(item, company_name, report_last_date)
+        elif key == 'major_customers':
+            self.insert_customer_edge(item, company_name, report_last_date)
+        elif key == 'main_business_composition':
+            if self.insert_product_vertex(item):
+                self.insert_produces_edge(item, company_name, report_last_date)
+
     def insert_json_data(self, data: dict):
         """插入JSON中的数据"""
         # try:
@@ -1306,64 +1358,24 @@ class JSONToNebulaInserter:
         
         # 获取报告截止日期
         report_last_date = data.get('report_last_date', '')
+        self._edge_key_cache = {}
+        self.resolve_document_names(data)
         
-        # 1. 插入公司基本信息
+        # 1. 插入公司基本信息、股票信息及关系
         if 'company_info' in data and data['company_info']:
-            company_info = data['company_info']
-            company_name = company_info.get('company_name', '')
-            if company_name == "null":
-                company_name = ""
+            company_name = (data['company_info'].get('company_name') or '') if isinstance(data['company_info'], dict) else ''
+            if company_name:
+                # 一次批量查询本文档所有待写入边是否已存在
+                self.prefetch_edge_keys(self.document_edge_keys(data, company_name, report_last_date))
+            company_name = self.insert_company_profile(data['company_info'], data.get('stock_info'), report_last_date)
             
             if company_name:
-                self.insert_company_vertex(company_info)
-                self.insert_base_company_edge(company_info, report_last_date)
-
-                # 2. 插入股票信息及关系
-                if 'stock_info' in data and data['stock_info']:
-                    stock_info = data['stock_info']
-                    company_info = data['company_info']
-                    if self.insert_stock_vertex(stock_info):
-                        stock_code = stock_info.get('stock_code', '')
-                        if stock_code:
-                            self.insert_shareholder_vertex(stock_info, company_info,report_last_date)
-                
-                # 3. 插入董监高信息
-                if 'persons' in data and data['persons']:
-                    for person in data['persons']:
-                        self.insert_person_vertex(person)
-                        self.insert_position_status_edge(person, company_name, report_last_date)
-                
-                # 4. 插入股东关系
-                if 'shareholders' in data and data['shareholders']:
-                    for shareholder in data['shareholders']:
-                        self.insert_control_stake_edge(shareholder, company_name, report_last_date)
-                
-                # 5. 插入子公司/母公司关系
-                if 'subsidiaries' in data and data['subsidiaries']:
-                    for subsidiary in data['subsidiaries']:
-                        self.insert_subsidiary_edge(subsidiary, company_name, report_last_date)
-                
-                # 6. 插入关联公司关系
-                if 'related_companies' in data and data['related_companies']:
-                    for related in data['related_companies']:
-                        self.insert_related_company_edge(related, company_name, report_last_date)
-                
-                # 7. 插入供应商关系
-                if 'major_suppliers' in data and data['major_suppliers']:
-                    for supplier in data['major_suppliers']:
-                        self.insert_supplier_edge(supplier, company_name, report_last_date)
-                
-                # 8. 插入客户关系
-                if 'major_customers' in data and data['major_customers']:
-                    for customer in data['major_customers']:
-                        self.insert_customer_edge(customer, company_name, report_last_date)
-                
-                # 9. 插入主营业务构成
-                if 'main_business_composition' in data and data['main_business_composition']:
-                    for product in data['main_business_composition']:
-                        if self.insert_product_vertex(product):
-                            self.insert_produces_edge(product, company_name, report_last_date)
+                # 2. 依次插入董监高、股东、子公司、关联方、供应商、客户、主营构成
+                for key in ENTITY_LIST_FIELDS:
+                    for item in data.get(key) or []:
+                        self.insert_entity(key, item, company_name, report_last_date)
                 
+                self.invalidate_company_cache(company_name)
                 logger.info(f"JSON数据插入完成: {company_name}")
             else:
                 logger.error("公司名称为空，无法插入数据")
@@ -1373,6 +1385,80 @@ class JSONToNebulaInserter:
         # except Exception as e:
         #     logger.error(f"插入JSON数据失败: {e}")
         #     raise
+
+    def prefetch_pending_edge_keys(self, data: dict, pending: list):
+        """流式插入时，公司信息到达后批量预取已缓存的字段和列表元素对应的边键"""
+        company_info = data.get('company_info')
+        company_name = (company_info.get('company_name') or '') if isinstance(company_info, dict) else ''
+        if not company_name:
+            return
+        partial = {key: value for key, value in data.items() if key not in ENTITY_LIST_FIELDS}
+        for key, item in pending:
+            partial.setdefault(key, []).append(item)
+        self.prefetch_edge_keys(self.document_edge_keys(partial, company_name, data.get('report_last_date') or ''))
+
+    def insert_stream_events(self, events) -> dict:
+        """
+        边解析边插入流式抽取结果
+
+        公司名称和报告期到达前的事件先缓存，之后每个闭合的列表元素立即写入；
+        流中途失败时已写入的数据保留，异常继续向上抛出
+
+        Args:
+            events: utils.stream_json.iter_json_events 产出的 (事件类型, 字段名, 值) 序列
+
+        Returns:
+            dict: 与insert_json_data输入结构一致的完整抽取结果
+        """
+        logger.info(f"开始流式插入JSON数据")
+        data = {}
+        pending = []
+        company_name = ""
+        inserted = 0
+        self._edge_key_cache = {}
+        try:
+            for kind, key, value in events:
+                self.resolve_company_names(key, value)
+                if kind == "field":
+                    data[key] = value
+                    if key == 'stock_info' and company_name and value:
+                        self.insert_stock_info(value, data['company_info'], data.get('report_last_date') or '')
+                elif key in ENTITY_LIST_FIELDS:
+                    if company_name:
+                        self.insert_entity(key, value, company_name, data.get('report_last_date') or '')
+                        inserted += 1
+                    else:
+                        pending.append((key, value))
+
+                # 公司信息和报告期都已到达后插入公司节点，并补写之前缓存的元素
+                if not company_name and data.get('company_info') and 'report_last_date' in data:
+                    self.prefetch_pending_edge_keys(data, pending)
+                    company_name = self.insert_company_profile(data['company_info'], data.get('stock_info'), data['report_last_date'] or '')
+                    if company_name:
+                        for pending_key, pending_item in pending:
+                            self.insert_entity(pending_key, pending_item, company_name, data['report_last_date'] or '')
+                        inserted += len(pending)
+                        pending = []
+        except Exception:
+            logger.error(f"流式抽取中断，已写入 {inserted} 个实体: {company_name}")
+            self.invalidate_company_cache(company_name)
+            raise
+
+        # 模型未按顺序输出报告期时，流结束后再整体补写
+        if not company_name:
+            self.prefetch_pending_edge_keys(data, pending)
+            company_name = self.insert_company_profile(data.get('company_info'), data.get('stock_info'), data.get('report_last_date') or '')
+            if company_name:
+                for pending_key, pending_item in pending:
+                    self.insert_entity(pending_key, pending_item, company_name, data.get('report_last_date') or '')
+            else:
+                logger.error("公司名称为空，无法插入数据")
+
+        self.invalidate_company_cache(company_name)
+        logger.info(f"流式JSON数据插入完成: {company_name}")
+        # 字段事件中的列表是与元素事件分别解析的副本，同样替换为规范化名称，使返回结果与图谱一致；元素事件已计数
+        self.resolve_document_names(data, count=False)
+        return data
     
     def run_insertion(self, json_data: dict):
         """运行完整的数据插入流程"""
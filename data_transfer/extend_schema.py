@@ -3,17 +3,82 @@
 """
 Extend NebulaGraph Schema for JSON Data
 为支持JSON数据中的额外字段扩展NebulaGraph Schema
+
+子命令：
+    python data_transfer/extend_schema.py schema     # 扩展Schema
+    python data_transfer/extend_schema.py index      # 按代码中实际发出的查询补建tag/edge索引并重建
 """
 
+import os
+import re
+import glob
+import json
+import time
 import logging
+import argparse
 from nebula3.gclient.net import ConnectionPool
 from nebula3.Config import Config
-from typing import Dict
+from typing import Dict, List, Set, Tuple
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 索引顾问默认扫描的代码和nl2cypher生成结果
+INDEX_SCAN_SOURCES = [
+    os.path.join(PROJECT_ROOT, 'data_transfer', 'JSONToNebula.py'),
+    os.path.join(PROJECT_ROOT, 'nl2cypher', '*.py'),
+]
+INDEX_SCAN_CYPHER_JSON = [os.path.join(PROJECT_ROOT, 'nl2cypher', 'YXSupplyChains_cypher.json')]
+# string属性建索引时的前缀长度（字节），Nebula上限为256
+INDEX_STRING_LENGTH = 256
+
+# nGQL中依赖索引的写法：LOOKUP ON X WHERE ...、MATCH (v:Tag {prop: ...})、WHERE v.Tag.prop 比较
+LOOKUP_PATTERN = re.compile(r'LOOKUP\s+ON\s+`?(\w+)`?(?:\s+WHERE\s+(.*?))?(?=\s+YIELD\b|\||;|$)', re.IGNORECASE | re.DOTALL)
+MATCH_NODE_PATTERN = re.compile(r'\(\s*\w*\s*:\s*`?(\w+)`?\s*\{([^}]*)\}')
+MATCH_WHERE_PATTERN = re.compile(r'\b\w+\.(\w+)\.(\w+)\s*(?:==|>=|<=|>|<|\bIN\b|\bSTARTS\s+WITH\b|\bCONTAINS\b)', re.IGNORECASE)
+PROPERTY_KEY_PATTERN = re.compile(r'`?(\w+)`?\s*:')
+
+
+def scan_ngql_text(text: str) -> Set[Tuple[str, str]]:
+    """
+    从nGQL文本中提取依赖索引的 (tag/edge名, 属性名)；属性名为空表示不带条件的LOOKUP，只需该schema上存在任一索引
+    """
+    requirements = set()
+    for name, where in LOOKUP_PATTERN.findall(text):
+        props = re.findall(rf'\b{name}\.`?(\w+)`?', where or '')
+        if not props:
+            requirements.add((name, ''))
+        requirements.update((name, prop) for prop in props)
+    if re.search(r'\bMATCH\b', text, re.IGNORECASE):
+        for name, props in MATCH_NODE_PATTERN.findall(text):
+            requirements.update((name, prop) for prop in PROPERTY_KEY_PATTERN.findall(props))
+        requirements.update(MATCH_WHERE_PATTERN.findall(text))
+    return requirements
+
+
+def collect_index_requirements(sources: List[str] = None, cypher_json_paths: List[str] = None) -> Set[Tuple[str, str]]:
+    """
+    汇总源码里的nGQL字符串以及nl2cypher生成结果中的索引需求
+
+    插入器的边存在性检查按 src->dst@rank 键 FETCH，顶点检查按VID匹配，均不依赖属性索引
+    """
+    requirements = set()
+    for pattern in sources or INDEX_SCAN_SOURCES:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, 'r', encoding='utf-8') as f:
+                requirements |= scan_ngql_text(f.read())
+    for path in cypher_json_paths or INDEX_SCAN_CYPHER_JSON:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for ngql in json.load(f).values():
+                requirements |= scan_ngql_text(ngql)
+    return requirements
+
+
 class SchemaExtender:
     def __init__(self, nebula_config: Dict, space_name: str = "supply_chain"):
         """
@@ -77,6 +142,136 @@ class SchemaExtender:
             logger.error(f"{description}异常: {e}")
             return False
     
+    def fetch_rows(self, query: str) -> List[Dict]:
+        """执行查询并以字典列表返回结果，失败时抛出异常"""
+        result = self.nebula_session.execute(query)
+        if not result.is_succeeded():
+            raise Exception(f"{query} 执行失败: {result.error_msg()}")
+        return result.as_primitive()
+
+    def list_schema_names(self) -> Dict[str, str]:
+        """返回 {tag/edge名: 'TAG'/'EDGE'}"""
+        kinds = {}
+        for kind in ('TAG', 'EDGE'):
+            for row in self.fetch_rows(f"SHOW {kind}S"):
+                kinds[row['Name']] = kind
+        return kinds
+
+    def list_indexes(self, kind: str) -> Dict[str, List[List[str]]]:
+        """返回 {tag/edge名: [已有索引的字段列表]}"""
+        indexes = {}
+        by_column = 'By Tag' if kind == 'TAG' else 'By Edge'
+        for row in self.fetch_rows(f"SHOW {kind} INDEXES"):
+            indexes.setdefault(row[by_column], []).append(list(row.get('Columns') or []))
+        return indexes
+
+    def property_types(self, kind: str, name: str) -> Dict[str, str]:
+        return {row['Field']: str(row['Type']).lower() for row in self.fetch_rows(f"DESCRIBE {kind} `{name}`")}
+
+    def plan_indexes(self, requirements) -> List[Tuple[str, str, str]]:
+        """
+        对照已有索引给出需要新建的索引
+
+        已有索引的第一个字段与过滤属性相同即视为可用（Nebula按最左前缀匹配索引）
+
+        Returns:
+            list: [(索引名, 'TAG'/'EDGE', CREATE INDEX 语句)]
+        """
+        kinds = self.list_schema_names()
+        existing = {kind: self.list_indexes(kind) for kind in ('TAG', 'EDGE')}
+        types_cache = {}
+        plans = []
+        for name, prop in sorted(requirements):
+            kind = kinds.get(name)
+            if kind is None:
+                logger.warning(f"跳过不存在的tag/edge: {name}")
+                continue
+            indexed = existing[kind].get(name, [])
+            if (not prop and indexed) or any(columns and columns[0] == prop for columns in indexed):
+                continue
+            if prop:
+                if (kind, name) not in types_cache:
+                    types_cache[(kind, name)] = self.property_types(kind, name)
+                prop_type = types_cache[(kind, name)].get(prop)
+                if prop_type is None:
+                    logger.warning(f"跳过不存在的属性: {name}.{prop}")
+                    continue
+                column = f"`{prop}`({INDEX_STRING_LENGTH})" if prop_type == 'string' else f"`{prop}`"
+                index_name = f"idx_{name}_{prop}"
+            else:
+                column = ""
+                index_name = f"idx_{name}"
+            plans.append((index_name, kind, f"CREATE {kind} INDEX IF NOT EXISTS `{index_name}` ON `{name}`({column})"))
+            existing[kind].setdefault(name, []).append([prop] if prop else [])
+        return plans
+
+    def wait_job(self, job_id: int, poll_interval: float = 2.0, timeout: float = 3600) -> str:
+        """轮询 SHOW JOB 直到作业结束，返回最终状态"""
+        start_time = time.time()
+        status = "QUEUE"
+        while time.time() - start_time < timeout:
+            rows = self.fetch_rows(f"SHOW JOB {job_id}")
+            status = str(rows[0].get('Status', '')) if rows else "UNKNOWN"
+            finished = sum(1 for row in rows[1:] if str(row.get('Status', '')) == 'FINISHED')
+            logger.info(f"索引重建作业 {job_id}: {status} ({finished}/{max(len(rows) - 1, 0)} 个任务完成)")
+            if status in ('FINISHED', 'FAILED', 'STOPPED'):
+                return status
+            time.sleep(poll_interval)
+        return status
+
+    def wait_indexes(self, indexes: List[Tuple[str, str]], poll_interval: float = 2.0, timeout: float = 120) -> List[Tuple[str, str]]:
+        """
+        轮询 SHOW TAG/EDGE INDEXES 直到新建的索引全部可见（元数据已同步到graphd）
+
+        Args:
+            indexes: [(索引名, 'TAG'/'EDGE')]
+
+        Returns:
+            list: 超时仍不可见的索引
+        """
+        start_time = time.time()
+        pending = list(indexes)
+        while pending:
+            visible = {kind: {row.get('Index Name') for row in self.fetch_rows(f"SHOW {kind} INDEXES")}
+                       for kind in {kind for _, kind in pending}}
+            pending = [(index_name, kind) for index_name, kind in pending if index_name not in visible[kind]]
+            if not pending or time.time() - start_time >= timeout:
+                break
+            logger.info(f"等待 {len(pending)} 个新建索引同步: {[index_name for index_name, _ in pending]}")
+            time.sleep(poll_interval)
+        return pending
+
+    def run_index_advisor(self, sources: List[str] = None, cypher_json_paths: List[str] = None, dry_run: bool = False):
+        """扫描查询中的属性过滤，创建缺失的索引并重建"""
+        requirements = collect_index_requirements(sources, cypher_json_paths)
+        logger.info(f"扫描到 {len(requirements)} 个属性过滤: {sorted(requirements)}")
+        try:
+            self.connect_database()
+            plans = self.plan_indexes(requirements)
+            if not plans:
+                logger.info("所有属性过滤均已有可用索引")
+                return
+            for _, _, statement in plans:
+                logger.info(f"{'[dry-run] ' if dry_run else ''}{statement}")
+            if dry_run:
+                return
+
+            created = [(index_name, kind) for index_name, kind, statement in plans
+                       if self.execute_query(statement, f"创建索引 {index_name}")]
+            # 新建索引在 SHOW INDEXES 中可见后才能重建
+            missing = self.wait_indexes(created)
+            for index_name, kind in missing:
+                logger.error(f"索引 {index_name} 等待同步超时，跳过重建")
+            for index_name, kind in created:
+                if (index_name, kind) in missing:
+                    continue
+                rows = self.fetch_rows(f"REBUILD {kind} INDEX `{index_name}`")
+                job_id = rows[0]['New Job Id']
+                status = self.wait_job(job_id)
+                logger.info(f"索引 {index_name} 重建{'完成' if status == 'FINISHED' else '未完成: ' + status}")
+        finally:
+            self.close_connection()
+
     def extend_schema(self):
         """扩展Schema以支持JSON数据"""
         
@@ -177,9 +372,20 @@ if __name__ == "__main__":
         'user': 'root',
         'password': 'nebula'
     }
-    
+
+    parser = argparse.ArgumentParser(description="NebulaGraph Schema/索引维护")
+    parser.add_argument("command", nargs="?", default="schema", choices=["schema", "index"], help="schema: 扩展Schema；index: 补建索引")
+    parser.add_argument("--space", default="supply_chain", help="NebulaGraph space名称")
+    parser.add_argument("--source", nargs="*", default=None, help="扫描的源码文件（支持通配符）")
+    parser.add_argument("--cypher-json", nargs="*", default=None, help="扫描的nl2cypher生成结果")
+    parser.add_argument("--dry-run", action="store_true", help="只打印需要创建的索引")
+    args = parser.parse_args()
+
     # 创建扩展器
-    extender = SchemaExtender(nebula_config)
-    
-    # 执行扩展
-    extender.run_extension() 
\ No newline at end of file
+    extender = SchemaExtender(nebula_config, space_name=args.space)
+
+    if args.command == "index":
+        extender.run_index_advisor(args.source, args.cypher_json, dry_run=args.dry_run)
+    else:
+        # 执行扩展
+        extender.run_extension()
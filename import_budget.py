@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模块导入耗时预算检查
+- 每个模块在独立的子进程中以 python -X importtime 导入，取该模块的累计导入耗时与预算比较
+- 导入阶段不应连接数据库或读取大文件，超出预算时列出自身耗时最高的子模块，便于定位
+- 任一模块超出预算或导入失败时退出码为1
+
+用法：
+    python import_budget.py
+    python import_budget.py --module pipeline=1500 --top 10
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 模块 → 导入耗时预算（毫秒），包含第三方依赖的导入时间
+IMPORT_BUDGETS_MS = {
+    "configs.config": 50,
+    "utils.es": 100,
+    "utils.mongo": 100,
+    "utils.mysql_util": 800,
+    "utils.redis_cache": 300,
+    "utils.company_resolver": 100,
+    "utils.report_labels": 100,
+    "utils.concurrency": 100,
+    "utils.llm_balancer": 100,
+    "utils.context_packer": 100,
+    "data_transfer.JSONToNebula": 800,
+    "models.model_infer": 1500,
+    "pipeline": 2500,
+}
+
+
+def measure_import(module):
+    """
+    子进程中导入模块并解析 -X importtime 输出
+
+    Returns:
+        tuple: (累计耗时ms, [(自身耗时ms, 子模块名)], 错误信息)
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True)
+    cumulative_ms = None
+    entries = []
+    errors = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2].strip()
+        entries.append((self_us / 1000, name))
+        if name == module:
+            cumulative_ms = cumulative_us / 1000
+    error = "\n".join(errors[-5:]) if result.returncode != 0 else None
+    return cumulative_ms, sorted(entries, reverse=True), error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模块导入耗时预算检查")
+    parser.add_argument("--module", action="append", default=[], help="只检查指定模块，可写为 模块=预算毫秒")
+    parser.add_argument("--top", type=int, default=5, help="超出预算时列出的耗时子模块数")
+    args = parser.parse_args()
+
+    budgets = {}
+    for item in args.module:
+        name, _, budget = item.partition("=")
+        budgets[name] = float(budget) if budget else IMPORT_BUDGETS_MS.get(name, 100)
+    budgets = budgets or IMPORT_BUDGETS_MS
+
+    failed = []
+    for module, budget in budgets.items():
+        cumulative_ms, entries, error = measure_import(module)
+        if error or cumulative_ms is None:
+            failed.append(module)
+            print(f"✗ {module}: 导入失败\n    {error}")
+            continue
+        status = "✓" if cumulative_ms <= budget else "✗"
+        print(f"{status} {module}: {cumulative_ms:.1f}ms / 预算 {budget:.0f}ms")
+        if cumulative_ms > budget:
+            failed.append(module)
+            for self_ms, name in entries[:args.top]:
+                print(f"    {self_ms:8.1f}ms  {name}")
+
+    if failed:
+        print(f"\n{len(failed)} 个模块超出预算或导入失败: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\n全部 {len(budgets)} 个模块在预算内")
+
+
+if __name__ == "__main__":
+    main()
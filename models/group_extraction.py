@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分实体组并发抽取
+将 rerank 筛选后的章节按实体类型路由到各分组提示词，使用对应子schema并发调用模型，最后合并为完整的抽取结果
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import QWEN_CONTEXT_TOKEN_BUDGET, QWEN_MAX_EXTRACTION_CALLS, QWEN_GROUP_MAX_WORKERS
+from models.model_infer import qwen_chat, ENTITY_GROUP_SCHEMAS
+from models.prompt import ENTITY_GROUP_PROMPTS
+from utils.context_packer import pack_sections, content_budget, merge_extraction_results
+
+logger = logging.getLogger(__name__)
+
+# 各实体组的章节路由关键词（匹配章节标题及rerank命中的报告标签），一个章节可路由到多个组
+ENTITY_GROUP_KEYWORDS = {
+    "profile": ["公司简介", "基本情况", "主要会计数据", "财务指标", "股票", "证券", "释义"],
+    "persons": ["董事", "监事", "高级管理人员", "高管", "员工"],
+    "shareholders": ["股东", "股本", "持股"],
+    "subsidiaries": ["子公司", "参股公司", "控股公司", "关联", "合并范围"],
+    "supply_chain": ["供应商", "客户", "采购", "销售合同"],
+    "business": ["主营", "收入和成本", "分行业", "分产品", "分地区", "业务情况"],
+}
+# 未命中公司概况关键词时，取前几个章节作为概况抽取的上下文
+PROFILE_FALLBACK_SECTIONS = 3
+
+
+def route_sections(sections: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    按关键词将章节路由到各实体组
+
+    Args:
+        sections: 章节列表，每项包含 title、content、score，可选 label
+
+    Returns:
+        Dict[str, List[Dict]]: 实体组名到章节列表的映射，没有章节的组不出现在结果中
+    """
+    routed = {group: [] for group in ENTITY_GROUP_KEYWORDS}
+    for section in sections:
+        text = f"{section.get('title', '')} {section.get('label', '')}"
+        for group, keywords in ENTITY_GROUP_KEYWORDS.items():
+            if any(keyword in text for keyword in keywords):
+                routed[group].append(section)
+
+    # 公司概况是入库的前提，必须抽取
+    if not routed["profile"]:
+        routed["profile"] = sections[:PROFILE_FALLBACK_SECTIONS]
+    return {group: group_sections for group, group_sections in routed.items() if group_sections}
+
+
+def _extract_group_batch(group: str, batch: List[str]) -> Dict[str, Any]:
+    """使用实体组的提示词和子schema完成一次抽取调用"""
+    prompt = ENTITY_GROUP_PROMPTS[group].format(contents='\n'.join(batch))
+    response = qwen_chat(prompt, response_format=ENTITY_GROUP_SCHEMAS[group]).replace('None', '')
+    return json.loads(response)
+
+
+def grouped_extraction(sections: List[Dict[str, Any]], max_workers: int = QWEN_GROUP_MAX_WORKERS) -> Dict[str, Any]:
+    """
+    分实体组并发抽取并合并结果
+
+    Args:
+        sections: rerank筛选后的章节列表
+        max_workers: 并发调用模型的最大线程数
+
+    Returns:
+        Dict: 与CompanyExtractionResult结构一致的合并结果
+    """
+    tasks = []
+    for group, group_sections in route_sections(sections).items():
+        budget = content_budget(ENTITY_GROUP_PROMPTS[group], QWEN_CONTEXT_TOKEN_BUDGET)
+        for batch in pack_sections(group_sections, budget, max_batches=QWEN_MAX_EXTRACTION_CALLS):
+            tasks.append((group, batch))
+    logger.info(f"分组抽取: {len(tasks)} 次抽取调用，涉及实体组 {sorted({group for group, _ in tasks})}")
+
+    # 按任务顺序保存结果，保证合并时同一字段的取值顺序稳定
+    partial_results = [None] * len(tasks)
+    failed_groups = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_extract_group_batch, group, batch): index for index, (group, batch) in enumerate(tasks)}
+        for future in as_completed(futures):
+            index = futures[future]
+            group = tasks[index][0]
+            try:
+                partial_results[index] = future.result()
+            except Exception as e:
+                # 单个实体组失败不影响其他组的结果
+                failed_groups.add(group)
+                logger.error(f"实体组 {group} 抽取失败: {e}")
+
+    if "profile" in failed_groups:
+        raise RuntimeError(f"公司概况抽取失败，无法入库 (失败实体组: {sorted(failed_groups)})")
+    if failed_groups:
+        logger.warning(f"以下实体组抽取失败，结果中对应字段为空: {sorted(failed_groups)}")
+    return merge_extraction_results(partial_results)
@@ -9,8 +9,11 @@ from pathlib import Path
 
 add_path = str(Path(__file__).parent.parent)
 sys.path.append(add_path)
-os.chdir(add_path)
 from models.prompt import WIND_ANNO_PROMPT
+from configs.config import QWEN_BASE_URL, QWEN_API_KEY, QWEN_MODEL, QWEN_BACKEND_API_KEY, QWEN_BACKEND_MODEL
+from utils.concurrency import QWEN_LIMITER
+from utils.llm_balancer import QWEN_BALANCER
+from contextlib import contextmanager
 
 
 # 基础实体模型
@@ -194,6 +197,62 @@ class CompanyExtractionResult(BaseModel):
     # data_quality_notes: Optional[List[str]] = Field(None, description="数据质量说明")
     # missing_information: Optional[List[str]] = Field(None, description="缺失信息列表")
 
+# 流式抽取schema：字段与CompanyExtractionResult一致，但报告日期和公司信息排在最前，
+# 使流式解析时先拿到入库所需的公司名称和报告期，后续列表元素可逐个写入图数据库
+class CompanyExtractionStreamResult(BaseModel):
+    """公司信息流式提取结果模型"""
+    report_last_date: Optional[str] = Field(None, description="报告截止日期（格式：年+当前报告期结束时间，如：2023年12月31日）")
+    document_type: Optional[str] = Field(None, description="文档类型（如：年报、半年报、一季报、三季报等）")
+    company_info: Optional[Company] = Field(None, description="公司基本信息")
+    stock_info: Optional[Stock] = Field(None, description="股票信息")
+    persons: Optional[List[Person]] = Field(None, description="人员信息列表")
+    shareholders: Optional[List[Shareholder]] = Field(None, description="主要股东信息列表")
+    subsidiaries: Optional[List[Subsidiary]] = Field(None, description="子公司信息列表")
+    related_companies: Optional[List[RelatedParty]] = Field(None, description="关联公司信息列表")
+    major_suppliers: Optional[List[Supplier]] = Field(None, description="主要供应商信息列表")
+    major_customers: Optional[List[Customer]] = Field(None, description="主要客户信息列表")
+    main_business_composition: Optional[List[MainBusinessComposition]] = Field(None, description="主营构成信息列表")
+
+# 分组抽取子schema：字段与CompanyExtractionResult保持一致，便于合并
+class ProfileExtractionResult(BaseModel):
+    """公司概况抽取结果模型"""
+    company_info: Optional[Company] = Field(None, description="公司基本信息")
+    stock_info: Optional[Stock] = Field(None, description="股票信息")
+    report_last_date: Optional[str] = Field(None, description="报告截止日期（格式：年+当前报告期结束时间，如：2023年12月31日）")
+    document_type: Optional[str] = Field(None, description="文档类型（如：年报、半年报、一季报、三季报等）")
+
+class PersonExtractionResult(BaseModel):
+    """人员信息抽取结果模型"""
+    persons: Optional[List[Person]] = Field(None, description="人员信息列表")
+
+class ShareholderExtractionResult(BaseModel):
+    """股东信息抽取结果模型"""
+    shareholders: Optional[List[Shareholder]] = Field(None, description="主要股东信息列表")
+
+class SubsidiaryExtractionResult(BaseModel):
+    """子公司及关联方抽取结果模型"""
+    subsidiaries: Optional[List[Subsidiary]] = Field(None, description="子公司信息列表")
+    related_companies: Optional[List[RelatedParty]] = Field(None, description="关联公司信息列表")
+
+class SupplyChainExtractionResult(BaseModel):
+    """供应商及客户抽取结果模型"""
+    major_suppliers: Optional[List[Supplier]] = Field(None, description="主要供应商信息列表")
+    major_customers: Optional[List[Customer]] = Field(None, description="主要客户信息列表")
+
+class BusinessExtractionResult(BaseModel):
+    """主营构成抽取结果模型"""
+    main_business_composition: Optional[List[MainBusinessComposition]] = Field(None, description="主营构成信息列表")
+
+# 实体组名到子schema的映射，组名与models/prompt.py中的ENTITY_GROUP_FIELDS一致
+ENTITY_GROUP_SCHEMAS = {
+    "profile": ProfileExtractionResult,
+    "persons": PersonExtractionResult,
+    "shareholders": ShareholderExtractionResult,
+    "subsidiaries": SubsidiaryExtractionResult,
+    "supply_chain": SupplyChainExtractionResult,
+    "business": BusinessExtractionResult,
+}
+
 def get_models():
     client = OpenAI(
         api_key="Bearer sk-9AiXl4JTI3FCPUIAkEh0Yw", # 在这里将 MOONSHOT_API_KEY 替换为你从 Kimi 开放平台申请的 API Key
@@ -247,32 +306,61 @@ def gpt_chat(message):
         print(f"API调用错误: {e}")
         return None
 
-def qwen_chat(message):  
-    client = OpenAI(
-        api_key="sk-1234",
-        base_url="http://10.100.0.205:4000",
+@contextmanager
+def qwen_client():
+    """
+    占用Qwen并发名额并选择后端，返回 (client, model, call)，调用方把生成量写入 call.units
+    配置了QWEN_BACKEND_HOSTS时直连负载最低的推理容器，按容器分别自适应限制并发；否则走QWEN_BASE_URL代理，共用一个并发上限
+    """
+    # 按服务端延迟和429/5xx自适应限制并发，耗时按生成量折算
+    if QWEN_BALANCER is None:
+        with QWEN_LIMITER.call() as call:
+            yield OpenAI(api_key=QWEN_API_KEY, base_url=QWEN_BASE_URL), QWEN_MODEL, call
+        return
+    with QWEN_BALANCER.call() as call:
+        yield OpenAI(api_key=QWEN_BACKEND_API_KEY, base_url=call.base_url), QWEN_BACKEND_MODEL, call
 
-        # base_url="http://127.0.0.1:30000/v1",
-        # api_key="EMPTY",
-        
-    )
-   
-    completion = client.chat.completions.parse(
-        model="Qwen3-30B-A3B-Thinking-2507",#Qwen3-30B-A3B-Instruct-2507  
-        # model= "Qwen3-Next-80B-A3B-Thinking",
+def qwen_chat(message, response_format=CompanyExtractionResult):  
+    # 单一代理：base_url=QWEN_BASE_URL；本机容器：base_url="http://127.0.0.1:30000/v1", api_key="EMPTY"
+    with qwen_client() as (client, model, call):
+        completion = client.chat.completions.parse(
+            model=model,#Qwen3-30B-A3B-Instruct-2507  
+            # model= "Qwen3-Next-80B-A3B-Thinking",
+            messages=[
+                # {"role": "system", "content": "严格遵循：仅从提供的文档中抽取信息；禁止编造、禁止任何计算或单位换算；缺失即为null；所有数值保持原文格式（包含小数位数、千分位和单位）。输出必须符合指定schema。"},
+                {"role":"user","content":message}
+            ],
+            temperature=0.6,  # 降低随机性，提高输出一致性
+            top_p=0.95,        # 降低采样范围，减少胡乱生成
+            # presence_penalty=0.5,  # 移除惩罚项，避免干扰信息提取
+            extra_body={"top_k":20,"min_p":0.0},  # 减少候选词数量
+            response_format=response_format,
+            timeout=3600
+        )
+        if completion.usage is not None:
+            call.units = completion.usage.completion_tokens
+    
+    return completion.choices[0].message.content
+
+def qwen_chat_stream(message, response_format=CompanyExtractionStreamResult):
+    """流式调用qwen结构化输出，逐段返回模型生成的JSON文本"""
+    # 并发名额和后端占用到流结束为止，耗时按输出片段数折算
+    with qwen_client() as (client, model, call), client.chat.completions.stream(
+        model=model,
         messages=[
-            # {"role": "system", "content": "严格遵循：仅从提供的文档中抽取信息；禁止编造、禁止任何计算或单位换算；缺失即为null；所有数值保持原文格式（包含小数位数、千分位和单位）。输出必须符合指定schema。"},
             {"role":"user","content":message}
         ],
-        temperature=0.6,  # 降低随机性，提高输出一致性
-        top_p=0.95,        # 降低采样范围，减少胡乱生成
-        # presence_penalty=0.5,  # 移除惩罚项，避免干扰信息提取
-        extra_body={"top_k":20,"min_p":0.0},  # 减少候选词数量
-        response_format=CompanyExtractionResult,
+        temperature=0.6,
+        top_p=0.95,
+        extra_body={"top_k":20,"min_p":0.0},
+        response_format=response_format,
         timeout=3600
-    )
-    
-    return completion.choices[0].message.content
+    ) as stream:
+        call.units = 0
+        for event in stream:
+            if event.type == "content.delta":
+                call.units += 1
+                yield event.delta
 
 # print(get_models())
 # print(qwen_chat("讲个笑话"))
@@ -1,8 +1,13 @@
-WIND_ANNO_PROMPT = """
+# 信息抽取提示词的公共开头
+_EXTRACTION_HEADER = """
 你是一个专业的金融文档信息提取助手。请仔细分析以下报告内容，提取关键的公司信息。
 
 ## 提取要求：
-1. **公司基本信息**：
+"""
+
+# 各字段的抽取要求，按CompanyExtractionResult的字段名组织，供整体抽取和分组抽取复用
+_FIELD_SECTIONS = {
+    "company_info": """1. **公司基本信息**：
    - company_name: 公司全称（使用完整的法定名称）
    - company_abbr: 公司简称
    - company_name_en: 公司英文名称
@@ -16,7 +21,8 @@ WIND_ANNO_PROMPT = """
    - total_assets: 总资产（保持原文格式和单位）
    - registered_capital: 注册资本（原文格式+单位，如23,959.28万元）
 
-2. **股票信息**：
+""",
+    "stock_info": """2. **股票信息**：
    - stock_code: 股票代码
    - stock_name: 证券名称/股票简称
    - list_status: 上市公司状态（保持原文表述：正常上市、终止上市、暂缓上市、退市整理等）
@@ -30,7 +36,8 @@ WIND_ANNO_PROMPT = """
    - cancel_risk_warning_time: 取消风险警示时间
    - risk_warning_status: 风险警示状态（ST、*ST、-B、RST、QB、QX、退市整理等）
 
-3. **董事、监事、高管人员信息**：
+""",
+    "persons": """3. **董事、监事、高管人员信息**：
    - person_name: 人员名称
    - person_name_en: 英文人员名称
    - position: 职位（董事、监事、高管等）
@@ -41,7 +48,8 @@ WIND_ANNO_PROMPT = """
    - is_active: 是否在职（true为在职，false为离职）
    - status_change_time: 状态信息变更时间
 
-4. **前十名股东信息（限售、非限售）**：
+""",
+    "shareholders": """4. **前十名股东信息（限售、非限售）**：
    - name: 股东名称（自然人姓名或机构名称）
    - shareholder_type: 股东类型（仅可为：自然人、投资基金、机构投资者）
    - shareholding_percentage: 持股比例（保持原文格式，如'10.5%'或'10.5'）
@@ -53,7 +61,8 @@ WIND_ANNO_PROMPT = """
    - share_percentage: 股份比例（保持原文格式，如'15.2%'或'15.2'）
    - vote_percentage: 投票权比例（保持原文格式，如'15.2%'或'15.2'）;特别注意：投票权比例不等于持股比例，只有文中特别写明了投票权比例才需要提取，未提及时请默认为null
 
-5. **子公司信息**：
+""",
+    "subsidiaries": """5. **子公司信息**：
    - subsidiary_name: 子公司名称
    - is_wholly_owned: 是否全资子公司（true/false）
    - subsidiary_type: 子公司类型（全资子公司、全资孙公司、全资曾孙公司、控股子公司、参股公司等）
@@ -68,14 +77,16 @@ WIND_ANNO_PROMPT = """
    - vote_percentage: 投票权比例（保持原文格式，如'15.2%'或'15.2'）；特别注意：投票权比例不等于持股比例，只有文中特别写明了投票权比例才需要提取，未提及时请默认为null
 
 
-6. **关联方信息**：
+""",
+    "related_companies": """6. **关联方信息**：
    - related_party_name: 关联方名称
    - related_party_type: 关联方类型（请根据关联方的实际性质准确识别：若关联方是具体的公司、企业、机构等法人实体，则根据其控制关系标注为"合营企业"或"联营企业"；若关联方是具体的个人姓名，则标注为"自然人"。判断时请重点关注关联方名称的特征：包含"有限公司"、"股份有限公司"、"集团"、"企业"、"投资"、"控股"等字样的通常为企业法人实体，应标注为合营企业或联营企业；明确的个人姓名则标注为自然人）
    - relationship: 关联关系描述(保留原文表述：如实际控制人近亲属之亲属控制的公司；持股5%以上股东)
    - relationship_percentage: 关联比例（保持原文格式，如'30%'或'30.0'）
    - business_scope: 经营范围
 
-7. **供应商信息**：
+""",
+    "major_suppliers": """7. **供应商信息**：
    - supplier_name: 供应商名称（严格要求：仅抽取具体明确的公司全称或自然人姓名。不得抽取以下类型的模糊指代：1）序号型指代如"第一供应商"、"第二供应商"、"供应商一"、"供应商二"等；2）字母型指代如"A公司"、"B公司"、"甲方"、"乙方"等；3）其他非具体名称的指代。只有当原文中明确给出具体的公司全称（如"北京科技股份有限公司"）或自然人姓名时才可抽取，否则该字段设为null）
    - supply_percentage: 供应商占比（保持原文格式，如'15.3%'或'15.3'）
    - supply_amount: 供应金额（保持原文格式和单位，如'1,000万元'）
@@ -84,7 +95,8 @@ WIND_ANNO_PROMPT = """
    - is_major_supplier: 是否为主要供应商（true/false）
    - report_period: 报告数据截止日期
 
-8. **客户信息**：
+""",
+    "major_customers": """8. **客户信息**：
    - customer_name: 客户名称（严格要求：仅抽取具体明确的公司全称或自然人姓名。不得抽取以下类型的模糊指代：1）序号型指代如"客户一"、"客户二"、"第一客户"、"第二客户"等；2）字母型指代如"A公司"、"B公司"、"甲方"、"乙方"等；3）其他非具体名称的指代。只有当原文中明确给出具体的公司全称（如"上海贸易有限公司"）或自然人姓名时才可抽取，否则该字段设为null）
    - customer_percentage: 客户占比（保持原文格式，如'20.5%'或'20.5'）
    - customer_amount: 客户金额（保持原文格式和单位，如'5,000万元'）
@@ -93,7 +105,8 @@ WIND_ANNO_PROMPT = """
    - is_major_customer: 是否为主要客户（true/false）
    - report_period: 报告数据截止日期
 
-9. **主营构成信息**（按产品分类、行业分类、地区分类等多维度全面提取）：
+""",
+    "main_business_composition": """9. **主营构成信息**（按产品分类、行业分类、地区分类等多维度全面提取）：
    - product_name: 主营产品名称
    - business_type: 业务类型（必须明确标注分类方式：产品分类、行业分类、地区分类等）
    - business_country: 业务所在国家
@@ -112,11 +125,17 @@ WIND_ANNO_PROMPT = """
    - 按行业分类：制造业、服务业等
    每个分类维度的每个条目都应该作为独立的main_business_composition记录
 
-10. **报告截止日期**：报告发布数据的截止时间，输出格式为年+当前报告期的结束时间（一季度：3月31日；半年报：6月30日；三季报：9月30日；年报：12月31日）
+""",
+    "report_last_date": """10. **报告截止日期**：报告发布数据的截止时间，输出格式为年+当前报告期的结束时间（一季度：3月31日；半年报：6月30日；三季报：9月30日；年报：12月31日）
+
+""",
+    "document_type": """11. **文档类型**：识别文档类型（如：年报、半年报、一季报、三季报等）
 
-11. **文档类型**：识别文档类型（如：年报、半年报、一季报、三季报等）
+""",
+}
 
-## 数据格式要求：
+# 数据格式要求、质量控制约束及文档内容占位
+_EXTRACTION_RULES = """## 数据格式要求：
 - **所有数值字段必须保持原文格式**：包括数字、百分比、金额等，完全按照原文中的表述提取，不允许任何形式的换算、计算或格式转换
 - **比例字段格式要求**：
   - shareholding_percentage（持股比例）、customer_percentage（客户占比）、supply_percentage（供应商占比）、relationship_percentage（关联比例）、ownership_percentage（持股比例）、share_percentage（股份比例）等请保持原文格式（如原文是"10.5%"则提取"10.5%"，如原文是"10.5"则提取"10.5"）
@@ -177,6 +196,26 @@ WIND_ANNO_PROMPT = """
 {contents}  
 """
 
+WIND_ANNO_PROMPT = _EXTRACTION_HEADER + "".join(_FIELD_SECTIONS.values()) + _EXTRACTION_RULES
+
+# 分组抽取：每个实体组只抽取对应字段，组名与models/model_infer.py中的子schema对应
+ENTITY_GROUP_FIELDS = {
+    "profile": ["company_info", "stock_info", "report_last_date", "document_type"],
+    "persons": ["persons"],
+    "shareholders": ["shareholders"],
+    "subsidiaries": ["subsidiaries", "related_companies"],
+    "supply_chain": ["major_suppliers", "major_customers"],
+    "business": ["main_business_composition"],
+}
+
+
+def build_group_prompt(fields):
+    """按字段列表拼接分组抽取提示词，复用整体抽取提示词中的字段要求和质量约束"""
+    return _EXTRACTION_HEADER + "".join(_FIELD_SECTIONS[field] for field in fields) + _EXTRACTION_RULES
+
+
+ENTITY_GROUP_PROMPTS = {group: build_group_prompt(fields) for group, fields in ENTITY_GROUP_FIELDS.items()}
+
 COMPANY_SEARCH_PROMPT = """
 请分析公司"{raw_org}"的详细信息，按照以下逻辑进行全面的企业关系网络分析：
 
@@ -1,7 +1,28 @@
-import json 
-from openai import OpenAI
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自然语言问题 → nGQL 批量生成
+- 固定的语法规则和图谱Schema放在system消息中并标记cache_control，所有问题共享同一前缀，便于服务端prompt缓存
+- 多线程并发生成，令牌桶限制请求速率
+- 每生成一条即原子写入输出JSON，中断后重跑跳过已生成的问题
+- 命中 templates.py 固定句式的问题直接使用模板nGQL，不调用LLM
+
+用法：
+    python nl2cypher/nl2cypher.py --workers 8 --rpm 60
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
 from datetime import datetime
-prompt= """
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from openai import OpenAI
+
+from templates import match_template, build_lookup_ngql
+
+NGQL_RULES = """
 Given the 【Schema】of NebulaGraph and the 【Question】, generate a **syntactically correct nGQL (NebulaGraph Query Language) query**.
 
 【Important】NebulaGraph uses nGQL, which is different from Neo4j's Cypher. You MUST follow NebulaGraph-specific syntax rules.
@@ -99,24 +120,51 @@ RETURN v.Player.name AS PlayerName, t.Team.name AS TeamName;
 - Ensure the query is executable in NebulaGraph
 - Use proper indentation for readability
 
-【Schema】
-{schema_info}
-
-【Question】
-{query_str}
 """
 
-def claude_chat(message):  
-    client = OpenAI(
-        api_key="Bearer sk-9AiXl4JTI3FCPUIAkEh0Yw", # 在这里将 MOONSHOT_API_KEY 替换为你从 Kimi 开放平台申请的 API Key
-        base_url="http://llmserver.rt-private-cloud.com/v1",
-    )
+DEFAULT_SCHEMA_PATH = './YXSupplyChains_desc.json'
+DEFAULT_OUTPUT_PATH = './YXSupplyChains_cypher.json'
+CLAUDE_MODEL = "anthropic/claude-opus-4-1-20250805-thinking"
+
+
+def build_system_prompt(schema_info):
+    """静态前缀：语法规则 + 图谱Schema，对所有问题保持逐字节一致"""
+    return NGQL_RULES + "【Schema】\n" + json.dumps(schema_info, ensure_ascii=False, indent=2)
+
+
+def build_messages(system_prompt, query_str):
+    """system消息标记为可缓存前缀，问题放在user消息中"""
+    return [
+        {
+            "role": "system",
+            "content": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+        },
+        {"role": "user", "content": f"【Question】\n{query_str}"}
+    ]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """进程内共享的OpenAI客户端（连接池复用）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(
+                    api_key="Bearer sk-9AiXl4JTI3FCPUIAkEh0Yw",
+                    base_url="http://llmserver.rt-private-cloud.com/v1",
+                )
+    return _client
+
+
+def claude_chat(messages):
     try:
-        result = client.chat.completions.parse(
-            model="anthropic/claude-opus-4-1-20250805-thinking",
-            messages=[
-                {"role":"user","content":message}
-            ],
+        result = get_client().chat.completions.create(
+            model=CLAUDE_MODEL,
+            messages=messages,
             temperature=0,
             max_completion_tokens=32768,
             timeout=600
@@ -127,6 +175,55 @@ def claude_chat(message):
         print(f"API调用错误: {e}")
         return None
 
+
+def clean_ngql(response):
+    """去掉代码块标记和换行，得到单行nGQL"""
+    return response.replace('```ngql', '').replace('```', '').replace('\n', '')
+
+
+class TokenBucket:
+    """令牌桶限速：每分钟最多 rate_per_minute 次请求，允许 burst 次突发"""
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResultWriter:
+    """生成结果的增量写入：每条结果到达后整体原子重写输出文件"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self._lock = threading.Lock()
+        self.results = {}
+        if os.path.exists(output_path):
+            with open(output_path, 'r', encoding='utf-8') as f:
+                self.results = json.load(f)
+
+    def add(self, query_str, ngql):
+        with self._lock:
+            self.results[query_str] = ngql
+            tmp_path = f"{self.output_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.output_path)
+
+
 query_list = [
     '"徕木股份"来自汽车电子领域的收入占其总收入的比例是多少？该业务是否是其核心增长引擎？',
     '查询所有半导体公司中毛利率大于10%的公司',
@@ -230,22 +327,69 @@ query_list = [
     '查询"中国移动"公告披露的公司资质'
 ]
 
-with open('./YXSupplyChains_desc.json', 'r', encoding='utf-8') as f:
-    schema_info = json.load(f)
-
-# 测试单个查询
-cypher_list = {}
-for query_str in query_list:
-   try:
-      cypher_prompt = prompt.format(schema_info=schema_info, query_str=query_str)
-      print(f'{datetime.now()} 开始查询: {query_str}')
-      response = claude_chat(cypher_prompt)
-      print(f"查询: {query_str}")
-      print(f"\n生成的nGQL:\n{response}")
-      if response is None:
-         continue
-      cypher_list[query_str] = response.replace('```ngql', '').replace('```', '').replace('\n', '')
-   except:
-      pass
-with open('./YXSupplyChains_cypher.json', 'w', encoding='utf-8') as f:
-    json.dump(cypher_list, f, ensure_ascii=False, indent=4)
\ No newline at end of file
+
+def generate_ngql(system_prompt, query_str, limiter=None):
+    """生成单个问题的nGQL，失败返回None"""
+    if limiter is not None:
+        limiter.acquire()
+    print(f'{datetime.now()} 开始查询: {query_str}')
+    response = claude_chat(build_messages(system_prompt, query_str))
+    if response is None:
+        return None
+    print(f"查询: {query_str}")
+    print(f"\n生成的nGQL:\n{response}")
+    return clean_ngql(response)
+
+
+def run_generation(questions, schema_info, output_path, max_workers=8, rate_per_minute=60):
+    """并发生成全部问题的nGQL，已在输出文件中的问题跳过"""
+    writer = ResultWriter(output_path)
+    pending = [query_str for query_str in questions if query_str not in writer.results]
+    print(f"共 {len(questions)} 个问题，已生成 {len(questions) - len(pending)} 个，待生成 {len(pending)} 个")
+
+    # 模板问题直接生成，剩余问题交给LLM
+    llm_pending = []
+    for query_str in pending:
+        matched = match_template(query_str)
+        if matched is None:
+            llm_pending.append(query_str)
+            continue
+        print(f"模板命中[{matched[0]}]: {query_str}")
+        writer.add(query_str, build_lookup_ngql(*matched))
+    pending = llm_pending
+
+    system_prompt = build_system_prompt(schema_info)
+    limiter = TokenBucket(rate_per_minute, burst=max_workers)
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(generate_ngql, system_prompt, query_str, limiter): query_str for query_str in pending}
+        for future in as_completed(futures):
+            query_str = futures[future]
+            try:
+                ngql = future.result()
+            except Exception as e:
+                print(f"生成失败: {query_str}: {e}")
+                ngql = None
+            if ngql is None:
+                failed += 1
+                continue
+            writer.add(query_str, ngql)
+    print(f"生成完成: 成功 {len(pending) - failed} 个，失败 {failed} 个，结果保存在 {output_path}")
+    return writer.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自然语言问题批量生成nGQL")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA_PATH, help="图谱Schema描述文件")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH, help="输出JSON文件")
+    parser.add_argument("--workers", type=int, default=8, help="并发请求数")
+    parser.add_argument("--rpm", type=float, default=60, help="每分钟最大请求数")
+    args = parser.parse_args()
+
+    with open(args.schema, 'r', encoding='utf-8') as f:
+        schema_info = json.load(f)
+    run_generation(query_list, schema_info, args.output, max_workers=args.workers, rate_per_minute=args.rpm)
+
+
+if __name__ == "__main__":
+    main()
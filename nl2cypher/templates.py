@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+高频供应链问题的nGQL模板库
+- 以正则识别"查询X的前五大供应商""查询X的全资子公司列表"等固定句式，提取公司名和参数
+- 模板nGQL已人工校验，填入实体VID和报告期后直接执行，不经过LLM生成
+- 执行结果连同最新报告期按 (模板名, VID) 缓存，命中时只访问Redis、不查询图谱，见 utils.ngql_cache
+
+用法：
+    from templates import TemplateQueryEngine
+    engine = TemplateQueryEngine(session, cache=NGQLResultCache())
+    answer = engine.answer('查询"宁德时代"的前五大供应商名称及供货金额')
+"""
+
+import os
+import re
+import sys
+import hashlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CN_NUMERALS = {'一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
+
+# 问题开头的公司名：兼容带引号和括号两种写法
+_COMPANY = r'(?:公司)?["“(（](?P<company>[^"”)）]+)["”)）]'
+_TOP_N = r'前(?P<n>[一二两三四五六七八九十\d]+)大'
+_PERIOD = r'(?:在)?(?:最近报告期|当前)?'
+_END = r'[？?。]?$'
+
+# 模板定义：edge 为边类型；reversely 为是否沿边反向遍历（供应商、客户、股东、人员的边都指向公司）；
+# where 为固定过滤条件，可引用识别出的参数；yield 为返回列；order_by 为排序列；default_limit 为未识别出数量时的默认条数
+QUERY_TEMPLATES = {
+    'top_suppliers': {
+        'patterns': [rf'^查询{_COMPANY}{_PERIOD}的?{_TOP_N}供应商(?:名称)?(?:及(?:其)?(?:供货|采购)金额)?{_END}'],
+        'edge': 'Suppiler',
+        'reversely': True,
+        'where': [],
+        'yield': ['properties($$).company_name AS supplier_name', 'properties(edge).supplier_amount AS supplier_amount',
+                  'properties(edge).supply_ratio AS supply_ratio', 'properties(edge).currency AS currency',
+                  'properties(edge).supply_content AS supply_content'],
+        'order_by': '$-.supplier_amount DESC',
+        'default_limit': 5,
+    },
+    'top_customers': {
+        'patterns': [rf'^查询{_COMPANY}{_PERIOD}的?{_TOP_N}客户(?:公司)?(?:(?:及|的)(?:销售金额))?{_END}'],
+        'edge': 'Customer',
+        'reversely': True,
+        'where': [],
+        'yield': ['properties($$).company_name AS customer_name', 'properties(edge).sales_amount AS sales_amount',
+                  'properties(edge).customer_proportion AS customer_proportion', 'properties(edge).currency AS currency'],
+        'order_by': '$-.sales_amount DESC',
+        'default_limit': 5,
+    },
+    'wholly_owned_subsidiaries': {
+        'patterns': [rf'^查询{_COMPANY}的全资子公司(?:列表|名单)?{_END}'],
+        'edge': 'Parent_Of',
+        'reversely': False,
+        'where': ['properties(edge).is_wholly_owned == true'],
+        'yield': ['properties($$).company_name AS subsidiary_name', 'properties(edge).shareholding_ratio AS shareholding_ratio'],
+        'order_by': '$-.subsidiary_name',
+        'default_limit': None,
+    },
+    'non_wholly_owned_subsidiaries': {
+        'patterns': [rf'^查询{_COMPANY}的非全资子公司(?:及持股比例)?{_END}'],
+        'edge': 'Parent_Of',
+        'reversely': False,
+        'where': ['properties(edge).is_wholly_owned == false'],
+        'yield': ['properties($$).company_name AS subsidiary_name', 'properties(edge).shareholding_ratio AS shareholding_ratio'],
+        'order_by': '$-.shareholding_ratio DESC',
+        'default_limit': None,
+    },
+    'subsidiaries': {
+        'patterns': [rf'^查询{_COMPANY}(?:旗下)?的?(?:主要)?子公司的?名称及持股比例{_END}'],
+        'edge': 'Parent_Of',
+        'reversely': False,
+        'where': [],
+        'yield': ['properties($$).company_name AS subsidiary_name', 'properties(edge).shareholding_ratio AS shareholding_ratio',
+                  'properties(edge).is_wholly_owned AS is_wholly_owned'],
+        'order_by': '$-.shareholding_ratio DESC',
+        'default_limit': None,
+    },
+    'shareholders_above_ratio': {
+        'patterns': [rf'^查询持有{_COMPANY}股份(?:超过|大于)(?P<ratio>\d+(?:\.\d+)?)%的股东{_END}'],
+        'edge': 'Shareholder',
+        'reversely': True,
+        'where': ['properties(edge).shareholding_ratio > {ratio}'],
+        'yield': ['id($$) AS shareholder_vid', 'properties($$).company_name AS company_name', 'properties($$).person_name AS person_name',
+                  'properties(edge).shareholding_ratio AS shareholding_ratio', 'properties(edge).shareholder_type AS shareholder_type'],
+        'order_by': '$-.shareholding_ratio DESC',
+        'default_limit': None,
+    },
+    'top_shareholders': {
+        'patterns': [rf'^查询{_COMPANY}的{_TOP_N}股东(?:及持股比例)?{_END}'],
+        'edge': 'Shareholder',
+        'reversely': True,
+        'where': [],
+        'yield': ['id($$) AS shareholder_vid', 'properties($$).company_name AS company_name', 'properties($$).person_name AS person_name',
+                  'properties(edge).shareholding_ratio AS shareholding_ratio', 'properties(edge).shareholder_type AS shareholder_type'],
+        'order_by': '$-.shareholding_ratio DESC',
+        'default_limit': 10,
+    },
+    'independent_directors': {
+        'patterns': [rf'^查询{_COMPANY}的独立董事(?:名单)?{_END}'],
+        'edge': 'Position_Info',
+        'reversely': True,
+        'where': ['properties(edge).position CONTAINS "独立董事"'],
+        'yield': ['properties($$).person_name AS person_name', 'properties(edge).position AS position',
+                  'properties(edge).is_active AS is_active'],
+        'order_by': '$-.person_name',
+        'default_limit': None,
+    },
+    'departed_executives': {
+        'patterns': [rf'^查询{_COMPANY}状态为离职的高管(?:名单)?{_END}'],
+        'edge': 'Position_Info',
+        'reversely': True,
+        'where': ['properties(edge).is_active == false'],
+        'yield': ['properties($$).person_name AS person_name', 'properties(edge).position AS position',
+                  'properties(edge).status_change_time AS status_change_time'],
+        'order_by': '$-.person_name',
+        'default_limit': None,
+    },
+}
+
+_COMPILED_PATTERNS = [(name, re.compile(pattern)) for name, template in QUERY_TEMPLATES.items()
+                      for pattern in template['patterns']]
+
+
+def parse_count(text):
+    """解析"五""十""10"等数量词"""
+    if text.isdigit():
+        return int(text)
+    if len(text) == 2 and text[0] == '十':
+        return 10 + CN_NUMERALS[text[1]]
+    if len(text) >= 2 and text[-1] == '十':
+        return CN_NUMERALS[text[0]] * 10
+    if len(text) == 3 and text[1] == '十':
+        return CN_NUMERALS[text[0]] * 10 + CN_NUMERALS[text[2]]
+    return CN_NUMERALS[text]
+
+
+def match_template(question):
+    """
+    识别问题对应的模板
+
+    Returns:
+        tuple: (模板名, 参数字典)；参数包含 company、limit 及模板条件需要的其他参数；未命中返回None
+    """
+    question = question.strip()
+    for name, pattern in _COMPILED_PATTERNS:
+        match = pattern.match(question)
+        if not match:
+            continue
+        params = {'company': match.group('company').strip()}
+        groups = match.groupdict()
+        params['limit'] = parse_count(groups['n']) if groups.get('n') else QUERY_TEMPLATES[name]['default_limit']
+        if groups.get('ratio'):
+            params['ratio'] = float(groups['ratio']) / 100.0
+        return name, params
+    return None
+
+
+def build_ngql(name, params, source, period=None):
+    """
+    生成模板nGQL
+
+    Args:
+        name: 模板名
+        params: match_template 返回的参数
+        source: GO FROM 的起点，VID字面量（如 '"abc..."'）或管道输入 '$-.vid'
+        period: 报告期rank，给定时只查询该报告期的边；可为整数或管道输入 '$-.period'
+    """
+    template = QUERY_TEMPLATES[name]
+    conditions = [condition.format(**params) for condition in template['where']]
+    if period is not None:
+        conditions.append(f'rank(edge) == {period if isinstance(period, str) else int(period)}')
+
+    ngql = f"GO FROM {source} OVER {template['edge']}"
+    if template['reversely']:
+        ngql += " REVERSELY"
+    if conditions:
+        ngql += " WHERE " + " AND ".join(conditions)
+    ngql += " YIELD " + ", ".join(template['yield'] + ['rank(edge) AS period'])
+    ngql += f" | ORDER BY {template['order_by']}"
+    if params.get('limit'):
+        ngql += f" | LIMIT {params['limit']}"
+    return ngql
+
+
+def build_period_ngql(name, source):
+    """
+    生成查询最新报告期的nGQL：输出起点 vid 和模板所查边类型上的最大rank period，起点无该类边时无输出行
+
+    Args:
+        source: GO FROM 的起点，VID字面量或管道输入 '$-.vid'
+    """
+    template = QUERY_TEMPLATES[name]
+    direction = " REVERSELY" if template['reversely'] else ""
+    return (f"GO FROM {source} OVER {template['edge']}{direction} YIELD {source} AS vid, rank(edge) AS period "
+            f"| GROUP BY $-.vid YIELD $-.vid AS vid, max($-.period) AS period")
+
+
+def build_lookup_ngql(name, params):
+    """不依赖数据库的完整nGQL：按公司全称或简称LOOKUP得到起点，只查询该公司最新报告期的边"""
+    company = params['company'].replace('\\', '\\\\').replace('"', '\\"')
+    lookup = (f'LOOKUP ON Company WHERE Company.company_name == "{company}" OR Company.company_abbr == "{company}" '
+              f'YIELD id(vertex) AS vid')
+    return f"{lookup} | {build_period_ngql(name, '$-.vid')} | {build_ngql(name, params, '$-.vid', '$-.period')}"
+
+
+def company_vid(company_name):
+    """公司顶点VID，与 JSONToNebulaInserter.genegerate_vid 一致"""
+    return hashlib.md5(company_name.encode("utf-8")).hexdigest()
+
+
+class TemplateQueryEngine:
+    """在NebulaGraph会话上执行模板查询，结果经缓存返回"""
+
+    def __init__(self, session, cache=None):
+        """
+        Args:
+            session: 已 USE 目标space的 nebula3 会话
+            cache: 可选的 utils.ngql_cache.NGQLResultCache
+        """
+        self.session = session
+        self.cache = cache
+        self._vid_cache = {}
+
+    def _execute(self, ngql):
+        result = self.session.execute(ngql)
+        if not result.is_succeeded():
+            raise RuntimeError(f"nGQL执行失败: {result.error_msg()}: {ngql}")
+        return result.as_primitive()
+
+    def resolve_vid(self, company):
+        """公司名 → VID：先按全称的VID查顶点，再按简称LOOKUP"""
+        if company in self._vid_cache:
+            return self._vid_cache[company]
+        vid = company_vid(company)
+        rows = self._execute(f'FETCH PROP ON Company "{vid}" YIELD id(vertex) AS vid')
+        if not rows:
+            escaped = company.replace('\\', '\\\\').replace('"', '\\"')
+            rows = self._execute(f'LOOKUP ON Company WHERE Company.company_abbr == "{escaped}" YIELD id(vertex) AS vid | LIMIT 1')
+        vid = rows[0]['vid'] if rows else None
+        self._vid_cache[company] = vid
+        return vid
+
+    def latest_period(self, name, vid):
+        """模板所查边类型在该公司上的最新报告期rank，无边时返回None"""
+        rows = self._execute(build_period_ngql(name, f'"{vid}"'))
+        return rows[0]['period'] if rows and rows[0]['period'] is not None else None
+
+    def answer(self, question):
+        """
+        用模板回答问题
+
+        Returns:
+            dict: {template, company, vid, period, ngql, rows, cached}；问题不匹配任何模板或公司不存在时返回None
+        """
+        matched = match_template(question)
+        if matched is None:
+            return None
+        name, params = matched
+        company = params['company']
+        cache_name = f"{name}:{params.get('limit')}:{params.get('ratio')}"
+
+        # 缓存值包含最新报告期，命中时不访问图谱；全称的VID可直接计算，简称在本进程解析过一次后同样直接命中
+        generation = None
+        if self.cache:
+            vid = self._vid_cache.get(company) or company_vid(company)
+            cached = self.cache.get(cache_name, vid, 'latest')
+            if cached is not None:
+                period = cached['period']
+                return {'template': name, 'company': company, 'vid': vid, 'period': period,
+                        'ngql': build_ngql(name, params, f'"{vid}"', period), 'rows': cached['rows'], 'cached': True}
+
+        vid = self.resolve_vid(company)
+        if vid is None:
+            return None
+        if self.cache:
+            # 执行查询前读取代数，Redis不可用时为None，只查询不写缓存
+            generation = self.cache.generation(vid)
+
+        period = self.latest_period(name, vid)
+        ngql = build_ngql(name, params, f'"{vid}"', period)
+        rows = self._execute(ngql) if period is not None else []
+        if generation is not None:
+            self.cache.set(cache_name, vid, 'latest', {'period': period, 'rows': rows}, generation=generation)
+        return {'template': name, 'company': company, 'vid': vid, 'period': period, 'ngql': ngql,
+                'rows': rows, 'cached': False}
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成nGQL的执行校验
+- 逐条在NebulaGraph上执行 YXSupplyChains_cypher.json 中的查询（或只做EXPLAIN），记录服务端延迟和端到端耗时
+- 从执行计划中识别全量扫描算子（ScanVertices/ScanEdges/索引全扫描），标记未走索引的MATCH写法
+- 执行失败的查询带上错误信息回传LLM重新生成一次，重新生成且校验通过的查询写回输出文件
+- --fixture 时按 YXSupplyChains_desc.json 在独立space中建出同名tag/edge，并按 extend_schema 的索引顾问补建查询用到的属性索引，
+  只校验语法和执行计划，不依赖线上数据；fixture中仍因缺少索引失败的查询不重新生成、不写回
+
+用法：
+    python nl2cypher/validate.py --space YXSupplyChains --explain-only
+    python nl2cypher/validate.py --fixture YXSupplyChains_fixture
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+from nebula3.gclient.net import ConnectionPool
+from nebula3.Config import Config
+
+from nl2cypher import (DEFAULT_SCHEMA_PATH, DEFAULT_OUTPUT_PATH, build_system_prompt, build_messages,
+                       claude_chat, clean_ngql, ResultWriter)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import nebula_config
+from data_transfer.extend_schema import SchemaExtender, collect_index_requirements
+
+DEFAULT_REPORT_PATH = './YXSupplyChains_validation.json'
+
+# 执行计划中表示全量扫描的算子
+FULL_SCAN_OPERATORS = ('ScanVertices', 'ScanEdges', 'TagIndexFullScan', 'EdgeIndexFullScan')
+# MATCH缺少起点约束时Nebula直接报错的提示
+FULL_SCAN_ERRORS = ('Scan vertices or edges need to specify a limit number', 'IndexNotFound', 'no valid index')
+# 缺少索引的报错：fixture中属于环境问题，不代表线上查询有误
+MISSING_INDEX_ERRORS = ('IndexNotFound', 'no valid index')
+
+# Schema描述中的属性类型 → nGQL类型，无法识别的类型按string建
+NEBULA_TYPES = {'string', 'int', 'int64', 'int32', 'int16', 'int8', 'float', 'double', 'bool',
+                'date', 'time', 'datetime', 'timestamp', 'duration'}
+
+
+def _iter_schema_items(schema_info, keys):
+    """兼容 {name: {...}} 和 [{name: ..., properties: ...}] 两种写法"""
+    for key in keys:
+        items = schema_info.get(key)
+        if isinstance(items, dict):
+            for name, body in items.items():
+                yield name, body if isinstance(body, (dict, list)) else {}
+        elif isinstance(items, list):
+            for item in items:
+                if isinstance(item, dict) and item.get('name'):
+                    yield item['name'], item
+
+
+def _iter_properties(body):
+    properties = body.get('properties', body.get('props', {})) if isinstance(body, dict) else body
+    if isinstance(properties, dict):
+        for name, spec in properties.items():
+            yield name, spec.get('type', '') if isinstance(spec, dict) else str(spec)
+    elif isinstance(properties, list):
+        for prop in properties:
+            if isinstance(prop, dict) and prop.get('name'):
+                yield prop['name'], prop.get('type', '')
+
+
+def _nebula_type(type_name):
+    type_name = str(type_name).lower().strip()
+    if type_name.startswith('fixed_string'):
+        return type_name
+    return type_name if type_name in NEBULA_TYPES else 'string'
+
+
+def schema_to_ddl(schema_info):
+    """由Schema描述生成 CREATE TAG/EDGE 语句"""
+    statements = []
+    for kind, keys in (('TAG', ('tags', 'vertices', 'nodes')), ('EDGE', ('edges', 'edge_types', 'relationships'))):
+        for name, body in _iter_schema_items(schema_info, keys):
+            columns = ", ".join(f"`{prop}` {_nebula_type(prop_type)}" for prop, prop_type in _iter_properties(body))
+            statements.append(f"CREATE {kind} IF NOT EXISTS `{name}`({columns})")
+    return statements
+
+
+def detect_full_scan(plan_rows, error_msg=""):
+    """返回执行计划中出现的全量扫描算子；报错信息表明缺少索引时返回错误关键字"""
+    operators = sorted({row.get('name') for row in plan_rows if row.get('name') in FULL_SCAN_OPERATORS})
+    operators += [hint for hint in FULL_SCAN_ERRORS if hint in (error_msg or "")]
+    return operators
+
+
+class NGQLValidator:
+    """在NebulaGraph上执行/EXPLAIN生成的nGQL"""
+
+    def __init__(self, nebula_config, space_name):
+        self.nebula_config = nebula_config
+        self.space_name = space_name
+        self.nebula_pool = None
+        self.nebula_session = None
+
+    def connect_database(self):
+        config = Config()
+        config.max_connection_pool_size = 2
+        self.nebula_pool = ConnectionPool()
+        self.nebula_pool.init([(self.nebula_config['host'], self.nebula_config['port'])], config)
+        self.nebula_session = self.nebula_pool.get_session(self.nebula_config['user'], self.nebula_config['password'])
+
+    def use_space(self):
+        result = self.nebula_session.execute(f"USE `{self.space_name}`")
+        if not result.is_succeeded():
+            raise Exception(f"使用space失败: {result.error_msg()}")
+
+    def close_connection(self):
+        if self.nebula_session:
+            self.nebula_session.release()
+        if self.nebula_pool:
+            self.nebula_pool.close()
+
+    def build_fixture_space(self, schema_info, index_requirements=(), heartbeat_wait=20):
+        """
+        按Schema描述创建空的校验space，VID与线上一致为md5定长字符串
+        index_requirements 为 [(tag/edge名, 属性名)]，按 SchemaExtender.plan_indexes 创建对应索引；space为空，无需重建
+        """
+        statements = [f"CREATE SPACE IF NOT EXISTS `{self.space_name}`(partition_num=1, replica_factor=1, vid_type=FIXED_STRING(32))"]
+        result = self.nebula_session.execute(statements[0])
+        if not result.is_succeeded():
+            raise Exception(f"创建校验space失败: {result.error_msg()}")
+        # 新建的space和schema需等待元数据同步到graphd
+        time.sleep(heartbeat_wait)
+        self.use_space()
+        for statement in schema_to_ddl(schema_info):
+            result = self.nebula_session.execute(statement)
+            if not result.is_succeeded():
+                print(f"✗ 建表失败: {result.error_msg()}: {statement}")
+        time.sleep(heartbeat_wait)
+
+        # 复用索引顾问的索引方案，共用当前session
+        extender = SchemaExtender(self.nebula_config, space_name=self.space_name)
+        extender.nebula_session = self.nebula_session
+        plans = extender.plan_indexes(index_requirements)
+        created = []
+        for index_name, kind, statement in plans:
+            result = self.nebula_session.execute(statement)
+            if result.is_succeeded():
+                created.append((index_name, kind))
+            else:
+                print(f"✗ 建索引失败: {result.error_msg()}: {statement}")
+        for index_name, _ in extender.wait_indexes(created):
+            print(f"✗ 索引同步超时: {index_name}")
+        print(f"校验space已就绪: {self.space_name}，索引 {len(plans)} 个")
+
+    def validate(self, ngql, explain_only=False):
+        """
+        校验单条nGQL
+
+        Returns:
+            dict: {ok, error, latency_ms, wall_ms, full_scan, plan_operators}
+        """
+        plan_result = self.nebula_session.execute(f'EXPLAIN FORMAT="row" {ngql}')
+        if not plan_result.is_succeeded():
+            error_msg = plan_result.error_msg()
+            return {'ok': False, 'error': error_msg, 'latency_ms': None, 'wall_ms': None,
+                    'full_scan': detect_full_scan([], error_msg), 'plan_operators': []}
+        plan_rows = plan_result.as_primitive()
+        report = {'ok': True, 'error': None, 'latency_ms': None, 'wall_ms': None,
+                  'full_scan': detect_full_scan(plan_rows),
+                  'plan_operators': [row.get('name') for row in plan_rows]}
+        if explain_only:
+            return report
+
+        start_time = time.perf_counter()
+        result = self.nebula_session.execute(ngql)
+        report['wall_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+        if not result.is_succeeded():
+            report.update(ok=False, error=result.error_msg())
+            report['full_scan'] = detect_full_scan(plan_rows, report['error'])
+            return report
+        # latency() 为服务端耗时，单位微秒
+        report['latency_ms'] = round(result.latency() / 1000, 2)
+        report['rows'] = result.row_size()
+        return report
+
+
+def regenerate(system_prompt, query_str, ngql, error_msg):
+    """把执行错误回传LLM重新生成一次，沿用相同的system前缀以命中prompt缓存"""
+    messages = build_messages(system_prompt, query_str)
+    messages.append({"role": "assistant", "content": f"```ngql\n{ngql}\n```"})
+    messages.append({"role": "user", "content": f"该nGQL在NebulaGraph中执行失败，错误信息：\n{error_msg}\n请修正后只输出修正后的nGQL。"})
+    response = claude_chat(messages)
+    return clean_ngql(response) if response else None
+
+
+def is_missing_index(error_msg):
+    return any(hint in (error_msg or "") for hint in MISSING_INDEX_ERRORS)
+
+
+def run_validation(validator, queries, schema_info, writer, explain_only=False, allow_regenerate=True, fixture=False):
+    """fixture为True时，缺少索引导致的失败只记录，不回传LLM，避免用fixture的环境问题改写线上正确的查询"""
+    system_prompt = build_system_prompt(schema_info) if allow_regenerate else None
+    reports = {}
+    for idx, (query_str, ngql) in enumerate(queries.items(), 1):
+        report = validator.validate(ngql, explain_only)
+        report['regenerated'] = False
+        report['fixture_missing_index'] = fixture and not report['ok'] and is_missing_index(report['error'])
+        if not report['ok'] and allow_regenerate and not report['fixture_missing_index']:
+            new_ngql = regenerate(system_prompt, query_str, ngql, report['error'])
+            if new_ngql:
+                new_report = validator.validate(new_ngql, explain_only)
+                if new_report['ok']:
+                    writer.add(query_str, new_ngql)
+                report = {**new_report, 'regenerated': True, 'previous_error': report['error'], 'ngql': new_ngql}
+        report.setdefault('ngql', ngql)
+        reports[query_str] = report
+
+        status = "✓" if report['ok'] else "✗"
+        scan_note = f" 全量扫描: {','.join(report['full_scan'])}" if report['full_scan'] else ""
+        latency_note = f" {report['latency_ms']}ms" if report['latency_ms'] is not None else ""
+        regen_note = " (已重新生成)" if report['regenerated'] else ""
+        regen_note += " (fixture缺少索引，未重新生成)" if report.get('fixture_missing_index') else ""
+        print(f"[{idx}/{len(queries)}] {status}{latency_note}{scan_note}{regen_note} {query_str}")
+        if not report['ok']:
+            print(f"    错误: {report['error']}")
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成nGQL的执行校验")
+    parser.add_argument("--input", default=DEFAULT_OUTPUT_PATH, help="nl2cypher输出的JSON文件")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA_PATH, help="图谱Schema描述文件")
+    parser.add_argument("--report", default=DEFAULT_REPORT_PATH, help="校验报告输出路径")
+    parser.add_argument("--space", default="YXSupplyChains", help="执行校验的space")
+    parser.add_argument("--fixture", default=None, help="按Schema创建指定名称的空space并在其中校验")
+    parser.add_argument("--explain-only", action="store_true", help="只EXPLAIN不实际执行")
+    parser.add_argument("--no-regenerate", action="store_true", help="执行失败时不调用LLM重新生成")
+    args = parser.parse_args()
+
+    with open(args.schema, 'r', encoding='utf-8') as f:
+        schema_info = json.load(f)
+    writer = ResultWriter(args.input)
+    if not writer.results:
+        print(f"没有可校验的查询: {args.input}")
+        return
+
+    validator = NGQLValidator(nebula_config, args.fixture or args.space)
+    validator.connect_database()
+    try:
+        if args.fixture:
+            validator.build_fixture_space(schema_info, collect_index_requirements(cypher_json_paths=[args.input]))
+        else:
+            validator.use_space()
+        reports = run_validation(validator, dict(writer.results), schema_info, writer,
+                                 explain_only=args.explain_only, allow_regenerate=not args.no_regenerate,
+                                 fixture=bool(args.fixture))
+    finally:
+        validator.close_connection()
+
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(reports, f, ensure_ascii=False, indent=4)
+
+    failed = sum(1 for report in reports.values() if not report['ok'])
+    full_scan = sum(1 for report in reports.values() if report['full_scan'])
+    regenerated = sum(1 for report in reports.values() if report['regenerated'])
+    missing_index = sum(1 for report in reports.values() if report.get('fixture_missing_index'))
+    latencies = sorted(report['latency_ms'] for report in reports.values() if report['latency_ms'] is not None)
+    print(f"\n校验完成: 共 {len(reports)} 条，失败 {failed} 条，全量扫描 {full_scan} 条，重新生成 {regenerated} 条")
+    if missing_index:
+        print(f"fixture中缺少索引未重新生成 {missing_index} 条，需在线上space确认索引")
+    if latencies:
+        print(f"服务端延迟: P50 {latencies[len(latencies) // 2]}ms，最大 {latencies[-1]}ms")
+    print(f"校验报告: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+海外上市公司 10-K/10-Q 批量抽取
+- rerank预处理与LLM推理分别使用独立的线程池，并发数可分别配置
+- 已有结果JSON的文件自动跳过（包括 test.py/demo.py 写在输入目录中的结果），每个文件处理结束后追加写入进度清单，中断后可直接重跑续传
+
+用法：
+    python oversea_study/batch_runner.py --rerank-workers 4 --llm-workers 2
+    python oversea_study/batch_runner.py --tickers AAPL MSFT --limit 10
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt import OVERSEA_STUDY_PROMPT, output_schema
+from config import BATCH_CONFIG, PATH_CONFIG, isin_to_ticker
+from preprocess import preprocess_document
+from llm import gpt_oss_chat
+
+add_path = str(Path(__file__).parent.parent)
+sys.path.append(add_path)
+
+from utils.data_prepare import read_single_md_file
+
+
+class Manifest:
+    """JSONL进度清单，记录每个文件的处理状态，多线程追加写入"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.records = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 中断时可能留下不完整的最后一行
+                        continue
+                    self.records[record["file"]] = record
+
+    def is_done(self, file_name):
+        return self.records.get(file_name, {}).get("status") == "done"
+
+    def record(self, file_name, status, **fields):
+        record = {"file": file_name, "status": status, "time": time.strftime("%Y-%m-%d %H:%M:%S"), **fields}
+        with self._lock:
+            self.records[file_name] = record
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+
+
+class BatchRunner:
+    """两阶段批量处理：rerank预处理线程池 → LLM推理线程池"""
+
+    def __init__(self, datasets_dir, results_dir, rerank_workers, llm_workers, max_pending):
+        self.datasets_dir = Path(datasets_dir)
+        self.results_dir = Path(results_dir)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest = Manifest(self.results_dir / BATCH_CONFIG["manifest_name"])
+
+        self.rerank_executor = ThreadPoolExecutor(max_workers=rerank_workers, thread_name_prefix="rerank")
+        self.llm_executor = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="llm")
+        # 限制已领取但未完成LLM推理的文件数，提交新文件前需先获取
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.stats = {"done": 0, "failed": 0, "skipped": 0}
+        self._stats_lock = threading.Lock()
+
+    def result_path(self, md_file):
+        return self.results_dir / f"{md_file.stem}{BATCH_CONFIG['result_suffix']}"
+
+    def has_result(self, md_file):
+        """结果目录或输入目录（test.py/demo.py 的输出位置）中已有该文件的结果JSON"""
+        legacy_path = self.datasets_dir / f"{md_file.stem}{BATCH_CONFIG['result_suffix']}"
+        return self.result_path(md_file).exists() or legacy_path.exists()
+
+    def collect_files(self, tickers=None, limit=None):
+        """收集待处理文件，跳过已有结果或清单中已完成的文件"""
+        md_files = sorted(self.datasets_dir.glob("*.md"))
+        if tickers:
+            prefixes = tuple(f"{ticker}_" for ticker in tickers)
+            md_files = [md_file for md_file in md_files if md_file.name.startswith(prefixes)]
+
+        todo = []
+        for md_file in md_files:
+            if self.has_result(md_file) or self.manifest.is_done(md_file.name):
+                self.stats["skipped"] += 1
+                continue
+            todo.append(md_file)
+        if limit:
+            todo = todo[:limit]
+        return todo
+
+    def _finish(self, md_file, status, **fields):
+        self.manifest.record(md_file.name, status, **fields)
+        with self._stats_lock:
+            self.stats[status] += 1
+        self.pending.release()
+
+    def _preprocess(self, md_file):
+        """rerank阶段：读取文件并预处理，完成后提交LLM阶段"""
+        start_time = time.time()
+        try:
+            md_content = read_single_md_file(str(md_file))
+            filtered_content = preprocess_document(md_content, enable_rerank=True)
+            prompt = OVERSEA_STUDY_PROMPT.replace("{output_schema}", output_schema).replace("{documents}", filtered_content)
+        except Exception as e:
+            print(f"  ✗ 读取/预处理文件失败: {md_file.name}: {str(e)}")
+            self._finish(md_file, "failed", stage="rerank", error=str(e))
+            return
+        self.llm_executor.submit(self._infer, md_file, prompt, time.time() - start_time)
+
+    def _infer(self, md_file, prompt, rerank_seconds):
+        """LLM阶段：推理并原子写入结果文件"""
+        start_time = time.time()
+        try:
+            result_json = json.loads(gpt_oss_chat(prompt))
+            output_path = self.result_path(md_file)
+            tmp_path = output_path.with_name(output_path.name + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result_json, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, output_path)
+        except Exception as e:
+            print(f"  ✗ GPT-OSS 处理失败: {md_file.name}: {str(e)}")
+            self._finish(md_file, "failed", stage="llm", error=str(e), rerank_seconds=round(rerank_seconds, 2))
+            return
+        llm_seconds = time.time() - start_time
+        print(f"  ✓ 完成: {md_file.name} (rerank {rerank_seconds:.1f}s, LLM {llm_seconds:.1f}s)")
+        self._finish(md_file, "done", rerank_seconds=round(rerank_seconds, 2), llm_seconds=round(llm_seconds, 2))
+
+    def run(self, md_files):
+        total_files = len(md_files)
+        print(f"待处理 {total_files} 个文件，已跳过 {self.stats['skipped']} 个")
+        start_time = time.time()
+        for idx, md_file in enumerate(md_files, 1):
+            self.pending.acquire()
+            print(f"[{idx}/{total_files}] 提交: {md_file.name}")
+            self.rerank_executor.submit(self._preprocess, md_file)
+
+        # rerank阶段全部结束后才能关闭LLM线程池，否则会拒绝后续提交
+        self.rerank_executor.shutdown(wait=True)
+        self.llm_executor.shutdown(wait=True)
+        elapsed_time = time.time() - start_time
+        print(f"\n处理完成！成功 {self.stats['done']} 个，失败 {self.stats['failed']} 个，"
+              f"跳过 {self.stats['skipped']} 个，耗时 {elapsed_time/60:.1f} 分钟")
+        print(f"结果保存在: {self.results_dir}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="海外财报批量抽取")
+    parser.add_argument("--datasets-dir", default=PATH_CONFIG["datasets_dir"], help="输入markdown目录")
+    parser.add_argument("--results-dir", default=PATH_CONFIG["results_dir"], help="结果JSON目录")
+    parser.add_argument("--rerank-workers", type=int, default=BATCH_CONFIG["rerank_workers"], help="rerank预处理并发数")
+    parser.add_argument("--llm-workers", type=int, default=BATCH_CONFIG["llm_workers"], help="LLM推理并发数")
+    parser.add_argument("--max-pending", type=int, default=BATCH_CONFIG["max_pending"], help="等待推理的文件数上限")
+    parser.add_argument("--tickers", nargs="*", default=sorted(set(isin_to_ticker.values())), help="只处理指定Ticker的文件")
+    parser.add_argument("--limit", type=int, default=None, help="最多处理的文件数")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    runner = BatchRunner(args.datasets_dir, args.results_dir, args.rerank_workers, args.llm_workers,
+                         max(args.max_pending, args.llm_workers))
+    runner.run(runner.collect_files(tickers=args.tickers, limit=args.limit))
@@ -13,6 +13,15 @@ RERANK_CONFIG = {
     "model": "Bge-ReRanker",
     "timeout": 60,
     
+    # 分批打分配置：每批最多段落数、每批最多字符数、并发批次数、失败重试次数
+    "batch_size": 32,
+    "batch_max_chars": 60000,
+    "max_workers": 4,
+    "max_retries": 1,
+    
+    # 段落分数缓存（sqlite），键为 sha1(query, 段落文本)，为空则不缓存
+    "cache_path": "/data/share2/yy/workspace/code/supplierchainsgraph/oversea_study/cache/rerank_scores.sqlite3",
+    
     # 段落分割配置
     "max_paragraph_length": 3000,  # 每个段落最大字符数
     
@@ -28,6 +37,23 @@ RERANK_CONFIG = {
     "min_paragraphs_for_rerank": 10
 }
 
+# ============================================================================
+# 段落标题BM25索引配置（财务报表过滤）
+# ============================================================================
+
+TITLE_INDEX_CONFIG = {
+    # 全语料标题索引文件，由 title_index.py 构建和增量更新
+    "index_path": "/data/share2/yy/workspace/code/supplierchainsgraph/oversea_study/cache/title_bm25.npz",
+    
+    # BM25参数，与rank_bm25.BM25Okapi默认值一致
+    "k1": 1.5,
+    "b": 0.75,
+    "epsilon": 0.25,
+    
+    # 语料标题数少于此值时IDF不稳定，退回单文档BM25
+    "min_titles": 1000
+}
+
 # ============================================================================
 # LLM模型配置
 # ============================================================================
@@ -88,6 +114,72 @@ PROCESSING_CONFIG = {
     "log_level": "INFO"  # DEBUG, INFO, WARNING, ERROR
 }
 
+# ============================================================================
+# 批量处理配置
+# ============================================================================
+
+BATCH_CONFIG = {
+    # rerank预处理（段落rerank、行级精排）并发数
+    "rerank_workers": 4,
+    
+    # LLM推理并发数
+    "llm_workers": 2,
+    
+    # 已预处理、等待LLM推理的文件数上限，避免预处理结果堆积占用内存
+    "max_pending": 8,
+    
+    # 进度清单文件名（保存在结果目录下，JSONL格式，每个文件处理结束追加一行）
+    "manifest_name": "manifest.jsonl",
+    
+    # 结果文件后缀
+    "result_suffix": "_gpt-oss.json"
+}
+
+# ============================================================================
+# 数据下载配置（get_data.py）
+# ============================================================================
+
+DOWNLOAD_CONFIG = {
+    # 下载线程数
+    "max_workers": 8,
+    
+    # 同一下载域名的最大并发数；目前全部文件来自同一个US3域名，实际线程数取两者较小值，应与 max_workers 保持一致
+    "per_host_limit": 8,
+    
+    # Mongo游标每批拉取的文档数
+    "cursor_batch_size": 500,
+    
+    # 下载清单文件名（保存在下载目录下，JSONL格式，记录已完成的文件）
+    "manifest_name": "download_manifest.jsonl"
+}
+
+# ============================================================================
+# 标的配置
+# ============================================================================
+
+# ISIN到Ticker的映射
+isin_to_ticker = {
+    "US0378331005": "AAPL",
+    "US5949181045": "MSFT",
+    "US02079K3059": "GOOGL",
+    "US0231351067": "AMZN",
+    "US67066G1040": "NVDA",
+    "US30303M1027": "META",
+    "US88160R1014": "TSLA",
+    "US68389X1054": "ORCL",
+    "US8740391003": "TSM",
+    "US11135F1012": "AVGO",
+    "US0079031078": "AMD",
+    "USN070592100": "ASML",
+    "US01609W1027": "BABA",
+    "US7223041028": "PDD",
+    "US47215P1066": "JD",
+    "US7707001027": "HOOD",
+    "US19260Q1076": "COIN",
+    "US22160K1051": "COST",
+    "US7170811035": "PFE"
+}
+
 # ============================================================================
 # 调试配置
 # ============================================================================
@@ -143,6 +235,10 @@ def get_processing_config():
     """获取处理配置"""
     return PROCESSING_CONFIG.copy()
 
+def get_batch_config():
+    """获取批量处理配置"""
+    return BATCH_CONFIG.copy()
+
 def get_debug_config():
     """获取调试配置"""
     return DEBUG_CONFIG.copy()
@@ -174,6 +270,9 @@ def validate_config():
     if PROCESSING_CONFIG["max_workers"] < 1:
         errors.append("max_workers 必须大于 0")
     
+    if BATCH_CONFIG["rerank_workers"] < 1 or BATCH_CONFIG["llm_workers"] < 1:
+        errors.append("rerank_workers 和 llm_workers 必须大于 0")
+    
     if not PROCESSING_CONFIG["enabled_models"]:
         errors.append("至少需要启用一个模型")
     
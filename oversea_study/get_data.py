@@ -1,160 +1,175 @@
 import os
 import sys
+import json
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient
 
 # 添加项目根目录到Python路径
 add_path = str(Path(__file__).parent.parent)
 sys.path.append(add_path)
-os.chdir(add_path)
 
 from utils.use_tool import US3Client
 from configs.config import mongo_url
+from config import isin_to_ticker, DOWNLOAD_CONFIG
 
-client = MongoClient(mongo_url)
-db = client["OmniDataCrafter"]
-collection = db["filings"]
-
-
-# ISIN到Ticker的映射
-isin_to_ticker = {
-    "US0378331005": "AAPL",
-    "US5949181045": "MSFT",
-    "US02079K3059": "GOOGL",
-    "US0231351067": "AMZN",
-    "US67066G1040": "NVDA",
-    "US30303M1027": "META",
-    "US88160R1014": "TSLA",
-    "US68389X1054": "ORCL",
-    "US8740391003": "TSM",
-    "US11135F1012": "AVGO",
-    "US0079031078": "AMD",
-    "USN070592100": "ASML",
-    "US01609W1027": "BABA",
-    "US7223041028": "PDD",
-    "US47215P1066": "JD",
-    "US7707001027": "HOOD",
-    "US19260Q1076": "COIN",
-    "US22160K1051": "COST",
-    "US7170811035": "PFE"
+# 只拉取下载所需字段
+PROJECTION = {
+    "isin": 1,
+    "FilingDocument.DocumentSummary.FormType": 1,
+    "rt_parser": 1,
 }
 
-symbols = list(isin_to_ticker.keys())
 
+class DownloadManifest:
+    """JSONL下载清单，记录已完成下载的本地文件名，中断后重跑直接跳过"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.done = set()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)["file"])
+                    except (json.JSONDecodeError, KeyError):
+                        # 中断时可能留下不完整的最后一行
+                        continue
+
+    def is_done(self, file_name):
+        return file_name in self.done
+
+    def record(self, file_name, us3_path):
+        with self._lock:
+            self.done.add(file_name)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"file": file_name, "us3_path": us3_path}, ensure_ascii=False) + "\n")
+
+
+class FilingDownloader:
+    """
+    并发下载 MD 与对应的 PDF，先写临时文件再重命名
+    所有文件都从同一个US3下载域名获取，线程数即该域名的并发数，取 max_workers 与 per_host_limit 的较小值
+    """
+
+    def __init__(self, us3_client, download_dir, max_workers, per_host_limit):
+        self.us3_client = us3_client
+        self.download_dir = Path(download_dir)
+        self.download_dir.mkdir(exist_ok=True)
+        self.manifest = DownloadManifest(self.download_dir / DOWNLOAD_CONFIG["manifest_name"])
+        workers = min(max_workers, per_host_limit)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # 限制已提交未完成的任务数，避免游标全部读入内存
+        self.inflight = threading.BoundedSemaphore(workers * 4)
+        self._lock = threading.Lock()
+        self.stats = {"md_success": 0, "md_fail": 0, "pdf_success": 0, "pdf_fail": 0, "skipped": 0, "missing": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _download(self, us3_path, file_name, kind):
+        """下载单个文件，已在清单中或本地已存在则跳过"""
+        local_file_path = self.download_dir / file_name
+        if self.manifest.is_done(file_name) or local_file_path.exists():
+            self._count("skipped")
+            return
+        status_code = self.us3_client.download_file_atomic(us3_path, str(local_file_path))
+        if status_code == 200:
+            self.manifest.record(file_name, us3_path)
+            print(f"✓ {kind}下载成功: {file_name}")
+            self._count(f"{kind.lower()}_success")
+        else:
+            print(f"✗ {kind}下载失败: {file_name} (状态码: {status_code})")
+            self._count(f"{kind.lower()}_fail")
+
+    def _download_filing(self, us3_path, file_name):
+        try:
+            self._download(us3_path, file_name, "MD")
+            # 下载对应的PDF文件：将us3_path和文件名的后缀从.md改为.pdf
+            self._download(us3_path.replace(".md", ".pdf"), file_name.replace(".md", ".pdf"), "PDF")
+        except Exception as e:
+            print(f"✗ 处理出错: {file_name}: {str(e)}")
+            self._count("md_fail")
+        finally:
+            self.inflight.release()
+
+    def submit(self, doc):
+        # 获取us3_path - 遍历rt_parser字典找到第一个包含us3_path的条目
+        rt_parser = doc.get("rt_parser", {})
+        us3_path = None
+        if isinstance(rt_parser, dict):
+            for value in rt_parser.values():
+                if isinstance(value, dict) and "us3_path" in value:
+                    us3_path = value.get("us3_path", '')
+                    break
 
-us3_client = US3Client()
+        if not us3_path:
+            print(f"跳过: {doc.get('_id', '')} 缺少us3_path字段")
+            self._count("missing")
+            return
 
-# 确保下载目录存在
-download_dir = Path(__file__).parent / "datasets"
-download_dir.mkdir(exist_ok=True)
+        # 在文件名前加上ticker
+        ticker = isin_to_ticker.get(doc.get("isin", "unknown"), "UNKNOWN")
+        file_name = f"{ticker}_{us3_path.split('/')[-1]}"
+        pdf_file_name = file_name.replace(".md", ".pdf")
+        # 两个文件都已完成时不占用线程
+        if self.manifest.is_done(file_name) and self.manifest.is_done(pdf_file_name):
+            self._count("skipped")
+            self._count("skipped")
+            return
 
-# 查询符合条件的文档
-query = {
-    "isin": {"$in": symbols},
-    "FilingDocument.DocumentSummary.FormType": {"$in": ["10-K", "10-Q"]}
-}
+        self.inflight.acquire()
+        self.executor.submit(self._download_filing, us3_path, file_name)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
 
-print(f"开始查询符合条件的文档...")
-print(f"查询条件: isin在symbols列表中，且FormType为10-K或10-Q")
 
-# 查询文档
-documents = collection.find(query)
-documents_list = list(documents)
-total_count = len(documents_list)
+def main():
+    client = MongoClient(mongo_url)
+    collection = client["OmniDataCrafter"]["filings"]
+    symbols = list(isin_to_ticker.keys())
 
-print(f"找到 {total_count} 条符合条件的文档")
+    # 查询符合条件的文档
+    query = {
+        "isin": {"$in": symbols},
+        "FilingDocument.DocumentSummary.FormType": {"$in": ["10-K", "10-Q"]}
+    }
 
-# 下载文件
-success_count = 0
-fail_count = 0
-pdf_success_count = 0
-pdf_fail_count = 0
+    print(f"开始查询符合条件的文档...")
+    print(f"查询条件: isin在symbols列表中，且FormType为10-K或10-Q")
+    total_count = collection.count_documents(query)
+    print(f"找到 {total_count} 条符合条件的文档")
 
-for idx, doc in enumerate(documents_list, 1):
+    # 确保下载目录存在
+    download_dir = Path(__file__).parent / "datasets"
+    downloader = FilingDownloader(US3Client(), download_dir, DOWNLOAD_CONFIG["max_workers"], DOWNLOAD_CONFIG["per_host_limit"])
+
+    # 流式遍历游标，边读边提交下载
+    cursor = collection.find(query, PROJECTION).batch_size(DOWNLOAD_CONFIG["cursor_batch_size"])
     try:
-        # 获取us3_path - 遍历rt_parser字典找到us3_path
-        filing_doc = doc.get("FilingDocument", {})
-        rt_parser = doc.get("rt_parser", {})
-        source_id = doc.get("_id",'')
-        us3_path = None
-        
-        # 遍历rt_parser字典，找到第一个包含us3_path的条目
-        if isinstance(rt_parser, dict):
-            for key, value in rt_parser.items():
-                if isinstance(value, dict) and "us3_path" in value:
-                    us3_path = value.get("us3_path",'')
-                    break
-        
-        if not us3_path:
-            print(f"[{idx}/{total_count}] 跳过: {source_id} 缺少us3_path字段")
-            fail_count += 1
-            continue
-        
-        # 获取文件信息
-        form_type = filing_doc.get("DocumentSummary", {}).get("FormType", "unknown")
-        isin = doc.get("isin", "unknown")
-        ticker = isin_to_ticker.get(isin, "UNKNOWN")
-        original_file_name = us3_path.split("/")[-1]
-        # 在文件名前加上ticker
-        file_name = f"{ticker}_{original_file_name}"
-        
-        # 构建本地保存路径
-        local_file_path = download_dir / file_name
-        
-        # 如果文件已存在，跳过
-        if local_file_path.exists():
-            print(f"[{idx}/{total_count}] 跳过（已存在）: {file_name} (Ticker: {ticker}, ISIN: {isin}, FormType: {form_type})")
-        else:
-            print(f"[{idx}/{total_count}] 下载中: {file_name} (Ticker: {ticker}, ISIN: {isin}, FormType: {form_type})")
-            
-            # 下载MD文件
-            status_code = us3_client.download_file(us3_path, str(local_file_path))
-            
-            if status_code == 200:
-                print(f"[{idx}/{total_count}] ✓ MD下载成功: {file_name}")
-                success_count += 1
-            else:
-                print(f"[{idx}/{total_count}] ✗ MD下载失败: {file_name} (状态码: {status_code})")
-                fail_count += 1
-                # 删除可能创建的不完整文件
-                if local_file_path.exists():
-                    local_file_path.unlink()
-        
-        # 下载对应的PDF文件
-        # 将us3_path和local_file_path的后缀从.md改为.pdf
-        pdf_us3_path = us3_path.replace(".md", ".pdf")
-        pdf_file_name = file_name.replace(".md", ".pdf")
-        pdf_local_file_path = download_dir / pdf_file_name
-        
-        # 如果PDF文件已存在，跳过
-        if pdf_local_file_path.exists():
-            print(f"[{idx}/{total_count}] 跳过（PDF已存在）: {pdf_file_name}")
-        else:
-            print(f"[{idx}/{total_count}] PDF下载中: {pdf_file_name}")
-            
-            # 下载PDF文件
-            pdf_status_code = us3_client.download_file(pdf_us3_path, str(pdf_local_file_path))
-            
-            if pdf_status_code == 200:
-                print(f"[{idx}/{total_count}] ✓ PDF下载成功: {pdf_file_name}")
-                pdf_success_count += 1
-            else:
-                print(f"[{idx}/{total_count}] ✗ PDF下载失败: {pdf_file_name} (状态码: {pdf_status_code})")
-                pdf_fail_count += 1
-                # 删除可能创建的不完整文件
-                if pdf_local_file_path.exists():
-                    pdf_local_file_path.unlink()
-                
-    except Exception as e:
-        print(f"[{idx}/{total_count}] ✗ 处理出错: {str(e)}")
-        fail_count += 1
-
-print(f"\n下载完成!")
-print(f"总计: {total_count} 条")
-print(f"\nMD文件:")
-print(f"  成功: {success_count} 条")
-print(f"  失败: {fail_count} 条")
-print(f"\nPDF文件:")
-print(f"  成功: {pdf_success_count} 条")
-print(f"  失败: {pdf_fail_count} 条")
-print(f"\n下载目录: {download_dir}")
\ No newline at end of file
+        for idx, doc in enumerate(cursor, 1):
+            downloader.submit(doc)
+            if idx % 100 == 0:
+                print(f"[{idx}/{total_count}] 已提交")
+    finally:
+        cursor.close()
+        downloader.close()
+
+    stats = downloader.stats
+    print(f"\n下载完成!")
+    print(f"总计: {total_count} 条，缺少us3_path: {stats['missing']} 条，跳过（已完成）: {stats['skipped']} 个文件")
+    print(f"\nMD文件:")
+    print(f"  成功: {stats['md_success']} 条")
+    print(f"  失败: {stats['md_fail']} 条")
+    print(f"\nPDF文件:")
+    print(f"  成功: {stats['pdf_success']} 条")
+    print(f"  失败: {stats['pdf_fail']} 条")
+    print(f"\n下载目录: {download_dir}")
+
+
+if __name__ == "__main__":
+    main()
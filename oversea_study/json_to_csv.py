@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-将 JSON 文件转换为 CSV 和 Excel 格式
+将 JSON 文件转换为 CSV、Excel 和 Parquet 格式
 处理嵌套的树形结构，提取所有数据节点
 """
 
 import json
 import csv
+import argparse
 from pathlib import Path
 import sys
 
@@ -18,10 +19,125 @@ except ImportError:
     print("警告: pandas 未安装，将无法生成 Excel 文件")
     print("请运行: pip install pandas openpyxl")
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# 展平后每行的固定字段及顺序，CSV/Excel/Parquet共用
+ROW_FIELDS = ["path", "description", "time_period", "value", "currency", "unit", "growth_rate", "ratio"]
+# 汇总多个结果文件时附加的来源文件列
+SOURCE_FIELD = "source_file"
+# 数据节点中与ROW_FIELDS对应的取值字段（path、description取自所在节点）
+_DATA_FIELDS = ["value", "currency", "unit", "growth_rate", "ratio"]
+# Parquet中解析为float64的数值列，原始取值另存为 <列名>_text 字符串列
+NUMERIC_FIELDS = ["value", "growth_rate", "ratio"]
+PARQUET_FIELDS = ROW_FIELDS + [SOURCE_FIELD] + [f"{field}_text" for field in NUMERIC_FIELDS]
+_NUMERIC_INDEXES = [ROW_FIELDS.index(field) for field in NUMERIC_FIELDS]
+
+
+def _make_row(path, description, data, time_period):
+    """按 ROW_FIELDS 顺序取原始值，CSV/Excel保持JSON中的数值类型"""
+    return (
+        path,
+        description,
+        time_period,
+        data.get("value", ""),
+        data.get("currency", ""),
+        data.get("unit", ""),
+        data.get("growth_rate", ""),
+        data.get("ratio", ""),
+    )
+
+
+def _as_text(value):
+    """Parquet字符串列：缺失为null，布尔值为true/false，嵌套对象为JSON"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _as_float(value):
+    """
+    Parquet数值列：数字直接转换；字符串去掉千分位、货币符号和百分号后解析，括号表示负数
+    布尔值、嵌套对象和无法解析的字符串为null（原文保留在 _text 列）
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().replace(",", "").replace("$", "").replace("%", "").strip()
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1].strip()
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return -number if negative else number
+
+
+def _parquet_row(row):
+    """原始行（含来源文件）→ 按 PARQUET_FIELDS 顺序的类型化行"""
+    typed = [_as_float(value) if idx in _NUMERIC_INDEXES else _as_text(value) for idx, value in enumerate(row)]
+    return tuple(typed) + tuple(_as_text(row[idx]) for idx in _NUMERIC_INDEXES)
+
+
+def iter_data_rows(data):
+    """
+    使用显式栈遍历 JSON 树结构，按 ROW_FIELDS 顺序逐行产出数据节点
+    遍历顺序与递归先序遍历一致：当前节点 → time_periods → 按键顺序的子节点
+    
+    Args:
+        data: JSON 树根节点
+    
+    Yields:
+        tuple: 按 ROW_FIELDS 顺序排列的原始值元组
+    """
+    stack = [("", data)]
+    while stack:
+        path, node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        
+        description = node.get("description", "")
+        
+        # 检查是否是数据节点
+        if node.get("node_type", "") == "data":
+            yield _make_row(path, description, node, node.get("time_period", ""))
+        
+        # 检查是否有 time_periods 子节点
+        time_periods = node.get("time_periods")
+        if isinstance(time_periods, dict) and time_periods.get("node_type") == "category":
+            for time_key, time_data in time_periods.items():
+                if time_key != "node_type" and time_key != "description":
+                    if isinstance(time_data, dict) and time_data.get("node_type") == "data":
+                        yield _make_row(path, description, time_data, time_data.get("time_period", time_key))
+        
+        # 子节点逆序入栈，保证出栈顺序与原键顺序一致
+        children = []
+        for key, value in node.items():
+            if key in ["node_type", "description", "time_periods"]:
+                continue
+            if isinstance(value, dict):
+                children.append((f"{path}/{key}" if path else key, value))
+        stack.extend(reversed(children))
+
 
 def flatten_json_to_rows(data, path="", rows=None):
     """
-    递归遍历 JSON 树结构，提取所有数据节点
+    遍历 JSON 树结构，提取所有数据节点
     
     Args:
         data: 当前节点数据
@@ -33,60 +149,50 @@ def flatten_json_to_rows(data, path="", rows=None):
     """
     if rows is None:
         rows = []
-    
-    if not isinstance(data, dict):
-        return rows
-    
-    node_type = data.get("node_type", "")
-    description = data.get("description", "")
-    
-    # 检查是否是数据节点
-    if node_type == "data":
-        # 这是一个叶子数据节点
-        row = {
-            "path": path,
-            "description": description,
-            "value": data.get("value", ""),
-            "currency": data.get("currency", ""),
-            "unit": data.get("unit", ""),
-            "time_period": data.get("time_period", ""),
-            "growth_rate": data.get("growth_rate", ""),
-            "ratio": data.get("ratio", "")
-        }
-        rows.append(row)
-    
-    # 检查是否有 time_periods 子节点
-    if "time_periods" in data:
-        time_periods = data["time_periods"]
-        if isinstance(time_periods, dict) and time_periods.get("node_type") == "category":
-            # 遍历所有时间周期
-            for time_key, time_data in time_periods.items():
-                if time_key != "node_type" and time_key != "description":
-                    if isinstance(time_data, dict) and time_data.get("node_type") == "data":
-                        row = {
-                            "path": path,
-                            "description": description,
-                            "value": time_data.get("value", ""),
-                            "currency": time_data.get("currency", ""),
-                            "unit": time_data.get("unit", ""),
-                            "time_period": time_data.get("time_period", time_key),
-                            "growth_rate": time_data.get("growth_rate", ""),
-                            "ratio": time_data.get("ratio", "")
-                        }
-                        rows.append(row)
-    
-    # 递归处理所有子节点
-    for key, value in data.items():
-        if key in ["node_type", "description", "time_periods"]:
-            continue
-        
-        if isinstance(value, dict):
-            new_path = f"{path}/{key}" if path else key
-            flatten_json_to_rows(value, new_path, rows)
-    
+    for row in iter_data_rows(data):
+        if path:
+            row = (f"{path}/{row[0]}" if row[0] else path,) + row[1:]
+        rows.append(dict(zip(ROW_FIELDS, row)))
     return rows
 
 
+def _is_valid_row(row):
+    """过滤掉没有值的空行"""
+    return bool(row[3] or row[2])
+
+
+class ColumnBuffer:
+    """按列缓存展平后的数据行"""
+    
+    def __init__(self, fields=ROW_FIELDS):
+        self.fields = list(fields)
+        self.columns = {field: [] for field in self.fields}
+        self._appenders = [self.columns[field].append for field in self.fields]
+    
+    def __len__(self):
+        return len(self.columns[self.fields[0]])
+    
+    def append(self, row):
+        for append, value in zip(self._appenders, row):
+            append(value)
+    
+    def extend(self, rows, extra=(), convert=None):
+        """过滤空行后追加，convert 对追加了 extra 的原始行做类型转换"""
+        for row in rows:
+            if _is_valid_row(row):
+                row = row + tuple(extra)
+                self.append(convert(row) if convert else row)
+    
+    def column_widths(self):
+        """每列最大字符长度（含列名）"""
+        return {field: max(max((len(str(value)) for value in values), default=0), len(field))
+                for field, values in self.columns.items()}
+    
+    def clear(self):
+        for values in self.columns.values():
+            values.clear()
+
+
 def json_to_csv(json_file_path, csv_file_path=None):
     """
     将 JSON 文件转换为 CSV 文件
@@ -107,7 +213,7 @@ def json_to_csv(json_file_path, csv_file_path=None):
         data = json.load(f)
     
     # 展平数据
-    rows = flatten_json_to_rows(data)
+    rows = list(iter_data_rows(data))
     
     if not rows:
         print(f"警告: {json_path.name} 中没有找到数据节点")
@@ -120,16 +226,14 @@ def json_to_csv(json_file_path, csv_file_path=None):
     csv_path = Path(csv_file_path)
     
     # 过滤掉没有值的空行
-    filtered_rows = [row for row in rows if row.get("value") or row.get("time_period")]
+    filtered_rows = [row for row in rows if _is_valid_row(row)]
     
     # 写入 CSV 文件
     print(f"正在写入: {csv_path.name} ({len(filtered_rows)} 行数据)")
     
-    fieldnames = ["path", "description", "time_period", "value", "currency", "unit", "growth_rate", "ratio"]
-    
     with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+        writer = csv.writer(f)
+        writer.writerow(ROW_FIELDS)
         writer.writerows(filtered_rows)
     
     print(f"✓ 成功转换: {csv_path.name}\n")
@@ -158,17 +262,18 @@ def json_to_excel(json_file_path, excel_file_path=None):
     with open(json_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
-    # 展平数据
-    rows = flatten_json_to_rows(data)
+    # 展平数据，按列缓存
+    rows = list(iter_data_rows(data))
     
     if not rows:
         print(f"警告: {json_path.name} 中没有找到数据节点")
         return
     
     # 过滤掉没有值的空行
-    filtered_rows = [row for row in rows if row.get("value") or row.get("time_period")]
+    buffer = ColumnBuffer()
+    buffer.extend(rows)
     
-    if not filtered_rows:
+    if not len(buffer):
         print(f"警告: {json_path.name} 中没有有效数据")
         return
     
@@ -178,12 +283,8 @@ def json_to_excel(json_file_path, excel_file_path=None):
     
     excel_path = Path(excel_file_path)
     
-    # 转换为 DataFrame
-    df = pd.DataFrame(filtered_rows)
-    
-    # 重新排列列的顺序
-    column_order = ["path", "description", "time_period", "value", "currency", "unit", "growth_rate", "ratio"]
-    df = df.reindex(columns=[col for col in column_order if col in df.columns])
+    # 转换为 DataFrame（列顺序即 ROW_FIELDS）
+    df = pd.DataFrame(buffer.columns, columns=ROW_FIELDS)
     
     # 写入 Excel 文件
     print(f"正在写入: {excel_path.name} ({len(df)} 行数据)")
@@ -195,12 +296,8 @@ def json_to_excel(json_file_path, excel_file_path=None):
         from openpyxl.utils import get_column_letter
         worksheet = writer.sheets['Data']
         
-        # 自动调整列宽
-        for idx, col in enumerate(df.columns, start=1):
-            max_length = max(
-                df[col].astype(str).map(len).max(),
-                len(str(col))
-            )
+        # 自动调整列宽（列宽在按列缓存时一次计算）
+        for idx, (col, max_length) in enumerate(buffer.column_widths().items(), start=1):
             # 设置列宽，最大不超过 50
             column_letter = get_column_letter(idx)
             worksheet.column_dimensions[column_letter].width = min(max_length + 2, 50)
@@ -208,8 +305,64 @@ def json_to_excel(json_file_path, excel_file_path=None):
     print(f"✓ 成功转换: {excel_path.name}\n")
 
 
+def results_to_parquet(results_dir, parquet_file_path, pattern="*_gpt-oss.json", row_group_size=100000):
+    """
+    将结果目录下的全部 JSON 文件展平汇总为一个 Parquet 文件
+    
+    Args:
+        results_dir: 结果 JSON 目录
+        parquet_file_path: Parquet 输出文件路径
+        pattern: 结果文件匹配模式
+        row_group_size: 每累积多少行写出一个 row group
+    """
+    if not PYARROW_AVAILABLE:
+        print("错误: pyarrow 未安装，无法生成 Parquet 文件")
+        return
+    
+    json_files = sorted(Path(results_dir).glob(pattern))
+    print(f"找到 {len(json_files)} 个结果文件")
+    
+    # 数值列为float64（无法解析时为null），原始取值保留在 _text 列
+    schema = pa.schema([(field, pa.float64() if field in NUMERIC_FIELDS else pa.string()) for field in PARQUET_FIELDS])
+    buffer = ColumnBuffer(PARQUET_FIELDS)
+    total_rows = 0
+    failed_files = 0
+    
+    with pq.ParquetWriter(str(parquet_file_path), schema) as writer:
+        for json_file in json_files:
+            try:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"警告: 读取失败 {json_file.name}: {str(e)}")
+                failed_files += 1
+                continue
+            
+            buffer.extend(iter_data_rows(data), extra=(json_file.name,), convert=_parquet_row)
+            if len(buffer) >= row_group_size:
+                total_rows += len(buffer)
+                writer.write_table(pa.table(buffer.columns, schema=schema))
+                buffer.clear()
+        
+        if len(buffer):
+            total_rows += len(buffer)
+            writer.write_table(pa.table(buffer.columns, schema=schema))
+    
+    print(f"✓ 成功写入: {parquet_file_path} ({total_rows} 行数据，{len(json_files) - failed_files} 个文件)")
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="JSON 转 Excel/CSV/Parquet 转换工具")
+    parser.add_argument("--results-dir", default=None, help="汇总该目录下的全部结果 JSON 为一个 Parquet 文件")
+    parser.add_argument("--parquet-path", default=None, help="Parquet 输出路径（默认为结果目录下的 results.parquet）")
+    args = parser.parse_args()
+    
+    if args.results_dir:
+        parquet_path = args.parquet_path or str(Path(args.results_dir) / "results.parquet")
+        results_to_parquet(args.results_dir, parquet_path)
+        return
+    
     # 设置文件路径
     base_dir = Path(__file__).parent / "datasets"
     
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+海外财报抽取使用的模型调用
+"""
+
+from openai import OpenAI
+
+
+def gpt_oss_chat(message):
+    client = OpenAI(
+        api_key="EMPTY",  # vLLM 部署通常不需要真实 API key
+        base_url="http://10.100.0.2:8002/v1",  # vLLM 默认端口，请根据实际部署情况修改
+    )
+    
+    completion = client.chat.completions.create(
+        model="gptoss",
+        messages=[
+            {"role": "user", "content": message}
+        ],
+        temperature=0.6,
+        top_p=0.95,
+        response_format={
+            "type": "json_object"
+        },
+        timeout=3600
+    )
+    
+    return completion.choices[0].message.content
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+海外财报文档预处理：段落分割、段落级rerank、财务报表过滤、行级精排
+test.py、demo.py 和 batch_runner.py 共用
+"""
+
+import requests
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from reranker import get_paragraph_reranker
+from title_index import get_title_index, tokenize_title
+
+
+def split_text_into_paragraphs(text):
+    """
+    将长文本按 markdown 标题分割成段落
+    以 # 开头的为标题，两个标题之间为一个段落
+    
+    Args:
+        text: 输入文本
+        max_length: 每个段落的最大字符数（暂时保留参数，未来可用于进一步分割）
+    
+    Returns:
+        list: 段落列表，每个段落是一个字典 {"title": 标题, "content": 内容}
+    """
+    lines = text.split('\n')
+    paragraphs = []
+    current_title = ""
+    current_content = []
+    
+    for line in lines:
+        # 检查是否是标题行（以一个或多个 # 开头）
+        if line.strip().startswith('#'):
+            # 保存前一个段落
+            if current_title or current_content:
+                content_text = '\n'.join(current_content).strip()
+                if content_text:  # 只添加有内容的段落
+                    paragraphs.append({
+                        "title": current_title,
+                        "content": content_text
+                    })
+            
+            # 开始新的段落
+            current_title = line.strip()
+            current_content = []
+        else:
+            # 累积当前段落的内容
+            current_content.append(line)
+    
+    # 添加最后一个段落
+    if current_title or current_content:
+        content_text = '\n'.join(current_content).strip()
+        if content_text:
+            paragraphs.append({
+                "title": current_title,
+                "content": content_text
+            })
+    
+    return paragraphs
+
+
+def batch_rerank_lines(lines, question, max_lines=20, score_threshold=0):
+    """
+    使用批量重排序API对段落内的多行文本进行精排
+    
+    Args:
+        lines: 文本行列表
+        question: 查询问题（通常是段落标题）
+        max_lines: 返回的最大行数
+        score_threshold: 相关性分数阈值
+    
+    Returns:
+        str: 精排后的文本（pruned_context）
+    """
+    if not lines or len(lines) <= 1:
+        return '\n'.join(lines) if lines else ""
+    
+    # 过滤空行
+    non_empty_lines = [line for line in lines if line.strip()]
+    if len(non_empty_lines) <= 1:
+        return '\n'.join(lines)
+    
+    try:
+        # 构建批量重排序请求数据
+        request_data = []
+        for line in non_empty_lines:
+            request_data.append({
+                "question": question,
+                "context": line
+            })
+        
+        # 调用批量重排序API
+        response = requests.post(
+            "http://10.100.0.1:7004/rerank/batch",
+            json=request_data,
+            headers={"Content-Type": "application/json"},
+            timeout=60
+        )
+        
+        if response.status_code != 200:
+            print(f"    ⚠ 批量重排序API请求失败 (状态码: {response.status_code})，返回原文本")
+            return '\n'.join(lines)
+        
+        # 解析响应
+        results = response.json()
+       
+        # 提取 pruned_context 并按分数排序
+        scored_contexts = []
+        for i, result in enumerate(results):
+            if 'pruned_context' in result and 'score' in result:
+                
+                if result['reranking_score'] >= score_threshold:
+                   
+                    scored_contexts.append({
+                        'context': result['pruned_context'],
+                        'score': result['reranking_score'],
+                        'original_index': i
+                    })
+        
+        if not scored_contexts:
+            return ''
+        
+        # 按原始顺序排序（保持文档逻辑顺序）
+        scored_contexts.sort(key=lambda x: x['original_index'])
+        
+        # 取前 max_lines 个
+        selected_contexts = scored_contexts[:max_lines]
+        
+        # 拼接精排后的内容
+        pruned_text = '\n'.join([item['context'] for item in selected_contexts])
+        
+        print(f"    ✓ 行级精排: {len(non_empty_lines)} 行 → {len(selected_contexts)} 行 (阈值: {score_threshold})")
+        
+        return pruned_text
+        
+    except Exception as e:
+        print(f"    ⚠ 批量重排序失败: {str(e)}，返回原文本")
+        return '\n'.join(lines)
+
+
+def rerank_paragraphs(paragraphs, query, top_k=10, score_threshold=0.3):
+    """
+    使用rerank模型对段落进行相关性排序和筛选
+    
+    Args:
+        paragraphs: 段落列表（字典列表，包含 title 和 content）
+        query: 查询文本，用于判断段落相关性
+        top_k: 返回的最相关段落数量
+        score_threshold: 相关性分数阈值，低于此分数的段落将被过滤
+    
+    Returns:
+        list: 筛选后的段落列表（按原文顺序）
+    """
+    if not paragraphs:
+        return []
+    
+    try:
+        # 提取段落内容用于rerank（标题+内容）
+        paragraph_texts = []
+        for para in paragraphs:
+            title = para.get('title', '')
+            content = para.get('content', '')
+            text = f"{title}\n{content}" if title else content
+            paragraph_texts.append(text)
+        
+        # 分批并发打分（命中缓存的段落不再请求）
+        scores = get_paragraph_reranker().score(query, paragraph_texts)
+        ranked_results = [
+            {"index": index, "relevance_score": score}
+            for index, score in enumerate(scores) if score is not None
+        ]
+        failed_indices = [index for index, score in enumerate(scores) if score is None]
+        
+        if not ranked_results:
+            print(f"  ⚠ Rerank 所有批次请求失败，返回所有段落")
+            return paragraphs
+        
+        # 按分数排序并筛选
+        sorted_results = sorted(ranked_results, key=lambda x: x['relevance_score'], reverse=True)
+        
+        # 如果结果数量不足，直接返回所有结果
+        if len(sorted_results) < top_k:
+            filtered_results = sorted_results
+        else:
+            # 筛选出分数高于阈值的结果，但至少返回前 top_k 个
+            filtered_results = [
+                r for r in sorted_results 
+                if r['relevance_score'] >= score_threshold
+            ]
+            # 如果过滤后结果太少，至少保留前 top_k 个（即使分数低于阈值）
+            if len(filtered_results) < top_k:
+                filtered_results = sorted_results[:top_k]
+            else:
+                filtered_results = filtered_results[:top_k]
+        
+        # 按原文顺序重新排列（保持文档的逻辑顺序）
+        filtered_results = sorted(filtered_results, key=lambda x: x['index'])
+        
+        # 提取段落，打分失败的批次中的段落全部保留
+        selected_indices = sorted({r['index'] for r in filtered_results} | set(failed_indices))
+        selected_paragraphs = [paragraphs[index] for index in selected_indices]
+        
+        # for para in selected_paragraphs:
+        #     print(para['title'])
+        #     print(para['content'])
+        #     print('--------------------------------\n\n')
+
+        print(f"  ✓ 段落级Rerank完成: {len(paragraphs)} 段落 → {len(selected_paragraphs)} 段落 (阈值: {score_threshold}, top_k: {top_k})")
+        if filtered_results:
+            print(f"  ✓ 分数范围: {filtered_results[0]['relevance_score']:.3f} ~ {filtered_results[-1]['relevance_score']:.3f}")
+            print(f"  ✓ 保留率: {len(selected_paragraphs)/len(paragraphs)*100:.1f}%")
+        
+        return selected_paragraphs
+        
+    except Exception as e:
+        print(f"  ⚠ Rerank处理失败: {str(e)}，返回所有段落")
+        return paragraphs
+
+
+def filter_financial_statements(paragraphs, bm25_threshold=10.0):
+    """
+    使用 BM25 过滤掉财务报表相关段落
+    只使用段落标题（title）进行相似度判断，高于阈值的段落将被过滤掉
+    优先使用全语料标题索引（见 title_index.py），使IDF和阈值在不同文档间保持一致
+    
+    Args:
+        paragraphs: 段落列表
+        bm25_threshold: BM25 分数阈值，高于此值的段落将被过滤
+    
+    Returns:
+        list: 过滤后的段落列表
+    """
+    if not paragraphs:
+        return []
+    
+    # 标准财务报表查询语句（三大报表）
+    financial_statement_queries = [
+        "Condensed Consolidated Statements of Operations",
+        "Condensed Consolidated Statements of Comprehensive Income", 
+        "Condensed Consolidated Statements of Cash Flows",
+        "Condensed Consolidated Statements of Stockholders' Equity",
+        "Consolidated Balance Sheets",
+        "Consolidated Statements of Income",
+        "Consolidated Statements of Cash Flows"
+    ]
+    
+    try:
+        # 只提取段落标题用于过滤
+        paragraph_titles = [para.get('title', '') for para in paragraphs]
+        
+        # 使用集合存储要过滤的段落索引
+        paragraphs_to_filter = set()
+        
+        title_index = get_title_index()
+        if title_index is not None:
+            # 使用全语料标题索引，一次稀疏矩阵乘法得到所有标题对所有查询的分数
+            scores = title_index.score(paragraph_titles, financial_statement_queries)
+            paragraphs_to_filter.update(np.nonzero((scores >= bm25_threshold).any(axis=1))[0].tolist())
+        else:
+            # 没有语料索引时，退回基于当前文档标题的BM25
+            tokenized_titles = [tokenize_title(title) for title in paragraph_titles]
+            
+            # 过滤掉空的分词结果，记录有效索引
+            valid_indices = []
+            valid_tokenized = []
+            for i, tokens in enumerate(tokenized_titles):
+                if tokens:  # 只保留非空的
+                    valid_indices.append(i)
+                    valid_tokenized.append(tokens)
+            
+            if not valid_tokenized:
+                return paragraphs
+            
+            # 构建 BM25 索引
+            bm25 = BM25Okapi(valid_tokenized)
+            
+            for query in financial_statement_queries:
+                query_tokens = tokenize_title(query)
+                if not query_tokens:
+                    continue
+                    
+                # 计算 BM25 分数
+                scores = bm25.get_scores(query_tokens)
+                
+                # 找出分数高于阈值的段落，这些段落将被过滤掉
+                for idx, score in enumerate(scores):
+                    if score >= bm25_threshold:
+                        # 映射回原始索引
+                        original_idx = valid_indices[idx]
+                        paragraphs_to_filter.add(original_idx)
+        
+        # 过滤段落：只保留分数低于阈值的段落
+        filtered = []
+        for i, para in enumerate(paragraphs):
+            if i not in paragraphs_to_filter:
+                filtered.append(para)
+        
+        filtered_count = len(paragraphs) - len(filtered)
+        if filtered_count > 0:
+            print(f"  ✓ 过滤财务报表段落: {filtered_count} 个段落被过滤 (BM25阈值: {bm25_threshold})")
+        
+        return filtered
+        
+    except Exception as e:
+        print(f"  ⚠ 财务报表过滤失败: {str(e)}，返回所有段落")
+        return paragraphs
+
+
+def preprocess_document(md_content, enable_rerank=True, top_k=80, enable_statement_filter=True, enable_line_rerank=True):
+    """
+    预处理文档：两级精排
+    1. 按 markdown 标题分割段落
+    2. 段落级别：使用rerank筛选相关段落
+    3. 过滤财务报表段落
+    4. 行级别：对每个段落内部的多行文本进行批量重排序精排
+    
+    Args:
+        md_content: markdown文档内容
+        enable_rerank: 是否启用rerank筛选
+        top_k: 段落级rerank保留的段落数量
+        enable_statement_filter: 是否过滤财务报表段落
+        enable_line_rerank: 是否进行行级精排
+    
+    Returns:
+        str: 筛选后的文档内容
+    """
+    # 第一步：按标题分割段落
+    paragraphs = split_text_into_paragraphs(md_content)
+    print(f"  ✓ 文档分割: {len(md_content)} 字符 → {len(paragraphs)} 段落")
+    
+    if not enable_rerank or len(paragraphs) <= 5:
+        # 如果段落数量较少，不需要rerank，直接返回
+        result_paragraphs = []
+        for para in paragraphs:
+            title = para.get('title', '')
+            content = para.get('content', '')
+            if title:
+                result_paragraphs.append(f"{title}\n{content}")
+            else:
+                result_paragraphs.append(content)
+        return '\n\n'.join(result_paragraphs)
+    
+    # 第二步：段落级别的rerank筛选 - 聚焦产品、技术、营收核心业务
+    # 段落级排序：只筛选产品线、技术研发、营收收入相关的核心业务内容
+    rank_query = "Core business disclosure: product lines and services, technology and R&D capabilities, revenue and sales by segment. Product portfolio, technology innovation, revenue breakdown by product category or geographic market."
+    selected_paragraphs = rerank_paragraphs(
+        paragraphs,
+        query=rank_query,
+        top_k=top_k,  # 选择最相关的段落
+        score_threshold=0.1  # 分数阈值
+    )
+    
+    # 第三步：过滤财务报表段落（使用更宽松的阈值，避免过度过滤）
+    print(f"  → Rerank后剩余: {len(selected_paragraphs)} 段落")
+    if enable_statement_filter:
+        selected_paragraphs = filter_financial_statements(selected_paragraphs, bm25_threshold=15.0)  # 提高阈值，减少过滤
+        print(f"  ✓ 财务报表过滤后剩余: {len(selected_paragraphs)} 段落")
+    
+    # 第四步：对每个段落内部进行行级精排
+    if enable_line_rerank:
+        print(f"  → 开始行级精排...")
+    refined_paragraphs = []
+    
+    for para in selected_paragraphs:
+        title = para.get('title', '')
+        content = para.get('content', '')
+        
+        # 按换行符分割内容
+        lines = content.split('\n')
+        
+        # 如果有多行，进行批量重排序精排
+        if enable_line_rerank and len(lines) > 1:
+            # 行级排序：只保留产品、技术、营收相关的量化数据行
+            line_rank_query = "Product revenue, technology development, sales figures by product line or region. Specific product names, technology capabilities, revenue amounts, market share percentages."
+            
+            # 行级精排（降低阈值，保留更多内容）
+            pruned_content = batch_rerank_lines(
+                lines, 
+                question=line_rank_query,
+                max_lines=50,  # 每个段落最多保留50行（增加保留数量）
+                score_threshold=0.2  # 降低阈值，保留更多行
+            )
+        else:
+            pruned_content = content
+        
+        # 重新组装段落
+        if title:
+            refined_paragraphs.append(f"{title}\n{pruned_content}")
+        else:
+            refined_paragraphs.append(pruned_content)
+    
+    # 合并筛选后的段落
+    filtered_content = "\n\n".join(refined_paragraphs)
+    print(f"  ✓ 内容压缩: {len(md_content)} 字符 → {len(filtered_content)} 字符 (压缩率: {(1-len(filtered_content)/len(md_content))*100:.1f}%)")
+    
+    return filtered_content
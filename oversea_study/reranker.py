@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+段落级rerank打分
+- 按段落数和字符数将文档切分为多个批次并发请求 /rerank，合并为与输入顺序一致的分数列表
+- 以 sha1(query, 段落文本) 为键将分数缓存到本地sqlite，同一公司各季度重复出现的样板段落无需重复打分
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from config import RERANK_CONFIG
+
+
+class RerankScoreCache:
+    """sqlite分数缓存，多线程共享一个连接"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL模式允许多个批量进程同时读写同一缓存文件
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rerank_scores (key TEXT PRIMARY KEY, score REAL NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(query, text):
+        return hashlib.sha1(f"{query}\x00{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """批量查询，返回 {key: score}"""
+        found = {}
+        unique_keys = list(set(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(f"SELECT key, score FROM rerank_scores WHERE key IN ({placeholders})", chunk)
+                found.update(rows.fetchall())
+        return found
+
+    def put_many(self, items):
+        """批量写入 [(key, score)]"""
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO rerank_scores (key, score) VALUES (?, ?)", items)
+            self._conn.commit()
+
+
+class ParagraphReranker:
+    """分批并发的段落rerank打分器"""
+
+    def __init__(self, config=None):
+        config = config or RERANK_CONFIG
+        self.api_url = config["api_url"]
+        self.api_key = config["api_key"]
+        self.model = config["model"]
+        self.timeout = config["timeout"]
+        self.batch_size = config["batch_size"]
+        self.batch_max_chars = config["batch_max_chars"]
+        self.max_retries = config["max_retries"]
+        self.cache = RerankScoreCache(config["cache_path"]) if config.get("cache_path") else None
+        self._executor = ThreadPoolExecutor(max_workers=config["max_workers"], thread_name_prefix="paragraph-rerank")
+
+    def make_batches(self, indices, texts):
+        """按段落数和字符数切分批次，单个超长段落独占一个批次"""
+        batches, current, current_chars = [], [], 0
+        for index in indices:
+            length = len(texts[index])
+            if current and (len(current) >= self.batch_size or current_chars + length > self.batch_max_chars):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(index)
+            current_chars += length
+        if current:
+            batches.append(current)
+        return batches
+
+    def _rerank_batch(self, query, documents):
+        """请求一个批次，返回与documents顺序一致的分数列表"""
+        data = {"model": self.model, "query": query, "documents": documents}
+        headers = {
+            "accept": "application/json",
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+        last_error = None
+        for _ in range(self.max_retries + 1):
+            try:
+                response = requests.post(self.api_url, headers=headers, json=data, timeout=self.timeout)
+                if response.status_code != 200:
+                    raise RuntimeError(f"状态码: {response.status_code}")
+                scores = [None] * len(documents)
+                for result in json.loads(response.text)['results']:
+                    scores[result['index']] = result['relevance_score']
+                return scores
+            except Exception as e:
+                last_error = e
+        raise RuntimeError(f"Rerank批次请求失败 ({len(documents)} 段落): {last_error}")
+
+    def score(self, query, texts):
+        """
+        对全部段落打分
+
+        Args:
+            query: 查询文本
+            texts: 段落文本列表
+
+        Returns:
+            list: 与texts顺序一致的分数，请求失败的段落为None
+        """
+        scores = [None] * len(texts)
+        keys = [RerankScoreCache.make_key(query, text) for text in texts]
+        if self.cache:
+            cached = self.cache.get_many(keys)
+            for index, key in enumerate(keys):
+                scores[index] = cached.get(key)
+
+        missing = [index for index, score in enumerate(scores) if score is None]
+        batches = self.make_batches(missing, texts)
+        futures = [(batch, self._executor.submit(self._rerank_batch, query, [texts[index] for index in batch]))
+                   for batch in batches]
+
+        new_items = []
+        for batch, future in futures:
+            try:
+                batch_scores = future.result()
+            except Exception as e:
+                print(f"  ⚠ {str(e)}")
+                continue
+            for index, batch_score in zip(batch, batch_scores):
+                scores[index] = batch_score
+                if batch_score is not None:
+                    new_items.append((keys[index], batch_score))
+        if self.cache:
+            self.cache.put_many(new_items)
+
+        print(f"  ✓ Rerank打分: {len(texts)} 段落，缓存命中 {len(texts) - len(missing)}，"
+              f"请求 {len(batches)} 个批次")
+        return scores
+
+
+_paragraph_reranker = None
+_paragraph_reranker_lock = threading.Lock()
+
+
+def get_paragraph_reranker():
+    """获取进程内共享的段落rerank打分器"""
+    global _paragraph_reranker
+    if _paragraph_reranker is None:
+        with _paragraph_reranker_lock:
+            if _paragraph_reranker is None:
+                _paragraph_reranker = ParagraphReranker()
+    return _paragraph_reranker
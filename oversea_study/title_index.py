@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全语料段落标题BM25索引
+- 以所有已下载财报的段落标题为语料统计文档频率，IDF在不同文档间保持一致
+- 索引持久化为 .npz，新下载的文件可增量加入
+- 打分时构建标题×查询词的稀疏矩阵，一次稀疏矩阵乘法得到所有查询的分数
+
+用法：
+    python oversea_study/title_index.py --datasets-dir oversea_study/datasets
+"""
+
+import os
+import re
+import argparse
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+from config import TITLE_INDEX_CONFIG
+
+
+def tokenize_title(text):
+    """标题分词：移除 markdown 标记符号 #，转小写，去标点后按空格分词"""
+    text = text.replace('#', '').lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return text.split()
+
+
+class TitleBM25Index:
+    """语料级标题BM25统计量：词表、文档频率、标题总数及总长度"""
+
+    def __init__(self, k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocab = {}
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.n_docs = 0
+        self.total_length = 0
+        self.indexed_files = set()
+        self._average_idf = None
+
+    @property
+    def avgdl(self):
+        return self.total_length / self.n_docs if self.n_docs else 0.0
+
+    def add_document(self, file_name, titles):
+        """将一个文件的全部段落标题加入语料统计，已加入的文件跳过"""
+        if file_name in self.indexed_files:
+            return False
+        counts = Counter()
+        for title in titles:
+            tokens = tokenize_title(title)
+            if not tokens:
+                continue
+            self.n_docs += 1
+            self.total_length += len(tokens)
+            counts.update(set(tokens))
+
+        new_terms = [term for term in counts if term not in self.vocab]
+        for term in new_terms:
+            self.vocab[term] = len(self.vocab)
+        if new_terms:
+            self.doc_freq = np.concatenate([self.doc_freq, np.zeros(len(new_terms), dtype=np.int64)])
+        if counts:
+            ids = np.fromiter((self.vocab[term] for term in counts), dtype=np.int64, count=len(counts))
+            self.doc_freq[ids] += np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        self.indexed_files.add(file_name)
+        self._average_idf = None
+        return True
+
+    def _raw_idf(self, doc_freq):
+        return np.log(self.n_docs - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+
+    def idf(self, terms):
+        """与rank_bm25.BM25Okapi一致的IDF：负值替换为 epsilon * 平均IDF"""
+        if self._average_idf is None:
+            self._average_idf = float(self._raw_idf(self.doc_freq).mean()) if len(self.doc_freq) else 0.0
+        doc_freq = np.array([self.doc_freq[self.vocab[term]] if term in self.vocab else 0 for term in terms], dtype=np.float64)
+        idf = self._raw_idf(doc_freq)
+        idf[idf < 0] = self.epsilon * self._average_idf
+        return idf
+
+    def score(self, titles, queries):
+        """
+        计算每个标题对每个查询的BM25分数
+
+        Args:
+            titles: 标题列表
+            queries: 查询语句列表
+
+        Returns:
+            np.ndarray: 形状为 (标题数, 查询数) 的分数矩阵
+        """
+        query_tokens = [tokenize_title(query) for query in queries]
+        terms = sorted({token for tokens in query_tokens for token in tokens})
+        if not titles or not terms or not self.n_docs:
+            return np.zeros((len(titles), len(queries)))
+        columns = {term: index for index, term in enumerate(terms)}
+
+        # 标题×查询词 的词频矩阵（只保留查询中出现的词）
+        rows, cols, data = [], [], []
+        doc_length = np.zeros(len(titles))
+        for row, title in enumerate(titles):
+            tokens = tokenize_title(title)
+            doc_length[row] = len(tokens)
+            for term, count in Counter(token for token in tokens if token in columns).items():
+                rows.append(row)
+                cols.append(columns[term])
+                data.append(count)
+        tf = sparse.csr_matrix((np.array(data, dtype=np.float64), (rows, cols)), shape=(len(titles), len(terms)))
+
+        # BM25词权重：idf * tf*(k1+1) / (tf + k1*(1-b+b*dl/avgdl))
+        norm = self.k1 * (1 - self.b + self.b * doc_length / self.avgdl)
+        nonzero_rows = np.repeat(np.arange(len(titles)), np.diff(tf.indptr))
+        tf.data = tf.data * (self.k1 + 1) / (tf.data + norm[nonzero_rows])
+        weights = tf.multiply(self.idf(terms)[np.newaxis, :]).tocsr()
+
+        # 查询×查询词 的词频矩阵，重复的查询词重复计分
+        q_rows, q_cols, q_data = [], [], []
+        for row, tokens in enumerate(query_tokens):
+            for term, count in Counter(tokens).items():
+                q_rows.append(row)
+                q_cols.append(columns[term])
+                q_data.append(count)
+        query_matrix = sparse.csr_matrix((np.array(q_data, dtype=np.float64), (q_rows, q_cols)), shape=(len(queries), len(terms)))
+
+        return (weights @ query_matrix.T).toarray()
+
+    def save(self, path):
+        """原子写入 .npz 索引文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f,
+                     terms=np.array(terms, dtype=str),
+                     doc_freq=self.doc_freq,
+                     stats=np.array([self.n_docs, self.total_length], dtype=np.int64),
+                     params=np.array([self.k1, self.b, self.epsilon]),
+                     files=np.array(sorted(self.indexed_files), dtype=str))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            k1, b, epsilon = data["params"].tolist()
+            index = cls(k1=k1, b=b, epsilon=epsilon)
+            index.vocab = {term: i for i, term in enumerate(data["terms"].tolist())}
+            index.doc_freq = data["doc_freq"].astype(np.int64)
+            index.n_docs, index.total_length = data["stats"].tolist()
+            index.indexed_files = set(data["files"].tolist())
+        return index
+
+
+_title_index = None
+_title_index_loaded = False
+_title_index_lock = threading.Lock()
+
+
+def get_title_index():
+    """加载持久化的语料索引；scipy不可用、索引不存在或语料过小时返回None"""
+    global _title_index, _title_index_loaded
+    if not _title_index_loaded:
+        with _title_index_lock:
+            if not _title_index_loaded:
+                index_path = TITLE_INDEX_CONFIG["index_path"]
+                if SCIPY_AVAILABLE and os.path.exists(index_path):
+                    index = TitleBM25Index.load(index_path)
+                    if index.n_docs >= TITLE_INDEX_CONFIG["min_titles"]:
+                        _title_index = index
+                _title_index_loaded = True
+    return _title_index
+
+
+def build_index(datasets_dir, index_path):
+    """将目录下尚未加入索引的markdown文件增量加入语料索引"""
+    from preprocess import split_text_into_paragraphs
+
+    if os.path.exists(index_path):
+        index = TitleBM25Index.load(index_path)
+    else:
+        index = TitleBM25Index(k1=TITLE_INDEX_CONFIG["k1"], b=TITLE_INDEX_CONFIG["b"], epsilon=TITLE_INDEX_CONFIG["epsilon"])
+
+    added = 0
+    for md_file in sorted(Path(datasets_dir).glob("*.md")):
+        if md_file.name in index.indexed_files:
+            continue
+        with open(md_file, 'r', encoding='utf-8') as f:
+            paragraphs = split_text_into_paragraphs(f.read())
+        index.add_document(md_file.name, [para.get('title', '') for para in paragraphs])
+        added += 1
+
+    index.save(index_path)
+    print(f"标题索引更新完成: 新增 {added} 个文件，共 {len(index.indexed_files)} 个文件、{index.n_docs} 个标题、{len(index.vocab)} 个词")
+    return index
+
+
+if __name__ == "__main__":
+    from config import PATH_CONFIG
+
+    parser = argparse.ArgumentParser(description="构建/增量更新段落标题BM25索引")
+    parser.add_argument("--datasets-dir", default=PATH_CONFIG["datasets_dir"], help="markdown文件目录")
+    parser.add_argument("--index-path", default=TITLE_INDEX_CONFIG["index_path"], help="索引文件路径")
+    args = parser.parse_args()
+    build_index(args.datasets_dir, args.index_path)
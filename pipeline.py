@@ -1,22 +1,29 @@
-from pymongo import MongoClient
-from utils.mysql_util import get_company_name,get_type_name
 import requests,json
 import os
-from utils.data_prepare import content_to_kv,read_single_md_file,Markdown_header_splits,Markdown2Text_with_header,table_to_text,Markdown2Text
-from models.model_infer import qwen_chat
+from utils.data_prepare import read_single_md_file,strip_md_images
+from models.model_infer import qwen_chat,qwen_chat_stream
 from models.prompt import WIND_ANNO_PROMPT
 from data_transfer.JSONToNebula import JSONToNebulaInserter
 from configs.config import *
-import pandas as pd
-from utils.split_markdown_by_headers import split_by_headers
+from utils.split_markdown_by_headers import split_by_headers,iter_sections
+from utils.context_packer import pack_sections,content_budget,merge_extraction_results,get_tokenizer
+from utils.stream_json import iter_json_events
+from models.group_extraction import grouped_extraction
 from utils.redis_cache import fetch_one,ack,rollback_unprocessed,failed_rollback
 from utils.use_tool import US3Client
+from utils.us3_cache import US3DiskCache,US3Prefetcher
+from utils.ngql_cache import NGQLResultCache
+from utils.company_resolver import CompanyResolver
+from utils.report_labels import load_report_labels
+from utils.concurrency import RERANK_LIMITER
 from pathlib import Path
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 import logging
+import signal
 import time
+import gc
 
 # 配置日志
 def setup_logger():
@@ -41,11 +48,50 @@ def setup_logger():
 
 logger = setup_logger()
 
-global report_labels
-report_labels = pd.read_excel("data/report.xlsx", engine='openpyxl').fillna('').values.tolist()
-report_labels = [item[0]+' '+item[1] for item in report_labels]
-us3_client = US3Client()
-inserter = JSONToNebulaInserter(nebula_config,space_name="YXSupplyChains")
+# 章节标签、US3客户端和图谱写入器在首次使用时初始化，导入本模块不读取文件、不连接外部服务
+_report_labels = None
+_company_resolver = None
+_us3_client = None
+_inserter = None
+# 收到SIGTERM后置位，worker处理完当前任务后退出
+_stop_event = threading.Event()
+
+def get_report_labels():
+    global _report_labels
+    if _report_labels is None:
+        _report_labels = load_report_labels()
+    return _report_labels
+
+def get_company_resolver():
+    global _company_resolver
+    if _company_resolver is None and COMPANY_RESOLVER_ENABLED:
+        _company_resolver = CompanyResolver.load_or_build()
+    return _company_resolver
+
+def preload():
+    """
+    supervisor fork worker前调用：加载只读数据（章节标签、公司别名映射、tokenizer）
+    fork后各worker以写时复制方式共享；数据库和US3连接仍在各worker内首次使用时创建
+    """
+    get_report_labels()
+    get_company_resolver()
+    get_tokenizer()
+    # 已加载的对象移出GC跟踪，避免子进程GC遍历时写引用计数页导致复制
+    gc.freeze()
+
+def get_us3_client():
+    global _us3_client
+    if _us3_client is None:
+        _us3_client = US3Client()
+    return _us3_client
+
+def get_inserter():
+    global _inserter
+    if _inserter is None:
+        _inserter = JSONToNebulaInserter(nebula_config,space_name="YXSupplyChains",
+                                         ngql_cache=NGQLResultCache() if NGQL_CACHE_INVALIDATE else None,
+                                         company_resolver=get_company_resolver())
+    return _inserter
 
 def value_check(parsed_data):
     for key,value in parsed_data.items():
@@ -54,8 +100,9 @@ def value_check(parsed_data):
                 parsed_data[key][k] = ''
     return parsed_data
 
-def qwen_inference_pipeline(md_content):
-    sections = split_by_headers(md_content)
+def filter_sections(sections):
+    """按章节标题与报告标签的rerank分数筛选参与抽取的章节，sections可以是边下载边拆分的迭代器"""
+    report_labels = get_report_labels()
     filter_contents = []
     for section in sections:
         header = section['title']
@@ -69,7 +116,10 @@ def qwen_inference_pipeline(md_content):
             "Content-Type": "application/json",
             "Authorization": f"Bearer sk-1234",
         }
-        r = requests.post('http://10.100.0.205:4000/rerank',headers=headers, json=data)
+        # 与同机其他worker共享rerank并发上限，429/5xx时收缩
+        with RERANK_LIMITER.call():
+            r = requests.post('http://10.100.0.205:4000/rerank',headers=headers, json=data)
+            r.raise_for_status()
         ranked_results = json.loads(r.text)['results']
 
         original_order_scores = []
@@ -83,57 +133,156 @@ def qwen_inference_pipeline(md_content):
         title_scores = original_order_scores[0]
         title_index,title_score = title_scores['index'],title_scores['score']
         
-        if title_score > 0.7:
+        if title_score > RERANK_SCORE_THRESHOLD:
             # if "<table" in content:
             #     content = table_to_text(content).strip()
-            filter_contents.append(content)
-    response = qwen_chat(WIND_ANNO_PROMPT.format(contents='\n'.join(filter_contents))).replace('None','')
-    parsed_data = json.loads(response)
+            filter_contents.append({"title":header,"content":content,"score":title_score,"label":report_labels[title_index]})
+    return filter_contents
+
+def qwen_inference_pipeline(sections):
+    filter_contents = filter_sections(sections)
+
+    # 分组模式：按实体组路由章节并发抽取
+    if QWEN_EXTRACTION_MODE == "grouped":
+        return grouped_extraction(filter_contents)
+
+    # 按token预算打包章节，一次放不下时拆成多次抽取再合并结果
+    budget = content_budget(WIND_ANNO_PROMPT, QWEN_CONTEXT_TOKEN_BUDGET)
+    batches = pack_sections(filter_contents, budget, max_batches=QWEN_MAX_EXTRACTION_CALLS)
+    partial_results = []
+    for batch in batches:
+        response = qwen_chat(WIND_ANNO_PROMPT.format(contents='\n'.join(batch))).replace('None','')
+        partial_results.append(json.loads(response))
+    if len(partial_results) == 1:
+        return partial_results[0]
+    parsed_data = merge_extraction_results(partial_results)
     return parsed_data
 
+def qwen_stream_pipeline(sections):
+    """流式抽取：边解码边写入图数据库，返回完整抽取结果"""
+    filter_contents = filter_sections(sections)
+    budget = content_budget(WIND_ANNO_PROMPT, QWEN_CONTEXT_TOKEN_BUDGET)
+    batches = pack_sections(filter_contents, budget, max_batches=QWEN_MAX_EXTRACTION_CALLS)
+    partial_results = []
+    inserter = get_inserter()
+    inserter.connect_database()
+    try:
+        for batch in batches:
+            chunks = qwen_chat_stream(WIND_ANNO_PROMPT.format(contents='\n'.join(batch)))
+            partial_results.append(inserter.insert_stream_events(iter_json_events(chunks)))
+        inserter.print_stats()
+    finally:
+        inserter.close_connection()
+    if len(partial_results) == 1:
+        return partial_results[0]
+    return merge_extraction_results(partial_results)
+
+def process_sections(name, sections):
+    """抽取文档章节并入库，name为输出JSON文件名（不含后缀）"""
+    # 流式模式在抽取过程中已完成入库
+    streaming = QWEN_EXTRACTION_MODE == "stream"
+    parsed_data = qwen_stream_pipeline(sections) if streaming else qwen_inference_pipeline(sections)
+    if not streaming:
+        # 写文件前解析公司名称，输出JSON与入库数据一致；入库时再次解析不会改变已规范化的名称
+        get_inserter().resolve_document_names(parsed_data)
+    output_file = f"{QWEN_INFERENCE_JSON_PATH}/{name}{QWEN_FILE_SUFFIX}"
+
+    # 确保responses目录存在
+    os.makedirs(QWEN_INFERENCE_JSON_PATH, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as fp:
+        fp.write(json.dumps(parsed_data, ensure_ascii=False, indent=2))
+    fp.close()
+
+    if not streaming:
+        get_inserter().run_insertion(parsed_data)
+
 def process_single_file(file_path):
     """处理单个文件的工作函数"""
     try:
         logger.info(f"开始处理文件: {file_path}")
         md_content = read_single_md_file(file_path)
-        parsed_data = qwen_inference_pipeline(md_content)
-        # 使用线程锁确保文件写入的线程安全
-        filename = Path(file_path).stem
-        output_file = f"{QWEN_INFERENCE_JSON_PATH}/{filename}{QWEN_FILE_SUFFIX}"
-    
-        # 确保responses目录存在
-        os.makedirs(QWEN_INFERENCE_JSON_PATH, exist_ok=True)
-        with open(output_file, 'w', encoding='utf-8') as fp:
-            fp.write(json.dumps(parsed_data, ensure_ascii=False, indent=2))
-        fp.close()
-        
-        inserter.run_insertion(parsed_data)
+        process_sections(Path(file_path).stem, split_by_headers(md_content))
         logger.info(f"成功处理文件: {file_path}")
         return {"success": True, "file": file_path, "message": "处理成功"}
     
     except Exception as e:
-        error_msg = f"处理文件 {file_path} 时出错: {e.message}"
+        error_msg = f"处理文件 {file_path} 时出错: {e}"
         logger.error(error_msg)
-        return {"success": False, "file": file_path, "error": e.message}
+        return {"success": False, "file": file_path, "error": str(e)}
+
+def process_us3_object(key):
+    """直接从US3流式读取并处理文件，边下载边拆分章节，不落盘"""
+    try:
+        logger.info(f"开始处理US3文件: {key}")
+        lines = (strip_md_images(line) for line in get_us3_client().iter_object_lines(key, part_size=US3_STREAM_PART_SIZE))
+        process_sections(Path(key).stem, iter_sections(lines))
+        logger.info(f"成功处理US3文件: {key}")
+        return {"success": True, "file": key, "message": "处理成功"}
+
+    except Exception as e:
+        error_msg = f"处理US3文件 {key} 时出错: {e}"
+        logger.error(error_msg)
+        return {"success": False, "file": key, "error": str(e)}
 
     
-if __name__ == "__main__":
-    rollback_unprocessed()
-    while True:
+def run_stream_worker():
+    """流式读取模式：不经过本地缓存，直接从US3读入内存处理"""
+    while not _stop_event.is_set():
         data = fetch_one()
         if not data:
             logger.info("队列为空，等待新任务...")
-            time.sleep(5)  # 等待5秒后再检查
+            _stop_event.wait(5)  # 等待5秒后再检查
             continue
-        use_path = data["use_path"]
-        us3_file_name = use_path.split("/")[-1]
-        tmp_path = os.path.join(QWEN_INFERENCE_MD_PATH, us3_file_name)
-        print(us3_client.download_file(use_path, tmp_path))
-
-        res = process_single_file(tmp_path)
+        res = process_us3_object(data["use_path"])
         if res["success"]:
             ack(data["id"])
         else:
             failed_rollback(data["id"])
 
+def run_cache_worker():
+    """缓存模式：预取后续任务并发下载，处理时只读本地缓存；退出时未处理的任务归还队列"""
+    us3_cache = US3DiskCache(get_us3_client())
+    prefetcher = US3Prefetcher(us3_cache, fetch_one, on_release=lambda data: failed_rollback(data["id"]))
+    try:
+        while not _stop_event.is_set():
+            data, local_path = prefetcher.next()
+            if not data:
+                logger.info("队列为空，等待新任务...")
+                _stop_event.wait(5)  # 等待5秒后再检查
+                continue
+            if local_path is None:
+                failed_rollback(data["id"])
+                continue
+
+            res = process_single_file(local_path)
+            us3_cache.release(local_path)
+            if res["success"]:
+                ack(data["id"])
+            else:
+                failed_rollback(data["id"])
+    finally:
+        prefetcher.close()
+
+def request_stop(signum=None, frame=None):
+    """SIGTERM处理：不中断当前任务，处理完后退出循环，预取未处理的任务归还队列"""
+    logger.info(f"收到停止信号，处理完当前任务后退出: pid={os.getpid()}")
+    _stop_event.set()
 
+def run_worker():
+    """worker入口，由supervisor fork后调用；队列回滚由supervisor统一执行"""
+    signal.signal(signal.SIGTERM, request_stop)
+    # Ctrl-C 发给整个进程组，由supervisor统一转为SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if US3_SOURCE_MODE == "stream":
+        run_stream_worker()
+    else:
+        run_cache_worker()
+    logger.info(f"worker已退出: pid={os.getpid()}")
+
+if __name__ == "__main__":
+    rollback_unprocessed()
+    signal.signal(signal.SIGTERM, request_stop)
+    if US3_SOURCE_MODE == "stream":
+        run_stream_worker()
+    else:
+        run_cache_worker()
@@ -1,4 +1,6 @@
-for i in {0..30}
-do
-    nohup python pipeline.py > /dev/null 2>&1 &
-done
\ No newline at end of file
+#!/bin/bash
+# 由supervisor统一fork和管理pipeline worker，worker数按队列长度和LLM延迟自动调整
+# 固定worker数：./run.sh --workers 31
+cd "$(dirname "$0")"
+nohup python supervisor.py "$@" > /dev/null 2>&1 &
+echo "supervisor已启动，PID: $!"
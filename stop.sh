@@ -1,40 +1,37 @@
 #!/bin/bash
 
-echo "正在查找并停止pipeline进程..."
+PID_FILE=${SUPERVISOR_PID_FILE:-/data/share2/yy/workspace/logs/supervisor.pid}
+# 等待worker处理完当前任务的最长时间，应不小于 SUPERVISOR_DRAIN_TIMEOUT
+WAIT_SECONDS=${STOP_WAIT_SECONDS:-1900}
 
-# 查找pipeline进程
-PARTITION_PIDS=$(ps aux | grep "pipeline" | grep -v grep | awk '{print $2}')
+echo "正在停止supervisor..."
 
-# 显示找到的进程
-echo "找到的pipeline进程PID: $PARTITION_PIDS"
-
-# Kill pipeline进程
-if [ -n "$PARTITION_PIDS" ]; then
-    echo "正在停止pipeline进程..."
-    for pid in $PARTITION_PIDS; do
-        echo "Killing PID: $pid"
-        kill -9 $pid
-        if [ $? -eq 0 ]; then
-            echo "成功停止进程 PID: $pid"
-        else
-            echo "停止进程 PID: $pid 失败"
-        fi
-    done
-else
-    echo "未找到pipeline进程"
+if [ ! -f "$PID_FILE" ]; then
+    echo "未找到PID文件: $PID_FILE"
+    exit 1
 fi
 
-# 等待一下并验证进程是否真的被停止
-sleep 2
-
-echo "验证进程是否已停止..."
-REMAINING_PARTITION=$(ps aux | grep "pipeline" | grep -v grep | wc -l)
-
-if [ $REMAINING_PARTITION -eq 0 ]; then
-    echo "✅ pipeline进程已成功停止"
-else
-    echo "❌ 仍有进程未停止:"
-    echo "  - pipeline: $REMAINING_PARTITION 个进程"
+SUPERVISOR_PID=$(cat "$PID_FILE")
+if ! kill -0 "$SUPERVISOR_PID" 2>/dev/null; then
+    echo "supervisor进程不存在: $SUPERVISOR_PID"
+    rm -f "$PID_FILE"
+    exit 0
 fi
 
-echo "history_stop脚本执行完成" 
\ No newline at end of file
+# SIGTERM：supervisor通知全部worker处理完当前任务后退出，未处理的任务归还队列
+echo "发送SIGTERM，PID: $SUPERVISOR_PID"
+kill -TERM "$SUPERVISOR_PID"
+
+for ((i = 0; i < WAIT_SECONDS; i++)); do
+    if ! kill -0 "$SUPERVISOR_PID" 2>/dev/null; then
+        echo "✅ supervisor及全部worker已停止"
+        exit 0
+    fi
+    sleep 1
+done
+
+echo "❌ supervisor在 $WAIT_SECONDS 秒内未退出，强制结束"
+pkill -9 -P "$SUPERVISOR_PID"
+kill -9 "$SUPERVISOR_PID"
+rm -f "$PID_FILE"
+echo "强制结束后遗留在processing列表中的任务会在下次启动时回滚"
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抽取worker管理进程，替代 run.sh 启动多个独立的 pipeline.py
+- 启动时回滚上次遗留在processing列表中的任务，并预加载只读数据，之后fork出的worker写时复制共享
+- worker异常退出时归还其已领取未确认的任务并重新拉起，短时间内频繁崩溃时暂缓重启
+- 按待处理队列长度和LLM延迟调整worker数：排队多且延迟低时扩容，延迟过高时逐个缩容；
+  延迟取自QWEN_BASE_URL探测，配置了QWEN_BACKEND_HOSTS时取自负载均衡器统计的各推理容器实际请求耗时
+- 收到SIGTERM/SIGINT后通知全部worker处理完当前任务退出，超时仍未退出的强制结束并归还其任务
+
+用法：
+    python supervisor.py                      # 按配置自动调整worker数
+    python supervisor.py --workers 16         # 固定worker数
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from configs.config import (SUPERVISOR_MIN_WORKERS, SUPERVISOR_MAX_WORKERS, SUPERVISOR_ITEMS_PER_WORKER,
+                            SUPERVISOR_INTERVAL, SUPERVISOR_DRAIN_TIMEOUT, SUPERVISOR_LATENCY_HIGH,
+                            SUPERVISOR_LATENCY_LOW, SUPERVISOR_LATENCY_ALPHA, SUPERVISOR_PID_FILE,
+                            SUPERVISOR_BACKEND_LATENCY_HIGH, SUPERVISOR_BACKEND_LATENCY_LOW,
+                            QWEN_BASE_URL, QWEN_API_KEY, QWEN_MODEL)
+
+# 子进程共享tokenizer时关闭其内部线程池，避免fork后死锁
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+# 60秒内崩溃次数超过该值时暂停重启，等待下一个调度周期
+MAX_RESTARTS_PER_MINUTE = 10
+
+
+def setup_logger():
+    """设置日志记录"""
+    logger = logging.getLogger("supervisor")
+    logger.setLevel(logging.INFO)
+    log_file_path = '/data/share2/yy/workspace/logs/supervisor.log'
+    os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for handler in (logging.FileHandler(log_file_path), logging.StreamHandler()):
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+logger = setup_logger()
+
+
+def probe_llm_latency(timeout=60):
+    """向Qwen服务发送1个token的请求，返回耗时（秒），失败返回None；服务排队时耗时随之上升"""
+    import requests
+    start_time = time.time()
+    try:
+        response = requests.post(f"{QWEN_BASE_URL.rstrip('/')}/chat/completions",
+                                 headers={"Authorization": f"Bearer {QWEN_API_KEY}"},
+                                 json={"model": QWEN_MODEL, "max_tokens": 1,
+                                       "messages": [{"role": "user", "content": "ping"}]},
+                                 timeout=timeout)
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"LLM延迟探测失败: {e}")
+        return None
+    return time.time() - start_time
+
+
+class Supervisor:
+    """fork并管理pipeline worker"""
+
+    def __init__(self, min_workers, max_workers, fixed_workers=None):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.fixed_workers = fixed_workers
+        self.hostname = socket.gethostname()
+        # 运行中的worker {pid: 启动时间}；已通知退出的worker {pid: 通知时间}
+        self.workers = {}
+        self.draining = {}
+        self.restart_times = []
+        self.latency = None
+        self.stopping = False
+        self.probe_thread = None
+
+    def owner(self, pid):
+        """与 utils.redis_cache.lease_owner 一致的租约标识"""
+        return f"{self.hostname}:{pid}"
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            # 子进程：进入worker循环，不返回supervisor代码；
+            # 先恢复默认信号处理，run_worker设置自己的处理函数之前收到SIGTERM也能退出，而不是只改写子进程中的stopping副本
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                import pipeline
+                pipeline.run_worker()
+            except BaseException:
+                logger.exception(f"worker异常退出: pid={os.getpid()}")
+                exit_code = 1
+            finally:
+                logging.shutdown()
+                os._exit(exit_code)
+        self.workers[pid] = time.time()
+        logger.info(f"启动worker: pid={pid}，当前 {len(self.workers)} 个")
+        return pid
+
+    def retire(self, count):
+        """通知最近启动的count个worker处理完当前任务后退出"""
+        for pid in sorted(self.workers, key=self.workers.get, reverse=True)[:count]:
+            self.workers.pop(pid)
+            self.draining[pid] = time.time()
+            self.send_signal(pid, signal.SIGTERM)
+            logger.info(f"通知worker处理完当前任务后退出: pid={pid}")
+
+    @staticmethod
+    def send_signal(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        """回收已退出的worker，异常退出的归还其任务并重新拉起"""
+        from utils.redis_cache import release_leases
+        from utils.concurrency import reclaim
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                # 已没有子进程，记录中的worker均已不存在
+                self.workers.clear()
+                self.draining.clear()
+                return
+            if pid == 0:
+                return
+            code = os.waitstatus_to_exitcode(status)
+            released = release_leases(self.owner(pid))
+            # 被kill的worker来不及归还LLM/rerank并发名额
+            slots = reclaim(pid)
+            if self.draining.pop(pid, None) is not None:
+                logger.info(f"worker已退出: pid={pid}，退出码 {code}，归还任务 {released} 个，并发名额 {slots} 个")
+                continue
+            self.workers.pop(pid, None)
+            logger.error(f"worker意外退出: pid={pid}，退出码 {code}，归还任务 {released} 个，并发名额 {slots} 个")
+            if self.stopping:
+                continue
+            now = time.time()
+            self.restart_times = [t for t in self.restart_times if now - t < 60] + [now]
+            if len(self.restart_times) > MAX_RESTARTS_PER_MINUTE:
+                logger.error(f"60秒内worker崩溃 {len(self.restart_times)} 次，暂缓重启")
+                continue
+            self.spawn()
+
+    def sample_latency(self):
+        """
+        更新 self.latency，返回对应的 (延迟上限, 延迟下限)；代理模式下 self.latency 由后台探测线程更新
+
+        配置了QWEN_BACKEND_HOSTS时worker直连各推理容器、不经过QWEN_BASE_URL代理，
+        改用负载均衡器在共享内存中统计的健康后端单位耗时EWMA均值（已平滑，不再二次平滑）
+        """
+        from utils.llm_balancer import QWEN_BALANCER
+        if QWEN_BALANCER is not None:
+            self.latency = QWEN_BALANCER.mean_latency()
+            return SUPERVISOR_BACKEND_LATENCY_HIGH, SUPERVISOR_BACKEND_LATENCY_LOW
+        if self.probe_thread is None:
+            self.probe_thread = threading.Thread(target=self.probe_loop, name="llm-latency-probe", daemon=True)
+            self.probe_thread.start()
+        return SUPERVISOR_LATENCY_HIGH, SUPERVISOR_LATENCY_LOW
+
+    def probe_loop(self):
+        """后台探测QWEN_BASE_URL：单次探测最长阻塞60秒，放在调度循环之外，不耽误回收、重启worker和处理停止信号"""
+        while not self.stopping:
+            probe = probe_llm_latency()
+            if probe is not None:
+                self.latency = probe if self.latency is None else \
+                    SUPERVISOR_LATENCY_ALPHA * probe + (1 - SUPERVISOR_LATENCY_ALPHA) * self.latency
+            time.sleep(SUPERVISOR_INTERVAL)
+
+    def desired_workers(self):
+        """由队列长度和LLM延迟计算目标worker数"""
+        if self.fixed_workers:
+            return self.fixed_workers
+        from utils.redis_cache import queue_depth
+        depth = queue_depth()
+        latency_high, latency_low = self.sample_latency()
+
+        current = len(self.workers)
+        by_queue = -(-depth // SUPERVISOR_ITEMS_PER_WORKER)
+        target = max(self.min_workers, min(self.max_workers, by_queue))
+        if self.latency is not None and self.latency > latency_high:
+            # 服务已饱和，再增加worker只会排队，逐个缩容
+            target = max(self.min_workers, min(target, current - 1))
+        elif target > current and (self.latency is None or self.latency > latency_low):
+            # 延迟未回落到下限以下时每个周期最多扩容1个
+            target = current + 1
+        latency_note = f"{self.latency:.3f}s" if self.latency is not None else "未知"
+        logger.info(f"队列长度 {depth}，LLM延迟 {latency_note}，worker {current} → {target}，退出中 {len(self.draining)}")
+        return target
+
+    def scale(self):
+        target = self.desired_workers()
+        current = len(self.workers)
+        if target > current:
+            for _ in range(target - current):
+                self.spawn()
+        elif target < current:
+            self.retire(current - target)
+
+    def request_stop(self, signum, frame):
+        if not self.stopping:
+            logger.info(f"收到信号 {signum}，通知全部worker处理完当前任务后退出")
+            self.stopping = True
+
+    def drain(self):
+        """通知全部worker退出，超时后强制结束"""
+        self.retire(len(self.workers))
+        deadline = time.time() + SUPERVISOR_DRAIN_TIMEOUT
+        while self.draining and time.time() < deadline:
+            self.reap()
+            time.sleep(1)
+        for pid in list(self.draining):
+            logger.warning(f"worker未在 {SUPERVISOR_DRAIN_TIMEOUT} 秒内退出，强制结束: pid={pid}")
+            self.send_signal(pid, signal.SIGKILL)
+        while self.draining:
+            self.reap()
+            time.sleep(0.2)
+
+    def run(self):
+        from utils.redis_cache import rollback_unprocessed
+        import pipeline
+
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        # 只在启动时回滚一次，worker启动不再回滚其他worker正在处理的任务
+        rollback_unprocessed()
+        start_time = time.time()
+        pipeline.preload()
+        logger.info(f"预加载完成，耗时 {time.time() - start_time:.1f} 秒")
+
+        for _ in range(self.fixed_workers or self.min_workers):
+            self.spawn()
+        next_scale = time.time() + SUPERVISOR_INTERVAL
+        while not self.stopping:
+            self.reap()
+            if time.time() >= next_scale:
+                try:
+                    self.scale()
+                except Exception as e:
+                    logger.error(f"调整worker数失败: {e}")
+                next_scale = time.time() + SUPERVISOR_INTERVAL
+            time.sleep(1)
+        self.drain()
+        logger.info("全部worker已退出")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽取worker管理进程")
+    parser.add_argument("--workers", type=int, default=None, help="固定worker数，不按队列和延迟调整")
+    parser.add_argument("--min-workers", type=int, default=SUPERVISOR_MIN_WORKERS, help="最少worker数")
+    parser.add_argument("--max-workers", type=int, default=SUPERVISOR_MAX_WORKERS, help="最多worker数")
+    parser.add_argument("--pid-file", default=SUPERVISOR_PID_FILE, help="supervisor进程号文件，供stop.sh使用")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.pid_file), exist_ok=True)
+    with open(args.pid_file, 'w') as f:
+        f.write(str(os.getpid()))
+    try:
+        Supervisor(args.min_workers, args.max_workers, args.workers).run()
+    finally:
+        if os.path.exists(args.pid_file):
+            os.remove(args.pid_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+LLM负载均衡测试：本地http.server桩服务代替推理容器
+使用示例: python -m pytest -q test_llm_balancer.py
+"""
+
+import os
+import time
+import signal
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from utils.llm_balancer import LLMBalancer
+from utils.concurrency import reclaim
+
+
+class StubBackend:
+    """模拟推理容器的 /health/ 和 /health_generate/ 接口，healthy为False时返回503"""
+
+    def __init__(self):
+        self.healthy = True
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200 if backend.healthy else 503)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class BackendError(Exception):
+    """模拟OpenAI SDK的503异常"""
+    status_code = 503
+
+
+def make_balancer(count, **kwargs):
+    backends = [StubBackend() for _ in range(count)]
+    # 探测周期设为很长，只由测试显式调用probe()
+    balancer = LLMBalancer([b.url for b in backends], probe_interval=3600, **kwargs)
+    balancer.probe()
+    return balancer, backends
+
+
+def healthy_flags(balancer):
+    return [backend['healthy'] for backend in balancer.snapshot()]
+
+
+def test_probe_ejects_and_readmits():
+    balancer, backends = make_balancer(2)
+    try:
+        backends[1].healthy = False
+        balancer.probe()
+        assert healthy_flags(balancer) == [True, False]
+        for _ in range(10):
+            with balancer.call() as call:
+                assert call.url == backends[0].url
+
+        backends[1].healthy = True
+        balancer.probe()
+        assert healthy_flags(balancer) == [True, True]
+    finally:
+        for backend in backends:
+            backend.close()
+
+
+def test_consecutive_failures_eject_until_probe_passes():
+    balancer, backends = make_balancer(2, max_failures=3)
+    try:
+        failed_url = None
+        # 分配是随机打破平局的，直到同一后端累计失败3次
+        for _ in range(100):
+            if failed_url and not healthy_flags(balancer)[balancer.urls.index(failed_url)]:
+                break
+            try:
+                with balancer.call() as call:
+                    failed_url = failed_url or call.url
+                    if call.url == failed_url:
+                        raise BackendError()
+            except BackendError:
+                pass
+        index = balancer.urls.index(failed_url)
+        assert not healthy_flags(balancer)[index]
+
+        # 桩服务仍健康，下一轮探测加回
+        balancer.probe()
+        assert all(healthy_flags(balancer))
+    finally:
+        for backend in backends:
+            backend.close()
+
+
+def test_routes_away_from_slow_backend():
+    balancer, backends = make_balancer(2)
+    slow_url = backends[1].url
+
+    def worker():
+        for _ in range(40):
+            with balancer.call() as call:
+                time.sleep(0.03 if call.url == slow_url else 0.003)
+
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        fast, slow = [backend['requests'] for backend in balancer.snapshot()]
+        assert fast > slow * 3
+    finally:
+        for backend in backends:
+            backend.close()
+
+
+def test_backpressure_shrinks_only_that_backend():
+    balancer, backends = make_balancer(2, initial=8, min_limit=1, max_limit=16)
+    try:
+        index, slot = balancer.pick()
+        balancer.release(index, slot, failed=True)
+        limits = [backend['limit'] for backend in balancer.snapshot()]
+        assert limits[index] < 8
+        assert limits[1 - index] == 8
+    finally:
+        for backend in backends:
+            backend.close()
+
+
+def test_killed_worker_slots_are_reclaimed():
+    balancer, backends = make_balancer(1, initial=2, min_limit=1, max_limit=2)
+    try:
+        pids = []
+        for _ in range(2):
+            pid = os.fork()
+            if pid == 0:
+                balancer.pick()
+                time.sleep(60)
+                os._exit(0)
+            pids.append(pid)
+        deadline = time.time() + 5
+        while balancer.snapshot()[0]['inflight'] < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        assert balancer.snapshot()[0]['inflight'] == 2
+
+        for pid in pids:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        # supervisor回收worker时归还其名额
+        assert reclaim(pids[0]) == 1
+        index, slot = balancer.pick(timeout=1)
+        # 未经supervisor回收的名额在占满时按pid存活检查归还
+        with balancer.call(timeout=1):
+            assert balancer.snapshot()[0]['inflight'] == 2
+        balancer.release(index, slot)
+        assert balancer.snapshot()[0]['inflight'] == 0
+    finally:
+        for backend in backends:
+            backend.close()
+
+
+def test_mean_latency_covers_healthy_backends_only():
+    balancer, backends = make_balancer(2)
+    try:
+        assert balancer.mean_latency() is None
+        for index, latency in enumerate([0.2, 0.4]):
+            slot = balancer.limiters[index].acquire(timeout=0)
+            balancer.release(index, slot, latency=latency, units=2)
+        assert abs(balancer.mean_latency() - 0.15) < 1e-9
+
+        backends[1].healthy = False
+        balancer.probe()
+        assert abs(balancer.mean_latency() - 0.1) < 1e-9
+    finally:
+        for backend in backends:
+            backend.close()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+公司名称本地模糊匹配
+- 在规范化公司名称列表上建立字符二元组（bigram）倒排索引，不依赖ES
+- 名称比较前按 is_valid_data 的规则去除"股份有限公司""有限责任公司"等法律后缀及标点
+- 候选生成：统计与查询共享的bigram个数，按共享数取前若干候选；过于常见的bigram（如"科技""中国"）不参与候选生成
+- 打分：去后缀名称bigram集合的Dice系数，去后缀后完全相同记为1.0，用堆取前k个结果
+- 批量查询时按去后缀名称去重，适合离线解析数万个抽取出的交易对手名称
+
+用法：
+    matcher = CompanyFuzzyMatcher.from_resolver(CompanyResolver.load_or_build())
+    matcher.match("宁德时代新能源科技有限公司")   # → [("宁德时代新能源科技股份有限公司", 1.0), ...]
+    python utils/company_fuzzy.py --input names.txt --output matches.json
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import logging
+import argparse
+from array import array
+from collections import Counter, defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.company_resolver import normalize_key
+
+logger = logging.getLogger(__name__)
+
+# 与 data_transfer/MysqlToNebula.is_valid_data 一致的后缀替换顺序，最终去掉"公司"
+LEGAL_SUFFIX_REPLACEMENTS = (
+    ("有限责任公司", "有限公司"),
+    ("股份有限公司", "有限公司"),
+    ("集团有限公司", "有限公司"),
+    ("科技股份有限公司", "有限公司"),
+    ("投资有限公司", "有限公司"),
+    ("控股有限公司", "有限公司"),
+    ("投资股份有限公司", "有限公司"),
+    ("有限公司", "公司"),
+    ("公司", ""),
+)
+PUNCTUATION = ('、', '，', '；', ',', '.')
+
+
+def strip_company_name(name):
+    """去除法律后缀、"及子公司/及其"后缀、空白和标点，用于比较"""
+    name = normalize_key(name)
+    if not name:
+        return ""
+    name = name.split('及子')[0].split('及其')[0]
+    for old, new in LEGAL_SUFFIX_REPLACEMENTS:
+        name = name.replace(old, new)
+    name = name.lower()
+    for mark in PUNCTUATION:
+        name = name.replace(mark, "")
+    return name
+
+
+def bigrams(text):
+    """字符二元组集合，单字名称返回其本身"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def dice_score(query_grams, candidate_key):
+    candidate_grams = bigrams(candidate_key)
+    if not query_grams or not candidate_grams:
+        return 0.0
+    return 2 * len(query_grams & candidate_grams) / (len(query_grams) + len(candidate_grams))
+
+
+class CompanyFuzzyMatcher:
+    """基于bigram倒排索引的公司名称模糊匹配"""
+
+    def __init__(self, names, max_posting_ratio=0.01, max_candidates=200):
+        """
+        Args:
+            names: 规范化公司名称列表
+            max_posting_ratio: bigram出现的名称占比超过该值时视为常见bigram，不参与候选生成
+            max_candidates: 进入打分的最大候选数
+        """
+        start_time = time.time()
+        self.names = list(dict.fromkeys(name for name in names if name))
+        self.keys = [strip_company_name(name) for name in self.names]
+        self.max_candidates = max_candidates
+        self.max_postings = max(1000, int(len(self.names) * max_posting_ratio))
+
+        self.exact = defaultdict(list)
+        postings = defaultdict(list)
+        for name_id, key in enumerate(self.keys):
+            if not key:
+                continue
+            self.exact[key].append(name_id)
+            for gram in bigrams(key):
+                postings[gram].append(name_id)
+        # 倒排表用无符号整型数组保存，百万级名称时内存约为list的1/7
+        self.index = {gram: array('I', ids) for gram, ids in postings.items()}
+        logger.info(f"模糊匹配索引构建完成: 名称 {len(self.names)} 个，bigram {len(self.index)} 个，"
+                    f"耗时 {time.time() - start_time:.2f} 秒")
+
+    @classmethod
+    def from_resolver(cls, resolver, **kwargs):
+        """以 CompanyResolver 中的规范化名称建立索引"""
+        return cls(resolver.names, **kwargs)
+
+    def _candidates(self, grams):
+        """按共享bigram个数取前 max_candidates 个候选名称下标"""
+        postings = [self.index[gram] for gram in grams if gram in self.index]
+        if not postings:
+            return []
+        selective = [ids for ids in postings if len(ids) <= self.max_postings]
+        # 全部为常见bigram时退回最短的倒排表
+        if not selective:
+            selective = [min(postings, key=len)]
+        counts = Counter()
+        for ids in selective:
+            counts.update(ids)
+        return [name_id for name_id, _ in heapq.nlargest(self.max_candidates, counts.items(), key=lambda item: item[1])]
+
+    def _match_key(self, key, k, min_score):
+        if not key:
+            return []
+        scored = [(1.0, name_id) for name_id in self.exact.get(key, [])]
+        grams = bigrams(key)
+        exact_ids = {name_id for _, name_id in scored}
+        scored += [(dice_score(grams, self.keys[name_id]), name_id)
+                   for name_id in self._candidates(grams) if name_id not in exact_ids]
+        best = heapq.nlargest(k, (item for item in scored if item[0] >= min_score), key=lambda item: (item[0], -item[1]))
+        return [(self.names[name_id], round(score, 4)) for score, name_id in best]
+
+    def match(self, name, k=5, min_score=0.6):
+        """
+        模糊匹配单个名称
+
+        Returns:
+            list: [(规范化名称, 分数)]，按分数降序
+        """
+        return self._match_key(strip_company_name(name), k, min_score)
+
+    def match_batch(self, names, k=5, min_score=0.6):
+        """
+        批量模糊匹配，去后缀后相同的名称只计算一次
+
+        Returns:
+            dict: {输入名称: [(规范化名称, 分数)]}
+        """
+        results = {}
+        key_results = {}
+        for name in names:
+            if name in results:
+                continue
+            key = strip_company_name(name)
+            if key not in key_results:
+                key_results[key] = self._match_key(key, k, min_score)
+            results[name] = key_results[key]
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="公司名称离线模糊匹配")
+    parser.add_argument("--input", required=True, help="待匹配名称文件，每行一个")
+    parser.add_argument("--output", required=True, help="匹配结果JSON")
+    parser.add_argument("--top-k", type=int, default=3, help="每个名称返回的候选数")
+    parser.add_argument("--min-score", type=float, default=0.6, help="最低匹配分数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    from utils.company_resolver import CompanyResolver
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        names = [line.strip() for line in f if line.strip()]
+    matcher = CompanyFuzzyMatcher.from_resolver(CompanyResolver.load_or_build())
+
+    start_time = time.time()
+    results = matcher.match_batch(names, args.top_k, args.min_score)
+    matched = sum(1 for matches in results.values() if matches)
+    logger.info(f"匹配完成: {len(results)} 个名称，命中 {matched} 个，耗时 {time.time() - start_time:.2f} 秒")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
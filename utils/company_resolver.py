@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+公司别名 → 规范化名称解析
+- 从 OmniDataCrafter.company（company_norm 规范化结果：company_name 为简称/曾用名/子公司原名，norm_company 为规范化名称）
+  加载全部映射，别名按 NFKC 归一（全角括号、空格）后存入字典，精确解析为O(1)字典查找
+- 规范化名称去重后存为列表，字典值为列表下标，避免百万级别名重复持有同一字符串
+- 同一别名对应多个规范化名称时视为歧义，不做解析
+- Aho–Corasick 自动机用于在一段文本中找出全部已知公司别名（最长匹配），安装 pyahocorasick 时使用其C实现
+- 映射表以pickle快照保存到本地，启动时快照未过期则直接加载，不访问Mongo
+
+用法：
+    resolver = CompanyResolver.load_or_build()
+    resolver.resolve("宁德时代")      # → "宁德时代新能源科技股份有限公司"
+    python utils/company_resolver.py --rebuild
+"""
+
+import os
+import sys
+import time
+import pickle
+import logging
+import argparse
+import unicodedata
+from collections import deque
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import COMPANY_RESOLVER_SNAPSHOT, COMPANY_RESOLVER_MAX_AGE
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+# 过短的别名（如单字简称）在文本扫描中误报过多，只参与精确解析
+MIN_SCAN_ALIAS_LENGTH = 2
+
+
+def normalize_key(name):
+    """别名归一：NFKC（全角转半角）、去除空白"""
+    if not name:
+        return ""
+    return "".join(unicodedata.normalize("NFKC", str(name)).split())
+
+
+class _PyAutomaton:
+    """纯Python的Aho–Corasick自动机，未安装pyahocorasick时使用"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+
+    def add_word(self, word, value):
+        node = 0
+        for char in word:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+            node = next_node
+        self.output[node] = value
+
+    def make_automaton(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+
+    def iter(self, text):
+        """与pyahocorasick一致，产出 (匹配结束下标, 值)"""
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            state = node
+            while state:
+                if self.output[state] is not None:
+                    yield index, self.output[state]
+                state = self.fail[state]
+
+
+class CompanyResolver:
+    """内存中的公司别名解析器"""
+
+    def __init__(self, names=None, aliases=None, built_at=None):
+        """
+        Args:
+            names: 规范化名称列表
+            aliases: {归一后的别名: 规范化名称下标}，下标为-1表示歧义
+            built_at: 映射表构建时间戳
+        """
+        self.names = names or []
+        self.aliases = aliases or {}
+        self.built_at = built_at or time.time()
+        self._name_index = {name: index for index, name in enumerate(self.names)}
+        self._automaton = None
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def add(self, alias, norm_name):
+        """加入一条映射；规范化名称本身也作为自己的别名"""
+        alias_key, norm_key = normalize_key(alias), normalize_key(norm_name)
+        if not alias_key or not norm_key:
+            return
+        index = self._name_index.get(norm_name)
+        if index is None:
+            index = len(self.names)
+            self.names.append(norm_name)
+            self._name_index[norm_name] = index
+        # 规范化名称优先于同名别名
+        self.aliases[norm_key] = index
+        self._automaton = None
+        if alias_key == norm_key:
+            return
+        current = self.aliases.get(alias_key)
+        if current is None:
+            self.aliases[alias_key] = index
+        elif current != index and (current < 0 or normalize_key(self.names[current]) != alias_key):
+            self.aliases[alias_key] = -1
+
+    def lookup(self, name):
+        """返回别名对应的规范化名称，未知或歧义时返回None"""
+        index = self.aliases.get(normalize_key(name), -1)
+        return self.names[index] if index >= 0 else None
+
+    def resolve(self, name):
+        """返回规范化名称，未知或歧义时原样返回"""
+        if not name:
+            return name
+        return self.lookup(name) or name
+
+    def _build_automaton(self):
+        automaton = ahocorasick.Automaton() if AHOCORASICK_AVAILABLE else _PyAutomaton()
+        for alias, index in self.aliases.items():
+            if index >= 0 and len(alias) >= MIN_SCAN_ALIAS_LENGTH:
+                automaton.add_word(alias, (len(alias), index))
+        automaton.make_automaton()
+        return automaton
+
+    def find_mentions(self, text):
+        """
+        找出文本中出现的已知公司别名，重叠时保留最长匹配
+
+        Returns:
+            list: [(起始下标, 结束下标, 别名, 规范化名称)]，下标基于归一后的文本
+        """
+        text = normalize_key(text)
+        if not text or not self.aliases:
+            return []
+        if self._automaton is None:
+            self._automaton = self._build_automaton()
+        matches = sorted(((end - length + 1, end + 1, index) for end, (length, index) in self._automaton.iter(text)),
+                         key=lambda match: (match[0], -match[1]))
+        mentions = []
+        last_end = 0
+        for start, end, index in matches:
+            if start >= last_end:
+                mentions.append((start, end, text[start:end], self.names[index]))
+                last_end = end
+        return mentions
+
+    @classmethod
+    def build_from_mongo(cls, collection=None):
+        """从 OmniDataCrafter.company 加载全部 company_name → norm_company 映射"""
+        if collection is None:
+            from utils.mongo import get_client
+            collection = get_client()["OmniDataCrafter"]["company"]
+        resolver = cls()
+        cursor = collection.find({"norm_company": {"$nin": [None, ""]}},
+                                 {"_id": 0, "company_name": 1, "norm_company": 1}).batch_size(10000)
+        for document in cursor:
+            resolver.add(document.get("company_name"), document.get("norm_company"))
+        ambiguous = sum(1 for index in resolver.aliases.values() if index < 0)
+        logger.info(f"公司别名映射加载完成: 别名 {len(resolver.aliases)} 个，规范化名称 {len(resolver.names)} 个，歧义 {ambiguous} 个")
+        return resolver
+
+    def save(self, path=COMPANY_RESOLVER_SNAPSHOT):
+        """写入快照，先写临时文件再重命名"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "built_at": self.built_at,
+                         "names": self.names, "aliases": self.aliases}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=COMPANY_RESOLVER_SNAPSHOT):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"快照版本不匹配: {state.get('version')}")
+        return cls(state["names"], state["aliases"], state["built_at"])
+
+    @classmethod
+    def load_or_build(cls, path=COMPANY_RESOLVER_SNAPSHOT, max_age=COMPANY_RESOLVER_MAX_AGE):
+        """快照存在且未过期时直接加载，否则从Mongo重建并写入快照"""
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age:
+            try:
+                start_time = time.time()
+                resolver = cls.load(path)
+                logger.info(f"加载公司别名快照: {len(resolver)} 个别名，耗时 {time.time() - start_time:.2f} 秒")
+                return resolver
+            except Exception as e:
+                logger.warning(f"公司别名快照加载失败，重新构建: {e}")
+        resolver = cls.build_from_mongo()
+        try:
+            resolver.save(path)
+        except OSError as e:
+            logger.warning(f"公司别名快照写入失败: {e}")
+        return resolver
+
+
+def main():
+    parser = argparse.ArgumentParser(description="公司别名解析快照")
+    parser.add_argument("--snapshot", default=COMPANY_RESOLVER_SNAPSHOT, help="快照路径")
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有快照，从Mongo重建")
+    parser.add_argument("names", nargs="*", help="待解析的公司名称")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    resolver = CompanyResolver.load_or_build(args.snapshot, 0 if args.rebuild else COMPANY_RESOLVER_MAX_AGE)
+    for name in args.names:
+        print(f"{name} → {resolver.resolve(name)}")
+
+
+if __name__ == "__main__":
+    main()
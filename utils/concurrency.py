@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM/rerank调用的自适应并发限制（AIMD）
+- 每个后端一个限制器，记录并发上限、在途请求、单位耗时的EWMA及基线（观测到的最小单位耗时，缓慢上浮以适应服务变化）
+- 请求成功且EWMA不超过基线的 tolerance 倍时加性增长（每个请求 +1/上限，约每轮满并发 +1）
+- EWMA超过基线的 tolerance 倍，或出现429/5xx/超时/连接错误时乘性收缩，两次收缩间隔不小于 cooldown 秒
+- 状态保存在共享内存中，限制器在模块导入时创建，supervisor fork出的worker共享同一组上限和计数；独立启动的进程各自限流
+- 每个在途名额记录占用进程的pid：worker被kill后由supervisor调用 reclaim(pid) 归还，名额占满时也会回收已退出进程的名额；
+  跨进程互斥使用lockf记录锁，持有进程退出时由内核释放，不会因worker被kill而死锁
+
+用法：
+    with QWEN_LIMITER.call() as call:
+        completion = client.chat.completions.parse(...)
+        call.units = completion.usage.completion_tokens   # 按生成token数折算单位耗时
+"""
+
+import os
+import sys
+import time
+import fcntl
+import socket
+import logging
+import tempfile
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import (QWEN_CONCURRENCY_INITIAL, QWEN_CONCURRENCY_MIN, QWEN_CONCURRENCY_MAX,
+                            RERANK_CONCURRENCY_INITIAL, RERANK_CONCURRENCY_MIN, RERANK_CONCURRENCY_MAX,
+                            CONCURRENCY_BACKOFF, CONCURRENCY_LATENCY_TOLERANCE, CONCURRENCY_COOLDOWN,
+                            CONCURRENCY_ACQUIRE_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+# 共享状态下标：并发上限、单位耗时EWMA、单位耗时基线、上次收缩时间、成功数、拥塞信号数
+LIMIT, LATENCY, BASELINE, LAST_DECREASE, SUCCESSES, CONGESTIONS = range(6)
+# 每个样本基线上浮的比例，约数千个请求后忘记过期的最小值
+BASELINE_DRIFT = 0.001
+# 等待名额时的轮询间隔（秒）
+POLL_INTERVAL = 0.05
+
+# 本进程创建的全部限制器，supervisor回收已退出worker的名额时遍历
+_LIMITERS = []
+
+
+class ConcurrencyTimeout(TimeoutError):
+    """等待并发名额超时"""
+
+
+def is_backpressure(exc):
+    """429、5xx、超时和连接错误视为后端过载信号；参数或解析错误不影响并发上限"""
+    if isinstance(exc, ConcurrencyTimeout):
+        return False
+    status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(exc, (TimeoutError, socket.timeout, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    return 'Timeout' in name or 'ConnectionError' in name or 'ConnectError' in name
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ProcessLock:
+    """
+    跨进程互斥锁：进程内用threading.Lock，进程间对匿名临时文件加lockf记录锁
+    记录锁属于进程且不被fork继承，持有进程退出（包括被kill）时由内核释放
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._thread_lock = threading.Lock()
+        # fork时其他线程可能正持有线程锁，子进程中重建
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            fcntl.lockf(self._file, fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fcntl.lockf(self._file, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+class _Call:
+    """一次受限调用，units 为本次调用的工作量（如生成token数），耗时按单位折算后参与判断"""
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.units = 1
+        self.start_time = time.time()
+
+
+class AIMDLimiter:
+    """跨进程共享的AIMD并发限制器"""
+
+    def __init__(self, name, initial, min_limit, max_limit, backoff=CONCURRENCY_BACKOFF,
+                 tolerance=CONCURRENCY_LATENCY_TOLERANCE, cooldown=CONCURRENCY_COOLDOWN, alpha=0.2,
+                 acquire_timeout=CONCURRENCY_ACQUIRE_TIMEOUT):
+        """
+        Args:
+            name: 后端名称，用于日志
+            initial / min_limit / max_limit: 初始、最小、最大并发数
+            backoff: 收缩系数
+            tolerance: EWMA超过基线该倍数时收缩
+            cooldown: 两次收缩的最小间隔（秒），避免同一批慢请求连续触发收缩
+            alpha: EWMA平滑系数
+            acquire_timeout: call() 等待名额的最长时间（秒）
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.acquire_timeout = acquire_timeout
+        self._lock = ProcessLock()
+        self._state = multiprocessing.RawArray('d', 6)
+        # 每个名额的占用进程pid，0为空闲
+        self._owners = multiprocessing.RawArray('i', max_limit)
+        self._state[LIMIT] = max(min_limit, min(max_limit, initial))
+        _LIMITERS.append(self)
+
+    def _inflight(self):
+        return sum(1 for pid in self._owners if pid)
+
+    def _try_take(self):
+        """持锁调用：在上限内占用一个空闲名额，返回名额下标，无空闲时返回None"""
+        if self._inflight() >= int(self._state[LIMIT]):
+            return None
+        for slot, pid in enumerate(self._owners):
+            if not pid:
+                self._owners[slot] = os.getpid()
+                return slot
+        return None
+
+    def _reclaim_dead(self):
+        """持锁调用：归还已退出进程占用的名额"""
+        reclaimed = 0
+        for slot, pid in enumerate(self._owners):
+            if pid and not pid_alive(pid):
+                self._owners[slot] = 0
+                reclaimed += 1
+        if reclaimed:
+            logger.warning(f"[{self.name}] 回收已退出进程占用的 {reclaimed} 个名额")
+        return reclaimed
+
+    def acquire(self, timeout=None):
+        """等待并占用一个并发名额，返回名额下标；超时返回None"""
+        deadline = None if timeout is None else time.time() + timeout
+        checked_dead = False
+        while True:
+            with self._lock:
+                slot = self._try_take()
+                if slot is None and not checked_dead:
+                    # 名额占满时检查一次是否有被kill的worker遗留的名额
+                    checked_dead = True
+                    if self._reclaim_dead():
+                        slot = self._try_take()
+            if slot is not None:
+                return slot
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def reclaim(self, pid):
+        """归还指定进程占用的全部名额，返回归还数量；supervisor回收worker时调用"""
+        with self._lock:
+            slots = [slot for slot, owner in enumerate(self._owners) if owner == pid]
+            for slot in slots:
+                self._owners[slot] = 0
+        return len(slots)
+
+    def _decrease(self, now, reason):
+        if now - self._state[LAST_DECREASE] < self.cooldown:
+            return
+        old_limit = self._state[LIMIT]
+        self._state[LIMIT] = max(self.min_limit, old_limit * self.backoff)
+        self._state[LAST_DECREASE] = now
+        logger.info(f"[{self.name}] 并发上限 {old_limit:.1f} → {self._state[LIMIT]:.1f}（{reason}）")
+
+    def release(self, slot, latency=None, units=1, congested=False):
+        """
+        归还名额并根据本次结果调整上限
+
+        Args:
+            slot: acquire返回的名额下标
+            latency: 调用耗时（秒），为None时不参与延迟判断（如参数错误导致的失败）
+            units: 本次调用的工作量，耗时按单位折算
+            congested: 是否收到429/5xx/超时等过载信号
+        """
+        now = time.time()
+        with self._lock:
+            self._owners[slot] = 0
+            if congested:
+                self._state[CONGESTIONS] += 1
+                self._decrease(now, "后端过载")
+            elif latency is not None:
+                self._state[SUCCESSES] += 1
+                per_unit = latency / max(units, 1)
+                ewma = self._state[LATENCY]
+                ewma = per_unit if ewma == 0 else self.alpha * per_unit + (1 - self.alpha) * ewma
+                baseline = self._state[BASELINE]
+                baseline = per_unit if baseline == 0 else min(per_unit, baseline * (1 + BASELINE_DRIFT))
+                self._state[LATENCY], self._state[BASELINE] = ewma, baseline
+                if ewma > baseline * self.tolerance:
+                    self._decrease(now, f"延迟 {ewma:.3f}s 超过基线 {baseline:.3f}s 的 {self.tolerance} 倍")
+                else:
+                    self._state[LIMIT] = min(self.max_limit, self._state[LIMIT] + 1 / self._state[LIMIT])
+
+    @contextmanager
+    def call(self, timeout=None):
+        """
+        占用名额执行一次调用，退出时按耗时或异常类型调整上限；异常继续向上抛出
+        等待名额超过 timeout（默认 acquire_timeout）秒时抛出 ConcurrencyTimeout
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        slot = self.acquire(timeout)
+        if slot is None:
+            raise ConcurrencyTimeout(f"[{self.name}] 等待并发名额超过 {timeout} 秒")
+        call = _Call(slot)
+        try:
+            yield call
+        except BaseException as e:
+            self.release(slot, congested=is_backpressure(e))
+            raise
+        else:
+            self.release(slot, time.time() - call.start_time, call.units)
+
+    def available(self):
+        """当前空闲名额数"""
+        with self._lock:
+            return max(0, int(self._state[LIMIT]) - self._inflight())
+
+    def inflight(self):
+        with self._lock:
+            return self._inflight()
+
+    def snapshot(self):
+        with self._lock:
+            return {'name': self.name, 'limit': round(self._state[LIMIT], 2), 'inflight': self._inflight(),
+                    'latency': self._state[LATENCY], 'baseline': self._state[BASELINE],
+                    'successes': int(self._state[SUCCESSES]), 'congestions': int(self._state[CONGESTIONS])}
+
+
+def reclaim(pid):
+    """归还指定进程在全部限制器中占用的名额，返回归还总数"""
+    return sum(limiter.reclaim(pid) for limiter in _LIMITERS)
+
+
+# 在模块导入时创建，supervisor预加载后fork的worker共享
+QWEN_LIMITER = AIMDLimiter("qwen", QWEN_CONCURRENCY_INITIAL, QWEN_CONCURRENCY_MIN, QWEN_CONCURRENCY_MAX)
+RERANK_LIMITER = AIMDLimiter("rerank", RERANK_CONCURRENCY_INITIAL, RERANK_CONCURRENCY_MIN, RERANK_CONCURRENCY_MAX)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抽取上下文打包工具
+按 token 预算将 rerank 筛选后的章节打包为一个或多个抽取 prompt，并合并分批抽取得到的 JSON 结果
+"""
+
+import re
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import QWEN_TOKENIZER_PATH
+
+logger = logging.getLogger(__name__)
+
+# 实体类型优先级（数值越小越优先装入预算）：供应商 > 客户 > 股东 > 子公司 > 主营构成 > 其他
+ENTITY_PRIORITY_KEYWORDS = [
+    (0, ["供应商", "采购"]),
+    (1, ["客户", "销售客户"]),
+    (2, ["股东", "股本变动", "持股"]),
+    (3, ["子公司", "参股公司", "控股公司", "合并范围"]),
+    (4, ["主营", "收入和成本", "分行业", "分产品", "分地区"]),
+]
+DEFAULT_PRIORITY = len(ENTITY_PRIORITY_KEYWORDS)
+
+# 各列表字段的去重键，用于合并分批抽取结果
+LIST_FIELD_KEYS = {
+    "persons": ("person_name", "position"),
+    "shareholders": ("name",),
+    "subsidiaries": ("subsidiary_name",),
+    "related_companies": ("related_party_name",),
+    "major_suppliers": ("supplier_name",),
+    "major_customers": ("customer_name",),
+    "main_business_composition": ("product_name", "business_type"),
+}
+OBJECT_FIELDS = ("company_info", "stock_info")
+SCALAR_FIELDS = ("report_last_date", "document_type")
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """
+    懒加载本地tokenizer，transformers未安装或加载失败时返回None并退化为字符估算
+    transformers在此处导入，导入本模块（pipeline顶层导入）不承担其导入耗时
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = False
+                try:
+                    from transformers import AutoTokenizer
+                    _tokenizer = AutoTokenizer.from_pretrained(QWEN_TOKENIZER_PATH, local_files_only=True, trust_remote_code=True)
+                except ImportError:
+                    logger.warning("未安装transformers，使用字符估算token数")
+                except Exception as e:
+                    logger.warning(f"加载本地tokenizer失败，使用字符估算token数: {e}")
+    return _tokenizer or None
+
+
+def estimate_tokens(text: str) -> int:
+    """无tokenizer时的估算：中文字符按1个token，其余字符按4个字符1个token"""
+    if not text:
+        return 0
+    cjk_count = len(re.findall(r'[\u4e00-\u9fff]', text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def count_tokens(text: str) -> int:
+    """统计文本token数"""
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def content_budget(prompt_template: str, total_budget: int) -> int:
+    """从总预算中扣除prompt模板本身占用的token，返回留给文档内容的预算"""
+    return max(total_budget - count_tokens(prompt_template.format(contents='')), 0)
+
+
+def section_priority(section: Dict[str, Any]) -> int:
+    """根据章节标题和匹配到的报告标签判断实体类型优先级"""
+    text = f"{section.get('title', '')} {section.get('label', '')}"
+    for priority, keywords in ENTITY_PRIORITY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return priority
+    return DEFAULT_PRIORITY
+
+
+def split_oversized_content(content: str, budget: int) -> List[str]:
+    """将超出单次预算的章节按行切分为多个不超过预算的片段"""
+    chunks, current, current_tokens = [], [], 0
+    for line in content.split('\n'):
+        line_tokens = count_tokens(line) + 1
+        if current and current_tokens + line_tokens > budget:
+            chunks.append('\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def pack_sections(sections: List[Dict[str, Any]], budget: int, max_batches: Optional[int] = None) -> List[List[str]]:
+    """
+    按 token 预算打包章节
+
+    Args:
+        sections: 章节列表，每项包含 title、content、score（rerank分数），可选 label（匹配到的报告标签）
+        budget: 每次抽取调用可用的内容token预算
+        max_batches: 最多拆分的抽取调用次数，超出部分按优先级从低到高丢弃
+
+    Returns:
+        List[List[str]]: 每个元素为一次抽取调用的章节内容列表（保持原文顺序）
+    """
+    items = []
+    for index, section in enumerate(sections):
+        content = section.get('content', '')
+        if not content:
+            continue
+        priority = section_priority(section)
+        score = section.get('score', 0.0)
+        tokens = count_tokens(content)
+        if tokens > budget:
+            for offset, chunk in enumerate(split_oversized_content(content, budget)):
+                items.append({"index": (index, offset), "priority": priority, "score": score,
+                              "content": chunk, "tokens": count_tokens(chunk)})
+        else:
+            items.append({"index": (index, 0), "priority": priority, "score": score,
+                          "content": content, "tokens": tokens})
+
+    # 先按实体类型优先级、再按rerank分数排序，依次放入第一个装得下的批次
+    items.sort(key=lambda x: (x["priority"], -x["score"]))
+    batches = []
+    dropped = 0
+    for item in items:
+        for batch in batches:
+            if batch["tokens"] + item["tokens"] <= budget:
+                batch["items"].append(item)
+                batch["tokens"] += item["tokens"]
+                break
+        else:
+            if max_batches is not None and len(batches) >= max_batches:
+                dropped += 1
+                continue
+            batches.append({"items": [item], "tokens": item["tokens"]})
+
+    if dropped:
+        logger.warning(f"超出最大抽取次数 {max_batches}，丢弃 {dropped} 个低优先级章节")
+    logger.info(f"上下文打包: {len(items)} 个章节 → {len(batches)} 次抽取调用 (预算: {budget} tokens/次)")
+
+    # 批次内恢复原文顺序，保持文档逻辑
+    return [[item["content"] for item in sorted(batch["items"], key=lambda x: x["index"])] for batch in batches]
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _fill_missing(target: Dict, source: Dict) -> Dict:
+    """用source中的非空字段补全target中的空字段"""
+    for key, value in source.items():
+        if _is_empty(target.get(key)) and not _is_empty(value):
+            target[key] = value
+    return target
+
+
+def merge_extraction_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并多次抽取得到的部分JSON结果
+
+    - company_info / stock_info：取首个非空结果，并用后续结果补全空字段
+    - 列表字段：按名称等去重键合并，重复项互相补全空字段
+    - report_last_date / document_type：取首个非空值
+    """
+    merged: Dict[str, Any] = {}
+    list_indexes: Dict[str, Dict[tuple, Dict]] = {field: {} for field in LIST_FIELD_KEYS}
+
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        for field in OBJECT_FIELDS:
+            value = result.get(field)
+            if isinstance(value, dict) and value:
+                if isinstance(merged.get(field), dict):
+                    _fill_missing(merged[field], value)
+                else:
+                    merged[field] = dict(value)
+        for field in SCALAR_FIELDS:
+            if _is_empty(merged.get(field)) and not _is_empty(result.get(field)):
+                merged[field] = result[field]
+        for field, key_names in LIST_FIELD_KEYS.items():
+            values = result.get(field)
+            if not isinstance(values, list):
+                continue
+            merged.setdefault(field, [])
+            for item in values:
+                if not isinstance(item, dict):
+                    continue
+                key = tuple(item.get(name) or '' for name in key_names)
+                if not any(key):
+                    merged[field].append(item)
+                elif key in list_indexes[field]:
+                    _fill_missing(list_indexes[field][key], item)
+                else:
+                    list_indexes[field][key] = dict(item)
+                    merged[field].append(list_indexes[field][key])
+
+    for field in OBJECT_FIELDS + SCALAR_FIELDS:
+        merged.setdefault(field, None)
+    for field in LIST_FIELD_KEYS:
+        merged.setdefault(field, [])
+    return merged
@@ -1,13 +1,8 @@
 import os,re
 import glob
 import json
-import mistune
-from mistune.renderers.markdown import MarkdownRenderer
-from mistune import BaseRenderer
-from mistune.renderers.rst import RSTRenderer
-from langchain_text_splitters import MarkdownHeaderTextSplitter
-from bs4 import BeautifulSoup
 from models.model_infer import qwen_chat,gpt_chat
+# mistune、langchain_text_splitters、bs4 导入较慢，在用到的函数内导入
 
 def read_all_md_files(directory):
     # 获取所有md文件路径
@@ -28,13 +23,18 @@ def read_all_md_files(directory):
     
     return contents
 
+# markdown图片引用，不跨行，可整篇或逐行去除
+IMG_PATTERN = re.compile(r'!\[.*?\]\((.*?)\)')
+
+def strip_md_images(text):
+    return IMG_PATTERN.sub('', text)
+
 def read_single_md_file(file_path):
     with open(file_path ,'r', encoding='utf-8') as f:
         md_content = f.read()
     f.close()
     
-    img_pattern = r'!\[.*?\]\((.*?)\)'
-    filtered_content = re.sub(img_pattern, '', md_content)
+    filtered_content = strip_md_images(md_content)
     return filtered_content
 
 def read_file(file_path):
@@ -45,10 +45,13 @@ def read_file(file_path):
 
 def create_markdown_formatter():
     """创建markdown格式化器"""
+    import mistune
+    from mistune.renderers.markdown import MarkdownRenderer
     return mistune.create_markdown(renderer=MarkdownRenderer())
 
 def table_to_text(html_content):
     """将HTML表格转换为紧凑的文本格式，并移除多余的空格和换行"""
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html_content, 'html.parser')
     
     for table in soup.find_all('table'):
@@ -109,6 +112,7 @@ def Markdown2Text_with_header(md_content):
 
     # 初始化结果列表
     # 创建Markdown分割器，保留标题信息
+    from langchain_text_splitters import MarkdownHeaderTextSplitter
     markdown_splitter = MarkdownHeaderTextSplitter(
         headers_to_split_on=headers_to_split_on,
         strip_headers=False,      # 保留标题文本
@@ -153,6 +157,7 @@ def Markdown2Text(md_content):
 
     # 初始化结果列表
     # 创建Markdown分割器，保留标题信息
+    from langchain_text_splitters import MarkdownHeaderTextSplitter
     markdown_splitter = MarkdownHeaderTextSplitter(
         headers_to_split_on=headers_to_split_on,
         strip_headers=False,      # 保留标题文本
@@ -177,6 +182,7 @@ def Markdown_header_splits(md_content):
     ]
 
     # 创建Markdown分割器，保留标题信息
+    from langchain_text_splitters import MarkdownHeaderTextSplitter
     markdown_splitter = MarkdownHeaderTextSplitter(
         headers_to_split_on=headers_to_split_on,
         strip_headers=False,      # 不移除标题文本，便于提取
@@ -1,25 +1,44 @@
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
 import os
 import sys
+import threading
 from pathlib import Path
 
 add_path = str(Path(__file__).parent.parent)
 sys.path.append(add_path)
-os.chdir(add_path)
 from configs.config import elasticsearch
 
-# es = Elasticsearch([{"host":"10.100.0.2","port":9200,"scheme":"http"}],http_auth=("elastic","v_iQ-pOXwvsf1VEw2onc"))
-es = Elasticsearch([{"host":elasticsearch.get("ip"),"port":elasticsearch.get("port"),"scheme":"http"}],
-                   http_auth=(elasticsearch.get("user"),elasticsearch.get("password")))
+# ES客户端在首次使用时创建，导入本模块不建立连接
+_es = None
+_es_lock = threading.Lock()
+
+
+def get_es():
+    global _es
+    if _es is None:
+        with _es_lock:
+            if _es is None:
+                from elasticsearch import Elasticsearch
+                # es = Elasticsearch([{"host":"10.100.0.2","port":9200,"scheme":"http"}],http_auth=("elastic","v_iQ-pOXwvsf1VEw2onc"))
+                _es = Elasticsearch([{"host":elasticsearch.get("ip"),"port":elasticsearch.get("port"),"scheme":"http"}],
+                                    http_auth=(elasticsearch.get("user"),elasticsearch.get("password")))
+    return _es
+
+
+def __getattr__(name):
+    """兼容原有的模块级 es 访问方式"""
+    if name == 'es':
+        return get_es()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def index_documents(index_name,documents):
-    es.index(index=index_name,body=documents)
+    get_es().index(index=index_name,body=documents)
 
 def bulk_index_documents(documents,index_name):
+    from elasticsearch.helpers import bulk
     try:
         # 设置 raise_on_error=False 来获取失败的文档列表而不是抛出异常
-        success_count, failed_docs = bulk(es, documents, raise_on_error=False)
+        success_count, failed_docs = bulk(get_es(), documents, raise_on_error=False)
         print(f"批量写入完成:{index_name} 成功 {success_count} 条, 失败 {len(failed_docs)} 条")
         if failed_docs:
             print('失败的文档:')
@@ -55,17 +74,67 @@ def search_documents(index_name, field,company_name):
     }
     
     try:
-        # 先尝试keyword查询
-        res = es.search(index=index_name, body={"query": query_phrase})
-        total_num = res['hits']['total']['value']
-        if total_num > 0:
-            return [item['_source'] for item in res['hits']['hits']]
-        else:
-            return {}
+        # 先尝试keyword查询，未命中再用短语匹配
+        for query in (query_keyword, query_phrase):
+            res = get_es().search(index=index_name, body={"query": query})
+            total_num = res['hits']['total']['value']
+            if total_num > 0:
+                return [item['_source'] for item in res['hits']['hits']]
+        return {}
     except Exception as e:
         print(f"搜索错误: {e}")
         return {}
 
+def _msearch(index_name, queries):
+    """执行一次 _msearch，返回与queries顺序一致的命中列表，单条查询出错时为None"""
+    body = []
+    for query in queries:
+        body.append({"index": index_name})
+        body.append({"query": query})
+    res = get_es().msearch(body=body)
+    results = []
+    for response in res['responses']:
+        if 'error' in response:
+            print(f"批量搜索子查询错误: {response['error']}")
+            results.append(None)
+        else:
+            results.append([item['_source'] for item in response['hits']['hits']])
+    return results
+
+def msearch_documents(index_name, field, names, batch_size=200):
+    """
+    批量精确查询：每批名称合并为一个 _msearch 请求，先用 keyword 字段 term 精确匹配，
+    未命中的名称再合并一次 match_phrase 请求
+
+    Args:
+        index_name: 索引名称
+        field: 查询字段，如 zh_company_name
+        names: 名称列表
+        batch_size: 单个 _msearch 请求包含的查询数
+
+    Returns:
+        dict: {名称: 命中的_source列表}，未命中或查询出错的名称为空列表
+    """
+    unique_names = list(dict.fromkeys(name for name in names if name))
+    results = {}
+    for start in range(0, len(unique_names), batch_size):
+        batch = unique_names[start:start + batch_size]
+        try:
+            term_hits = _msearch(index_name, [{"term": {f"{field}.keyword": name}} for name in batch])
+            misses = [name for name, hits in zip(batch, term_hits) if not hits]
+            for name, hits in zip(batch, term_hits):
+                if hits:
+                    results[name] = hits
+            if misses:
+                phrase_hits = _msearch(index_name, [{"match_phrase": {field: name}} for name in misses])
+                for name, hits in zip(misses, phrase_hits):
+                    results[name] = hits or []
+        except Exception as e:
+            print(f"批量搜索错误: {e}")
+            for name in batch:
+                results.setdefault(name, [])
+    return results
+
 def search_company_exact(company_name):
     """
     专门用于在company_norm索引中精确查询公司名称的便捷函数
@@ -86,7 +155,7 @@ def search_company_fuzzy(index_name, company_name):
     }
     
     try:
-        res = es.search(index=index_name, body={"query": query})
+        res = get_es().search(index=index_name, body={"query": query})
         
         for hit in res['hits']['hits']:
             source = hit["_source"]
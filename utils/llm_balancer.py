@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Qwen推理容器的客户端负载均衡
+- 后端为 QWEN_BACKEND_HOSTS × QWEN_BACKEND_PORTS（每台机器的 qwen1:7001、qwen2:7002 容器），未配置主机时仍走 QWEN_BASE_URL 代理
+- 与 health_check.py 相同的 /health/（存活）和 /health_generate/（可生成）探测：两项均返回200的后端参与分配，否则摘除，恢复后自动加回
+- 请求连续出现429/5xx/超时/连接错误 BALANCER_MAX_FAILURES 次时立即摘除，不等下一轮探测
+- 每个后端一个AIMD并发限制器（utils.concurrency），某个容器变慢或过载只收缩它自己的并发上限
+- 每个请求分配给仍有空闲名额的后端中 (在途请求数+1) × 单位耗时EWMA 最小的一个：慢的后端和已排队多的后端都少分
+- 状态保存在共享内存中，supervisor fork出的worker共享在途名额和健康状态；在途名额记录占用进程，worker被kill后由supervisor回收
+- 各进程的探测线程通过共享时间戳协调，每个周期只有一个进程探测
+
+用法：
+    with QWEN_BALANCER.call() as call:
+        client = OpenAI(base_url=call.base_url, api_key=QWEN_BACKEND_API_KEY)
+        ...
+        call.units = completion.usage.completion_tokens
+
+    QWEN_BACKEND_HOSTS=172.16.0.11,172.16.0.12 python utils/llm_balancer.py     # 探测一次并打印各后端状态
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import (QWEN_BACKEND_HOSTS, QWEN_BACKEND_PORTS, QWEN_BACKEND_API_PATH,
+                            BALANCER_PROBE_INTERVAL, BALANCER_PROBE_TIMEOUT, BALANCER_GENERATE_TIMEOUT,
+                            BALANCER_MAX_FAILURES, BALANCER_LATENCY_ALPHA, QWEN_BACKEND_CONCURRENCY_INITIAL,
+                            QWEN_BACKEND_CONCURRENCY_MIN, QWEN_BACKEND_CONCURRENCY_MAX, CONCURRENCY_ACQUIRE_TIMEOUT)
+from utils.concurrency import AIMDLimiter, ProcessLock, ConcurrencyTimeout, is_backpressure, POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# 每个后端的共享状态下标：是否健康、单位耗时EWMA、连续失败次数、累计请求数
+HEALTHY, LATENCY, FAILURES, REQUESTS = range(4)
+FIELDS = 4
+
+
+def backend_urls(hosts=QWEN_BACKEND_HOSTS, ports=QWEN_BACKEND_PORTS):
+    """主机列表 × 端口列表（均为逗号分隔字符串）→ ["http://host:port", ...]"""
+    hosts = [h.strip() for h in hosts.split(',') if h.strip()]
+    ports = [p.strip() for p in ports.split(',') if p.strip()]
+    return [f"http://{host}:{port}" for host in hosts for port in ports]
+
+
+def check_backend(url, timeout=BALANCER_PROBE_TIMEOUT, generate_timeout=BALANCER_GENERATE_TIMEOUT):
+    """存活和可生成探测均返回200时视为健康"""
+    import requests
+    try:
+        if requests.get(f"{url}/health/", timeout=timeout).status_code != 200:
+            return False
+        return requests.get(f"{url}/health_generate/", timeout=generate_timeout).status_code == 200
+    except Exception:
+        return False
+
+
+class _Call:
+    """一次分配：base_url 为选中后端的OpenAI接口地址，units 为本次调用的工作量（如生成token数）"""
+
+    def __init__(self, index, slot, url):
+        self.index = index
+        self.slot = slot
+        self.url = url
+        self.base_url = url + QWEN_BACKEND_API_PATH
+        self.units = 1
+        self.start_time = time.time()
+
+
+class LLMBalancer:
+    """按在途请求数和延迟在多个推理容器间分配请求"""
+
+    def __init__(self, urls, probe_interval=BALANCER_PROBE_INTERVAL, max_failures=BALANCER_MAX_FAILURES,
+                 alpha=BALANCER_LATENCY_ALPHA, initial=QWEN_BACKEND_CONCURRENCY_INITIAL,
+                 min_limit=QWEN_BACKEND_CONCURRENCY_MIN, max_limit=QWEN_BACKEND_CONCURRENCY_MAX,
+                 acquire_timeout=CONCURRENCY_ACQUIRE_TIMEOUT):
+        if not urls:
+            raise ValueError("至少需要一个后端")
+        self.urls = list(urls)
+        self.probe_interval = probe_interval
+        self.max_failures = max_failures
+        self.alpha = alpha
+        self.acquire_timeout = acquire_timeout
+        # 每个后端独立的并发上限和在途名额
+        self.limiters = [AIMDLimiter(f"qwen@{url}", initial, min_limit, max_limit) for url in self.urls]
+        self._lock = ProcessLock()
+        self._state = multiprocessing.RawArray('d', len(self.urls) * FIELDS)
+        # 上次探测开始时间，各进程据此决定本周期由谁探测
+        self._last_probe = multiprocessing.RawValue('d', 0.0)
+        # 探测前默认全部可用，首轮探测后再摘除
+        for i in range(len(self.urls)):
+            self._state[i * FIELDS + HEALTHY] = 1
+        self._probe_thread = None
+        self._probe_pid = None
+
+    @classmethod
+    def from_config(cls):
+        """按配置创建，未配置后端主机时返回None"""
+        urls = backend_urls()
+        return cls(urls) if urls else None
+
+    def _get(self, index, field):
+        return self._state[index * FIELDS + field]
+
+    def _set(self, index, field, value):
+        self._state[index * FIELDS + field] = value
+
+    def _set_health(self, index, healthy, reason):
+        if bool(self._get(index, HEALTHY)) == healthy:
+            return
+        self._set(index, HEALTHY, 1 if healthy else 0)
+        self._set(index, FAILURES, 0)
+        if healthy:
+            # 恢复的后端延迟重新统计，按当前平均水平参与分配，避免一次涌入过多请求
+            self._set(index, LATENCY, 0)
+            logger.info(f"后端恢复: {self.urls[index]}（{reason}）")
+        else:
+            logger.warning(f"摘除后端: {self.urls[index]}（{reason}）")
+
+    def _try_pick(self):
+        """在有空闲名额的后端中选出得分最低的一个并占用名额，全部不健康时在所有后端中选择；均无空闲名额时返回None"""
+        with self._lock:
+            candidates = [i for i in range(len(self.urls)) if self._get(i, HEALTHY)] or list(range(len(self.urls)))
+            known = [self._get(i, LATENCY) for i in candidates if self._get(i, LATENCY) > 0]
+            default_latency = sum(known) / len(known) if known else 1.0
+            scores = {}
+            for i in candidates:
+                latency = self._get(i, LATENCY) or default_latency
+                # 名额已满的排在最后，仍尝试占用以回收被kill的worker遗留的名额
+                scores[i] = (self.limiters[i].available() <= 0, (self.limiters[i].inflight() + 1) * latency)
+            for index in sorted(scores, key=lambda i: (scores[i], random.random())):
+                slot = self.limiters[index].acquire(timeout=0)
+                if slot is not None:
+                    self._set(index, REQUESTS, self._get(index, REQUESTS) + 1)
+                    return index, slot
+        return None
+
+    def pick(self, timeout=None):
+        """
+        等待并占用一个后端的并发名额，返回 (后端下标, 名额下标)
+        超过 timeout（默认 acquire_timeout）秒仍无空闲名额时抛出 ConcurrencyTimeout
+        """
+        self.ensure_probing()
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        while True:
+            picked = self._try_pick()
+            if picked is not None:
+                return picked
+            if time.time() >= deadline:
+                raise ConcurrencyTimeout(f"等待Qwen后端并发名额超过 {timeout} 秒")
+            time.sleep(POLL_INTERVAL)
+
+    def release(self, index, slot, latency=None, units=1, failed=False):
+        """
+        归还后端名额并更新延迟、失败计数和该后端的并发上限
+
+        Args:
+            latency: 调用耗时（秒），为None时不更新延迟
+            units: 本次调用的工作量，耗时按单位折算
+            failed: 是否出现429/5xx/超时等后端错误，连续达到上限时摘除
+        """
+        self.limiters[index].release(slot, latency, units, congested=failed)
+        with self._lock:
+            if failed:
+                failures = self._get(index, FAILURES) + 1
+                self._set(index, FAILURES, failures)
+                if failures >= self.max_failures:
+                    self._set_health(index, False, f"连续失败 {int(failures)} 次")
+            elif latency is not None:
+                self._set(index, FAILURES, 0)
+                per_unit = latency / max(units, 1)
+                ewma = self._get(index, LATENCY)
+                self._set(index, LATENCY, per_unit if ewma == 0 else self.alpha * per_unit + (1 - self.alpha) * ewma)
+
+    @contextmanager
+    def call(self, timeout=None):
+        """分配一个后端执行一次调用，退出时按耗时或异常类型更新后端状态；异常继续向上抛出"""
+        index, slot = self.pick(timeout)
+        call = _Call(index, slot, self.urls[index])
+        try:
+            yield call
+        except BaseException as e:
+            self.release(index, slot, failed=is_backpressure(e))
+            raise
+        else:
+            self.release(index, slot, time.time() - call.start_time, call.units)
+
+    def probe(self):
+        """并发探测全部后端，更新健康状态"""
+        self._last_probe.value = time.time()
+        with ThreadPoolExecutor(max_workers=min(len(self.urls), 16)) as executor:
+            results = list(executor.map(check_backend, self.urls))
+        with self._lock:
+            for index, healthy in enumerate(results):
+                self._set_health(index, healthy, "健康探测")
+        return results
+
+    def _probe_loop(self):
+        while True:
+            # 共享时间戳：本周期已有其他进程探测时跳过
+            with self._lock:
+                due = time.time() - self._last_probe.value >= self.probe_interval
+                if due:
+                    self._last_probe.value = time.time()
+            if due:
+                try:
+                    self.probe()
+                except Exception as e:
+                    logger.error(f"后端探测失败: {e}")
+            time.sleep(self.probe_interval)
+
+    def ensure_probing(self):
+        """在当前进程中启动后台探测线程；fork出的子进程不继承父进程的线程，首次分配时各自启动"""
+        if self._probe_pid == os.getpid():
+            return
+        self._probe_pid = os.getpid()
+        self._probe_thread = threading.Thread(target=self._probe_loop, name="llm-balancer-probe", daemon=True)
+        self._probe_thread.start()
+
+    def mean_latency(self):
+        """健康后端单位耗时EWMA的均值，供supervisor按实际流量的延迟扩缩容；尚无样本或没有健康后端时返回None"""
+        with self._lock:
+            known = [self._get(i, LATENCY) for i in range(len(self.urls))
+                     if self._get(i, HEALTHY) and self._get(i, LATENCY) > 0]
+        return sum(known) / len(known) if known else None
+
+    def snapshot(self):
+        with self._lock:
+            return [{'url': url, 'healthy': bool(self._get(i, HEALTHY)), 'inflight': self.limiters[i].inflight(),
+                     'limit': self.limiters[i].snapshot()['limit'], 'latency': self._get(i, LATENCY),
+                     'failures': int(self._get(i, FAILURES)), 'requests': int(self._get(i, REQUESTS))}
+                    for i, url in enumerate(self.urls)]
+
+
+# 在模块导入时创建，supervisor预加载后fork的worker共享；未配置QWEN_BACKEND_HOSTS时为None
+QWEN_BALANCER = LLMBalancer.from_config()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if QWEN_BALANCER is None:
+        print("未配置 QWEN_BACKEND_HOSTS")
+        sys.exit(1)
+    QWEN_BALANCER.probe()
+    for backend in QWEN_BALANCER.snapshot():
+        print(f"{'✓' if backend['healthy'] else '✗'} {backend['url']}")
@@ -8,15 +8,32 @@ logger = logging.getLogger(__name__)
 
 add_path = str(Path(__file__).parent.parent)
 sys.path.append(add_path)
-os.chdir(add_path)
 
 from configs.config import mongo_url
-from pymongo import MongoClient
-import sys
+import threading
 import argparse
 import json
 
-client = MongoClient(mongo_url)
+# MongoClient在首次使用时创建，导入本模块不建立连接
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from pymongo import MongoClient
+                _client = MongoClient(mongo_url)
+    return _client
+
+
+def __getattr__(name):
+    """兼容原有的模块级 client 访问方式"""
+    if name == 'client':
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def search_company_data(company,key_word):
     """
@@ -29,7 +46,7 @@ def search_company_data(company,key_word):
     """
     try:
         # 连接MongoDB
-        db = client["OmniDataCrafter"]
+        db = get_client()["OmniDataCrafter"]
         collection = db["company"]
         # 构建查询条件
         query = {
@@ -62,7 +79,7 @@ def upsert_data(collection_name, source_id, new_data):
                object_id: 文档的ObjectId
     """
     try:
-        db = client['OmniDataCrafter']  
+        db = get_client()['OmniDataCrafter']  
         collection = db[collection_name]
         
         # 定义查询条件
@@ -101,7 +118,7 @@ def insert_data(collection_name, data):
         data: 要插入的数据，字典格式或字典列表格式
     """
     try:
-        db = client['OmniDataCrafter']  
+        db = get_client()['OmniDataCrafter']  
         collection = db[collection_name]
         # 判断data是否为列表
         if isinstance(data, list):
@@ -129,4 +146,81 @@ def insert_data(collection_name, data):
         pass
 
 
+def find_company_data_batch(companies, key_word="company_name", batch_size=1000):
+    """
+    按字段值批量查询公司数据，每批一次 $in 查询
+    Args:
+        companies (list): 待查询的字段值列表
+        key_word (str): 查询字段
+        batch_size (int): 每次 $in 查询的最大值个数
+    Returns:
+        dict: {字段值: [文档, ...]}，未查到的值对应空列表
+    """
+    companies = list(dict.fromkeys(companies))
+    results = {company: [] for company in companies}
+    try:
+        collection = get_client()["OmniDataCrafter"]["company"]
+        for start in range(0, len(companies), batch_size):
+            batch = companies[start:start + batch_size]
+            for document in collection.find({key_word: {"$in": batch}}):
+                value = document.get(key_word)
+                if value in results:
+                    results[value].append(document)
+    except Exception as e:
+        logger.error(f"批量查询过程中发生错误: {e}")
+    return results
+
+
+def bulk_write_data(collection_name, operations):
+    """
+    批量写入MongoDB，无序执行，单条失败不影响其余操作
+    Args:
+        collection_name (str): MongoDB集合名称
+        operations (list): InsertOne / UpdateOne 等写操作列表
+    Returns:
+        dict: {inserted, upserted, modified, matched, errors}
+              errors 为失败操作列表，每项包含 index（operations中的下标）、code、errmsg
+    """
+    from pymongo.errors import BulkWriteError
+    summary = {"inserted": 0, "upserted": 0, "modified": 0, "matched": 0, "errors": []}
+    if not operations:
+        return summary
+    try:
+        collection = get_client()['OmniDataCrafter'][collection_name]
+        result = collection.bulk_write(operations, ordered=False)
+        summary.update(inserted=result.inserted_count, upserted=result.upserted_count,
+                       modified=result.modified_count, matched=result.matched_count)
+    except BulkWriteError as e:
+        details = e.details
+        summary.update(inserted=details.get("nInserted", 0), upserted=details.get("nUpserted", 0),
+                       modified=details.get("nModified", 0), matched=details.get("nMatched", 0))
+        summary["errors"] = [{"index": error.get("index"), "code": error.get("code"), "errmsg": error.get("errmsg")}
+                             for error in details.get("writeErrors", [])]
+        for error in summary["errors"]:
+            logger.error(f"批量写入第 {error['index']} 条失败 (code={error['code']}): {error['errmsg']}")
+    except Exception as e:
+        logger.error(f"批量写入出错: {e}")
+        summary["errors"] = [{"index": index, "code": None, "errmsg": str(e)} for index in range(len(operations))]
+    return summary
+
+
+def ensure_unique_index(collection_name, keys):
+    """
+    创建唯一索引（已存在时不重复创建），供并发upsert去重
+    Args:
+        collection_name (str): MongoDB集合名称
+        keys (list): 索引字段列表
+    Returns:
+        bool: 索引是否可用；已有重复数据导致创建失败时返回False
+    """
+    from pymongo.errors import OperationFailure
+    try:
+        collection = get_client()['OmniDataCrafter'][collection_name]
+        collection.create_index([(key, 1) for key in keys], unique=True, name="uniq_" + "_".join(keys))
+        return True
+    except OperationFailure as e:
+        logger.error(f"创建唯一索引 {collection_name}{keys} 失败，需先清理重复数据: {e}")
+        return False
+
+
 # print(search_company_data("中煤能源","company_name"))
\ No newline at end of file
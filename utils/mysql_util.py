@@ -1,34 +1,77 @@
 # -*- coding: UTF-8 -*-
 
+import threading
 from sqlalchemy import Table, create_engine, MetaData
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
 import pymysql
 import pandas as pd
 
 
-engine = create_engine('mysql+pymysql://{0}:{1}@{2}:{3}/{4}?charset=utf8&autocommit=true'.format(
-    'wind_admin',
-    'ELPWN2YJRXBCQKYd',
-    '10.100.0.28',
-    3306,
-    "winddb"
-),
-    pool_pre_ping=True,
-    pool_recycle=1200,
-    connect_args={'connect_timeout': 30, "read_timeout": 30}
-)
-
-
-Base = declarative_base()
-DBSession = scoped_session(sessionmaker(bind=engine))
-metadata = MetaData()
-session = DBSession()
-
-class AShareDescription(Base):
-    __table__ = Table('ASHAREDESCRIPTION', metadata,  autoload_with=engine)
-
-class AShareAnnColumn(Base):
-    __table__ = Table('ASHAREANNCOLUMN', metadata,  autoload_with=engine)
+# engine、session 及反射的Wind表在首次使用时创建，导入本模块不连接数据库
+_engine = None
+_session = None
+_tables = {}
+_init_lock = threading.Lock()
+
+
+def get_engine():
+    """winddb连接池，进程内首次调用时创建"""
+    global _engine
+    if _engine is None:
+        with _init_lock:
+            if _engine is None:
+                _engine = create_engine('mysql+pymysql://{0}:{1}@{2}:{3}/{4}?charset=utf8&autocommit=true'.format(
+                    'wind_admin',
+                    'ELPWN2YJRXBCQKYd',
+                    '10.100.0.28',
+                    3306,
+                    "winddb"
+                ),
+                    pool_pre_ping=True,
+                    pool_recycle=1200,
+                    connect_args={'connect_timeout': 30, "read_timeout": 30}
+                )
+    return _engine
+
+
+def get_session():
+    global _session
+    if _session is None:
+        engine = get_engine()
+        with _init_lock:
+            if _session is None:
+                _session = scoped_session(sessionmaker(bind=engine))()
+    return _session
+
+
+def get_tables():
+    """首次调用时反射 ASHAREDESCRIPTION、ASHAREANNCOLUMN 两张表"""
+    if not _tables:
+        engine = get_engine()
+        with _init_lock:
+            if not _tables:
+                Base = declarative_base()
+                metadata = MetaData()
+
+                class AShareDescription(Base):
+                    __table__ = Table('ASHAREDESCRIPTION', metadata, autoload_with=engine)
+
+                class AShareAnnColumn(Base):
+                    __table__ = Table('ASHAREANNCOLUMN', metadata, autoload_with=engine)
+
+                _tables.update(AShareDescription=AShareDescription, AShareAnnColumn=AShareAnnColumn)
+    return _tables
+
+
+def __getattr__(name):
+    """兼容原有的模块级 engine / session / 表类访问方式"""
+    if name == 'engine':
+        return get_engine()
+    if name == 'session':
+        return get_session()
+    if name in ('AShareDescription', 'AShareAnnColumn'):
+        return get_tables()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 company_name_dict = {}
@@ -38,6 +81,8 @@ def get_company_name(s_info_windcode):
     if company_info:
         return company_info
     else:
+        session = get_session()
+        AShareDescription = get_tables()['AShareDescription']
         try:
             std_data = session.query(AShareDescription.S_INFO_NAME,AShareDescription.S_INFO_COMPNAME).filter(AShareDescription.S_INFO_WINDCODE == s_info_windcode).first()
             if std_data:
@@ -56,6 +101,8 @@ def get_type_name(n_info_fcode):
         if type_name:
             return type_name
         else:
+            session = get_session()
+            AShareAnnColumn = get_tables()['AShareAnnColumn']
             try:
                 std_data = session.query(AShareAnnColumn.N_INFO_NAME).filter(AShareAnnColumn.N_INFO_FCODE == n_info_fcode).first()
                 if std_data:
@@ -66,7 +113,8 @@ def get_type_name(n_info_fcode):
             except Exception as e:
                 print(e)
                 session.rollback()
-    session.bind.dispose()
+    if _engine is not None:
+        _engine.dispose()
 
 
 def chinascope_search(sql):
@@ -96,19 +144,16 @@ def chinascope_search(sql):
         cursor.close()
         conn.close()
 
-def wind_search(sql):
-    # 建立数据库连接
-    conn = pymysql.connect(
-        host='10.100.0.28',
-        port=3306,
-        user='wind_admin', 
-        password='ELPWN2YJRXBCQKYd',
-        database='winddb'
-    )
-
+def wind_search(sql, params=None):
+    """
+    在winddb上执行查询，连接取自engine的连接池，进程内复用
+    params不为空时以参数化方式执行，sql中使用 %s 占位
+    """
+    conn = get_engine().raw_connection()
+    cursor = None
     try:
         cursor = conn.cursor()
-        cursor.execute(sql)
+        cursor.execute(sql, params)
         # 获取所有数据
         data = cursor.fetchall()
         # 获取列名
@@ -119,8 +164,9 @@ def wind_search(sql):
     except Exception as e:
         print(f'发生错误: {e}')
     finally:
-        # 关闭游标和连接
-        cursor.close()
+        # 关闭游标，连接归还连接池
+        if cursor is not None:
+            cursor.close()
         conn.close()
 
 # if __name__ == '__main__':
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+nGQL模板查询结果缓存
+- 以 (模板名, 实体VID, 报告期) 为键缓存查询结果；报告期可为rank或 'latest'（值中同时保存解析出的最新报告期）
+- Redis不可用时读取视为未命中、写入跳过，调用方回退为直接执行查询
+- 每个VID维护一个代数计数器并拼入缓存键，图谱写入该公司数据后计数器加一，旧结果自然失效并由TTL回收
+"""
+
+import os
+import sys
+import json
+import logging
+from typing import Any, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import NGQL_CACHE_PREFIX, NGQL_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class NGQLResultCache:
+    """基于Redis的模板查询结果缓存"""
+
+    def __init__(self, redis_client=None, prefix: str = NGQL_CACHE_PREFIX, ttl: int = NGQL_CACHE_TTL):
+        if redis_client is None:
+            from utils.redis_cache import redis_connection
+            redis_client = redis_connection
+        self.redis = redis_client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _generation_key(self, vid: str) -> str:
+        return f"{self.prefix}gen:{vid}"
+
+    def _result_key(self, template: str, vid: str, period: Any, generation: int) -> str:
+        return f"{self.prefix}result:{template}:{vid}:{period}:{generation}"
+
+    def generation(self, vid: str) -> Optional[int]:
+        """读取VID的代数，Redis不可用时返回None"""
+        try:
+            return int(self.redis.get(self._generation_key(vid)) or 0)
+        except Exception as e:
+            logger.warning(f"读取nGQL缓存代数失败: {e}")
+            return None
+
+    def get(self, template: str, vid: str, period: Any) -> Optional[Any]:
+        """读取缓存结果，未命中或Redis不可用时返回None"""
+        generation = self.generation(vid)
+        if generation is None:
+            return None
+        try:
+            cached = self.redis.get(self._result_key(template, vid, period, generation))
+        except Exception as e:
+            logger.warning(f"读取nGQL缓存失败: {e}")
+            return None
+        return json.loads(cached) if cached is not None else None
+
+    def set(self, template: str, vid: str, period: Any, rows: Any, generation: int = None):
+        """
+        写入缓存结果
+
+        Args:
+            generation: 执行查询前读取的代数；查询期间发生写入时结果会写到旧代数的键上，不会被后续读取命中
+        """
+        if generation is None:
+            generation = self.generation(vid)
+            if generation is None:
+                return
+        try:
+            self.redis.set(self._result_key(template, vid, period, generation),
+                           json.dumps(rows, ensure_ascii=False), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"写入nGQL缓存失败: {e}")
+
+    def invalidate(self, vid: str):
+        """图谱中该VID相关数据写入后调用，使其全部缓存结果失效"""
+        try:
+            self.redis.incr(self._generation_key(vid))
+        except Exception as e:
+            logger.warning(f"nGQL缓存失效失败: {vid}: {e}")
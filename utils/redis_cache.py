@@ -1,5 +1,6 @@
 import json
 import random
+import socket
 import redis
 from typing import Dict, Any
 import sys
@@ -27,6 +28,10 @@ def insert_dicts(batch_datas: list) -> None:
     pipe.execute()
     print(f"[insert] 已写入 {len(batch_datas)} 条字典并推入队列 {REDIS_PENDING_KEY}")
 
+def lease_owner() -> str:
+    """当前进程的租约标识：主机名:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
 def fetch_one() -> Dict[str, Any]:
     """
     原子地：
@@ -35,6 +40,7 @@ def fetch_one() -> Dict[str, Any]:
     3. 根据 uid 读取 Hash 并返回字典。
     如果pending为空，返回空字典。
     如果Hash数据不存在，从processing移除uid，重新获取。
+    领取成功后在租约Hash中记录 uid → 当前进程，进程异常退出时由 release_leases 归还。
     """
     while True:
         uid = redis_connection.brpoplpush(REDIS_MISS_DATA_KEY, REDIS_PROCESSING_KEY, timeout=2) #REDIS_MISS_DATA_KEY
@@ -42,6 +48,7 @@ def fetch_one() -> Dict[str, Any]:
             return {}
         data = redis_connection.hgetall(REDIS_DATA_KEY_PREFIX + uid)
         if data:  # Hash数据存在
+            redis_connection.hset(REDIS_LEASE_KEY, uid, lease_owner())
             data["uid"] = uid          # 带上 uid，方便后续删除
             return data
         else:  # Hash数据不存在（已被删除），从processing移除，继续尝试下一个
@@ -52,6 +59,7 @@ def ack(uid: str) -> None:
     pipe = redis_connection.pipeline(transaction=True)
     pipe.lrem(REDIS_PROCESSING_KEY, 1, uid)
     pipe.delete(REDIS_DATA_KEY_PREFIX + uid)
+    pipe.hdel(REDIS_LEASE_KEY, uid)
     pipe.execute()
     print(f"[ack] 已确认删除 uid={uid}")
 
@@ -68,14 +76,31 @@ def rollback_unprocessed() -> None:
             break
         redis_connection.lpush(REDIS_MISS_DATA_KEY, uid)# REDIS_MISS_DATA_KEY     REDIS_PENDING_KEY
         count += 1
+    redis_connection.delete(REDIS_LEASE_KEY)
     print(f"[rollback] 已把 {count} 个未处理完的 uid 回滚到 pending")
 
 def failed_rollback(uid):
     """
     失败回滚：处理失败，把 uid 从 processing 移回 pending，稍后重试
     """
-    redis_connection.lrem(REDIS_PROCESSING_KEY, 1, uid)
-    redis_connection.lpush(REDIS_MISS_DATA_KEY, uid)
+    pipe = redis_connection.pipeline(transaction=True)
+    pipe.lrem(REDIS_PROCESSING_KEY, 1, uid)
+    pipe.lpush(REDIS_MISS_DATA_KEY, uid)
+    pipe.hdel(REDIS_LEASE_KEY, uid)
+    pipe.execute()
+
+def release_leases(owner: str) -> int:
+    """把指定进程领取后未确认的 uid 全部回滚到 pending，返回回滚数量"""
+    uids = [uid for uid, lease in redis_connection.hgetall(REDIS_LEASE_KEY).items() if lease == owner]
+    for uid in uids:
+        failed_rollback(uid)
+    if uids:
+        print(f"[release] 已把 {owner} 领取的 {len(uids)} 个 uid 回滚到 pending")
+    return len(uids)
+
+def queue_depth() -> int:
+    """待处理队列长度，与fetch_one消费的队列一致"""
+    return redis_connection.llen(REDIS_MISS_DATA_KEY)
 
 # 公告PDF解析有问题，此部分先放到REDIS_MISS_DATA_KEY队列中去，待正确解析后，再从REDIS_MISS_DATA_KEY队列中移回REDIS_PENDING_KEY队列中
 # count = 0
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+年报章节标签
+- 标签由 data/report.xlsx（章节名、披露要求两列）拼接生成，预先构建为 data/report_labels.json
+- worker启动时只读取JSON，不再解析Excel；JSON缺失时才从Excel构建，Excel修改后需手动重新生成
+
+用法：
+    python utils/report_labels.py      # Excel更新后重新生成JSON
+"""
+
+import os
+import sys
+import json
+import logging
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import REPORT_LABELS_XLSX, REPORT_LABELS_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def build_report_labels(xlsx_path=REPORT_LABELS_XLSX, output_path=REPORT_LABELS_PATH):
+    """解析Excel生成标签列表并写入JSON"""
+    import pandas as pd
+    rows = pd.read_excel(xlsx_path, engine='openpyxl').fillna('').values.tolist()
+    labels = [row[0] + ' ' + row[1] for row in rows]
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(labels, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_path)
+    return labels
+
+
+def load_report_labels(output_path=REPORT_LABELS_PATH, xlsx_path=REPORT_LABELS_XLSX):
+    """读取预构建的标签JSON，缺失时从Excel构建"""
+    if not os.path.exists(output_path):
+        logger.info(f"章节标签JSON不存在，从Excel构建: {xlsx_path}")
+        return build_report_labels(xlsx_path, output_path)
+    with open(output_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    labels = build_report_labels()
+    print(f"已生成 {len(labels)} 个章节标签: {REPORT_LABELS_PATH}")
@@ -6,27 +6,23 @@ Markdown文档按二级、三级标题拆分工具
 
 import re
 import os
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable, Iterator
 
 def read_markdown_file(file_path: str) -> str:
     """读取markdown文件内容"""
     with open(file_path, 'r', encoding='utf-8') as f:
         return f.read()
 
-def split_by_headers(content: str) -> List[Dict[str, str]]:
+def iter_sections(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
     """
-    按照二级和三级标题拆分markdown内容
-    
+    按照二级和三级标题逐节拆分markdown内容，每遇到下一个标题即产出上一节
+
     Args:
-        content: markdown文件内容
-        
-    Returns:
-        List[Dict]: 包含标题和内容的字典列表
+        lines: markdown文本行（不含换行符），可以是边下载边解码的行迭代器
+
+    Yields:
+        Dict: 包含标题级别、标题和内容的字典
     """
-    # 分割线，用于按行处理
-    lines = content.split('\n')
-    
-    sections = []
     current_section = {
         'level': 0,
         'title': '',
@@ -34,38 +30,19 @@ def split_by_headers(content: str) -> List[Dict[str, str]]:
     }
 
     for line in lines:
-        # 检查是否是二级标题
-        if line.startswith('## '):
-            # 如果当前有内容，保存当前节
-            if current_section['content'] or current_section['title']:
-                if current_section['title'] or any(current_section['content']):
-                    sections.append({
-                        'level': current_section['level'],
-                        'title': current_section['title'],
-                        'content': '\n'.join(current_section['content']).strip()
-                    })
-            
-            # 开始新的二级标题节
-            current_section = {
-                'level': 2,
-                'title': line,
-                'content': []
-            }
-        
-        # 检查是否是三级标题
-        elif line.startswith('### '):
-            # 如果当前有内容，保存当前节
-            if current_section['content'] or current_section['title']:
-                if current_section['title'] or any(current_section['content']):
-                    sections.append({
-                        'level': current_section['level'],
-                        'title': current_section['title'],
-                        'content': '\n'.join(current_section['content']).strip()
-                    })
+        # 检查是否是二级或三级标题
+        if line.startswith('## ') or line.startswith('### '):
+            # 如果当前有内容，产出当前节
+            if current_section['title'] or any(current_section['content']):
+                yield {
+                    'level': current_section['level'],
+                    'title': current_section['title'],
+                    'content': '\n'.join(current_section['content']).strip()
+                }
             
-            # 开始新的三级标题节
+            # 开始新的二级/三级标题节
             current_section = {
-                'level': 3,
+                'level': 2 if line.startswith('## ') else 3,
                 'title': line,
                 'content': []
             }
@@ -74,15 +51,26 @@ def split_by_headers(content: str) -> List[Dict[str, str]]:
             # 将内容行添加到当前节
             current_section['content'].append(line)
     
-    # 添加最后一节
+    # 产出最后一节
     if current_section['title'] or any(current_section['content']):
-        sections.append({
+        yield {
             'level': current_section['level'],
             'title': current_section['title'],
             'content': '\n'.join(current_section['content']).strip()
-        })
+        }
+
+def split_by_headers(content: str) -> List[Dict[str, str]]:
+    """
+    按照二级和三级标题拆分markdown内容
     
-    return sections
+    Args:
+        content: markdown文件内容
+        
+    Returns:
+        List[Dict]: 包含标题和内容的字典列表
+    """
+    # 分割线，用于按行处理
+    return list(iter_sections(content.split('\n')))
 
 
 # def main():
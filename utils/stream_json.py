@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式JSON增量解析工具
+逐段消费模型流式输出的JSON文本，在顶层字段值、顶层数组元素闭合时立即解析并产出事件，
+用于在生成尚未结束时提前写入图数据库
+"""
+
+import json
+import logging
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 事件类型：顶层字段值解析完成 / 顶层数组中的一个元素解析完成
+FIELD_EVENT = "field"
+ITEM_EVENT = "item"
+
+
+class IncrementalJSONParser:
+    """
+    顶层为对象的JSON增量解析器
+
+    只跟踪两层结构：顶层对象的字段值（深度1），以及顶层数组字段中的元素（深度2）。
+    每个值闭合时对其文本片段单独json.loads，已解析的部分不会重复扫描。
+    已接收的文本按片段保存，不拼接成整串，逐段追加时不会反复复制整个文档；
+    位置均为从流开始计的绝对下标，每次feed后丢弃最早未闭合的值或字段名之前的片段。
+    """
+
+    def __init__(self):
+        # 保留的文本片段及各片段首字符的绝对下标
+        self._parts: List[str] = []
+        self._part_starts: List[int] = []
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._after_colon = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        # 深度 -> 当前值的起始位置
+        self._value_starts = {}
+        self.done = False
+
+    @property
+    def received(self) -> int:
+        """已接收的字符数"""
+        return self._pos
+
+    def _slice(self, start: int, end: int) -> str:
+        """取绝对下标 [start, end) 的文本，只拼接覆盖该区间的片段"""
+        first = bisect_right(self._part_starts, start) - 1
+        last = bisect_right(self._part_starts, end - 1)
+        text = "".join(self._parts[first:last])
+        base = self._part_starts[first]
+        return text[start - base:end - base]
+
+    def _char_at(self, pos: int) -> str:
+        part = bisect_right(self._part_starts, pos) - 1
+        return self._parts[part][pos - self._part_starts[part]]
+
+    def _is_value_position(self, ch: str) -> bool:
+        """判断当前字符是否开始一个需要跟踪的值"""
+        if ch in ',:]}':
+            return False
+        depth = len(self._stack)
+        if depth == 1:
+            return self._after_colon and 1 not in self._value_starts
+        if depth == 2:
+            return self._stack[1] == '[' and 2 not in self._value_starts
+        return False
+
+    def _finish_value(self, depth: int, end: int) -> Tuple[str, Optional[str], Any]:
+        """解析深度为depth的值并生成事件"""
+        start = self._value_starts.pop(depth)
+        value = json.loads(self._slice(start, end))
+        return (FIELD_EVENT if depth == 1 else ITEM_EVENT, self._key, value)
+
+    def _finish_scalar(self, depth: int, end: int, events: list):
+        """数字、布尔、null等裸值在遇到分隔符时结束"""
+        start = self._value_starts.get(depth)
+        if start is not None and self._char_at(start) not in '{["':
+            events.append(self._finish_value(depth, end))
+
+    def feed(self, chunk: str) -> List[Tuple[str, Optional[str], Any]]:
+        """
+        输入一段文本，返回本段内闭合的值事件
+
+        Returns:
+            List[Tuple]: (事件类型, 顶层字段名, 解析后的值)
+        """
+        events = []
+        base = self._pos
+        self._parts.append(chunk)
+        self._part_starts.append(base)
+        for index, ch in enumerate(chunk, base):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    depth = len(self._stack)
+                    if self._key_start is not None:
+                        self._key = json.loads(self._slice(self._key_start, index + 1))
+                        self._key_start = None
+                    elif self._value_starts.get(depth) is not None and self._char_at(self._value_starts[depth]) == '"':
+                        events.append(self._finish_value(depth, index + 1))
+                continue
+
+            if ch.isspace():
+                continue
+            depth = len(self._stack)
+            if self._is_value_position(ch):
+                self._value_starts[depth] = index
+
+            if ch == '"':
+                self._in_string = True
+                if depth == 1 and not self._after_colon:
+                    self._key_start = index
+            elif ch in '{[':
+                self._stack.append(ch)
+            elif ch in '}]':
+                self._finish_scalar(depth, index, events)
+                self._stack.pop()
+                depth = len(self._stack)
+                if self._value_starts.get(depth) is not None:
+                    events.append(self._finish_value(depth, index + 1))
+                if not self._stack:
+                    self.done = True
+            elif ch == ':':
+                if depth == 1:
+                    self._after_colon = True
+            elif ch == ',':
+                self._finish_scalar(depth, index, events)
+                if depth == 1:
+                    self._after_colon = False
+        self._pos = base + len(chunk)
+        self._trim()
+        return events
+
+    def _trim(self):
+        """丢弃已不再需要的片段：只保留包含最早未闭合的值或字段名起点及其之后的片段"""
+        starts = [start for start in self._value_starts.values() if start is not None]
+        if self._key_start is not None:
+            starts.append(self._key_start)
+        if not starts:
+            self._parts.clear()
+            self._part_starts.clear()
+            return
+        cut = bisect_right(self._part_starts, min(starts)) - 1
+        if cut > 0:
+            del self._parts[:cut]
+            del self._part_starts[:cut]
+
+
+def iter_json_events(chunks: Iterable[str]) -> Iterator[Tuple[str, Optional[str], Any]]:
+    """
+    逐段解析流式JSON文本并产出事件
+
+    Args:
+        chunks: 模型流式输出的文本片段
+
+    Yields:
+        Tuple: (事件类型, 顶层字段名, 解析后的值)
+    """
+    parser = IncrementalJSONParser()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        for event in parser.feed(chunk):
+            yield event
+    if not parser.done:
+        raise ValueError(f"流式输出的JSON不完整，已接收 {parser.received} 个字符")
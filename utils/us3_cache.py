@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+US3下载缓存与预取工具
+- US3DiskCache：按 US3 key + ETag 缓存到本地磁盘，总大小超限时按最近使用时间淘汰
+- US3Prefetcher：提前从任务队列领取后续K个任务并发下载，处理时只读本地文件
+"""
+
+import os
+import fcntl
+import shutil
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, Tuple
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs.config import US3_CACHE_DIR, US3_CACHE_MAX_BYTES, US3_PREFETCH_LOOKAHEAD, US3_PREFETCH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class US3DiskCache:
+    """
+    US3对象本地磁盘LRU缓存
+
+    每个对象存放在 {cache_dir}/{md5(key:etag)}/{文件名}，对象更新后ETag变化会自动重新下载。
+    下载先写临时文件再重命名，多个进程共享同一缓存目录时不会读到不完整的文件。
+    get 返回前对条目目录下的 .lock 加共享flock，release 时释放；淘汰时对条目加非阻塞排他锁，
+    任一进程仍在使用的条目都不会被删除。命中时刷新修改时间，刚被使用的条目最后被淘汰。
+    缓存总大小记录在 {cache_dir}/.usage 中，下载时累加，超过上限才扫描目录淘汰，扫描后按实际占用校正。
+    """
+
+    LOCK_NAME = ".lock"
+    USAGE_NAME = ".usage"
+    EVICT_LOCK_NAME = ".evict.lock"
+
+    def __init__(self, us3_client, cache_dir: str = US3_CACHE_DIR, max_bytes: int = US3_CACHE_MAX_BYTES):
+        self.us3_client = us3_client
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        # 本进程持有的条目锁文件 {条目目录: [fd, ...]}，每次get占用一个
+        self._pins: Dict[str, list] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0, 'scans': 0}
+
+    def _entry_dir(self, key: str, etag: Optional[str]) -> str:
+        digest = hashlib.md5(f"{key}:{etag or ''}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest)
+
+    def _key_lock(self, entry_dir: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(entry_dir, threading.Lock())
+
+    def _pin(self, entry_dir: str):
+        """创建条目目录并加共享锁；加锁期间条目被其他进程淘汰时重新创建"""
+        lock_path = os.path.join(entry_dir, self.LOCK_NAME)
+        while True:
+            os.makedirs(entry_dir, exist_ok=True)
+            try:
+                fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            except FileNotFoundError:
+                continue
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                # 锁文件仍是目录中的那一个，说明加锁前条目没有被删除
+                if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+        with self._lock:
+            self._pins.setdefault(entry_dir, []).append(fd)
+
+    def _unpin(self, entry_dir: str):
+        with self._lock:
+            fds = self._pins.get(entry_dir)
+            fd = fds.pop() if fds else None
+            if not fds:
+                self._pins.pop(entry_dir, None)
+                self._key_locks.pop(entry_dir, None)
+        if fd is not None:
+            os.close(fd)
+
+    def get(self, key: str) -> str:
+        """
+        获取对象的本地路径，未命中时下载；返回的路径在调用 release 之前不会被任何进程淘汰
+
+        Args:
+            key: US3对象key
+
+        Returns:
+            str: 本地文件路径
+        """
+        etag = self.us3_client.head_file(key)
+        entry_dir = self._entry_dir(key, etag)
+        local_path = os.path.join(entry_dir, os.path.basename(key))
+        self._pin(entry_dir)
+        try:
+            with self._key_lock(entry_dir):
+                if os.path.exists(local_path):
+                    os.utime(local_path)
+                    self.stats['hits'] += 1
+                    return local_path
+
+                status_code = self.us3_client.download_file_atomic(key, local_path)
+                if status_code != 200:
+                    raise IOError(f"下载US3文件失败: {key} (status_code={status_code})")
+                self.stats['misses'] += 1
+            total_bytes = self._add_usage(os.path.getsize(local_path))
+            if total_bytes is None or total_bytes > self.max_bytes:
+                self.evict()
+            return local_path
+        except Exception:
+            self._unpin(entry_dir)
+            raise
+
+    def release(self, local_path: str):
+        """释放 get 返回的本地文件，之后可被淘汰"""
+        self._unpin(os.path.dirname(local_path))
+
+    def _update_usage(self, update):
+        """在排他锁下读写 .usage 中记录的总字节数，update(旧值或None) 返回新值"""
+        fd = os.open(os.path.join(self.cache_dir, self.USAGE_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            content = os.read(fd, 64).strip()
+            total_bytes = update(int(content) if content.isdigit() else None)
+            if total_bytes is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, str(total_bytes).encode())
+            return total_bytes
+        finally:
+            os.close(fd)
+
+    def _add_usage(self, delta: int) -> Optional[int]:
+        """累加下载的字节数，返回新的总大小；尚无记录时返回None，由调用方扫描校正"""
+        return self._update_usage(lambda total: None if total is None else total + delta)
+
+    def _scan_entries(self):
+        """扫描缓存目录，返回 [(最近使用时间, 大小, 条目目录)]"""
+        self.stats['scans'] += 1
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            try:
+                size, mtime = 0, 0.0
+                for file_name in os.listdir(entry_dir):
+                    if file_name == self.LOCK_NAME:
+                        continue
+                    stat = os.stat(os.path.join(entry_dir, file_name))
+                    size += stat.st_size
+                    mtime = max(mtime, stat.st_mtime)
+            except (FileNotFoundError, NotADirectoryError):
+                # 条目已被其他进程删除，或不是缓存条目（.usage 等）
+                continue
+            entries.append((mtime, size, entry_dir))
+        return entries
+
+    def _remove_unpinned(self, entry_dir: str) -> bool:
+        """对条目加非阻塞排他锁后删除，任一进程持有共享锁时跳过"""
+        try:
+            fd = os.open(os.path.join(entry_dir, self.LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        try:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        finally:
+            os.close(fd)
+        return True
+
+    def evict(self):
+        """扫描缓存目录，总大小超过上限时从最久未使用的条目开始删除，并校正 .usage；其他进程正在淘汰时跳过"""
+        evict_fd = os.open(os.path.join(self.cache_dir, self.EVICT_LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(evict_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            entries = self._scan_entries()
+            total_bytes = sum(size for _, size, _ in entries)
+            if total_bytes > self.max_bytes:
+                entries.sort()
+                for _, size, entry_dir in entries:
+                    if total_bytes <= self.max_bytes:
+                        break
+                    if self._remove_unpinned(entry_dir):
+                        total_bytes -= size
+                        self.stats['evicted'] += 1
+                logger.info(f"US3缓存淘汰完成，当前占用 {total_bytes / 1024 / 1024:.1f} MB (上限 {self.max_bytes / 1024 / 1024:.1f} MB)")
+            # 扫描期间其他进程新下载的文件在下次扫描时计入
+            self._update_usage(lambda _: total_bytes)
+        finally:
+            os.close(evict_fd)
+
+
+class US3Prefetcher:
+    """
+    任务预取器
+
+    从任务队列领取后续的 lookahead 个任务，并发下载到 US3DiskCache；
+    已领取但未处理的任务在 close 时通过 on_release 归还队列。
+    """
+
+    def __init__(self, cache: US3DiskCache, fetch_fn: Callable[[], Dict[str, Any]],
+                 on_release: Callable[[Dict[str, Any]], None] = None,
+                 key_fn: Callable[[Dict[str, Any]], str] = lambda data: data["use_path"],
+                 lookahead: int = US3_PREFETCH_LOOKAHEAD, max_workers: int = US3_PREFETCH_WORKERS):
+        self.cache = cache
+        self.fetch_fn = fetch_fn
+        self.on_release = on_release
+        self.key_fn = key_fn
+        self.lookahead = lookahead
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._buffer = deque()
+
+    def _fill(self):
+        """补足预取窗口，队列为空时停止领取"""
+        while len(self._buffer) < self.lookahead:
+            data = self.fetch_fn()
+            if not data:
+                break
+            future = self._executor.submit(self.cache.get, self.key_fn(data))
+            self._buffer.append((data, future))
+
+    def next(self) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        取出下一个任务及其本地文件路径
+
+        Returns:
+            Tuple: (任务数据, 本地路径)；队列为空时任务数据为空字典，下载失败时本地路径为None
+        """
+        if not self._buffer:
+            self._fill()
+        if not self._buffer:
+            return {}, None
+
+        data, future = self._buffer.popleft()
+        # 在等待当前任务时继续预取后续任务
+        self._fill()
+        try:
+            return data, future.result()
+        except Exception as e:
+            logger.error(f"预取下载失败: {self.key_fn(data)}: {e}")
+            return data, None
+
+    def close(self):
+        """归还已领取但未处理的任务，并释放已下载的缓存条目"""
+        while self._buffer:
+            data, future = self._buffer.popleft()
+            future.cancel()
+            if not future.cancelled():
+                try:
+                    self.cache.release(future.result())
+                except Exception:
+                    pass
+            if self.on_release:
+                self.on_release(data)
+        self._executor.shutdown(wait=True)
@@ -2,6 +2,10 @@ from ufile import config, filemanager
 from ufile import multipartuploadufile
 import json
 import io
+import os
+import codecs
+import threading
+import requests
 
 class US3Client(object):
 
@@ -25,6 +29,9 @@ class US3Client(object):
         download_suffix = active_endpoint
         config.set_default(downloadsuffix=download_suffix)
 
+        # 下载域名，用于按域名限制并发
+        self.download_host = self.bucket + download_suffix
+
         self.ufile_handler = filemanager.FileManager(self.public_key, self.private_key, upload_suffix, download_suffix)
         self.multipartuploadufile_handler = multipartuploadufile.MultipartUploadUFile(self.public_key, self.private_key, upload_suffix)
 
@@ -110,6 +117,100 @@ class US3Client(object):
         ret, resp = self.ufile_handler.download_file(self.bucket, key, localfile, isprivate=True)
         return resp.status_code
 
+    def _open_object(self, key, content_range=None, ok_status=(200, 206)):
+        # 以流式响应打开私有空间中的对象，content_range为(起始字节, 结束字节)，两端均包含
+        header = {}
+        if content_range is not None:
+            header['Range'] = 'bytes={0}-{1}'.format(*content_range)
+        url = self.ufile_handler.private_download_url(self.bucket, key, header=header, internal=True)
+        response = requests.get(url, headers=header, stream=True, timeout=config.get_default('connection_timeout'))
+        if response.status_code not in ok_status:
+            response.close()
+            raise IOError(f"读取US3文件失败: {key} (status_code={response.status_code})")
+        return response
+
+    def iter_object(self, key, chunk_size=1024 * 1024, part_size=None):
+        # 流式读取对象内容，逐块返回bytes；指定part_size时按Range分段请求，适用于超大对象
+        if part_size is None:
+            with self._open_object(key) as response:
+                for chunk in response.iter_content(chunk_size):
+                    yield chunk
+            return
+
+        offset = 0
+        while True:
+            received = 0
+            with self._open_object(key, (offset, offset + part_size - 1), ok_status=(200, 206, 416)) as response:
+                # 416：对象大小恰好是part_size的整数倍，已读完
+                if response.status_code == 416:
+                    return
+                for chunk in response.iter_content(chunk_size):
+                    received += len(chunk)
+                    yield chunk
+                # 200：服务端忽略了Range，已返回完整对象
+                if response.status_code == 200:
+                    return
+            offset += received
+            if received < part_size:
+                return
+
+    def read_object(self, key, content_range=None):
+        # 将对象（或其中一段）完整读入内存
+        data = bytearray()
+        with self._open_object(key, content_range) as response:
+            for chunk in response.iter_content(1024 * 1024):
+                data += chunk
+        return bytes(data)
+
+    def read_object_into(self, key, buffer, offset=0):
+        # 从对象的offset处读取数据直接写入预分配的缓冲区（bytearray/memoryview），返回实际读取的字节数
+        view = memoryview(buffer).cast('B')
+        if len(view) == 0:
+            return 0
+        position = 0
+        with self._open_object(key, (offset, offset + len(view) - 1)) as response:
+            if response.status_code == 200 and offset > 0:
+                raise IOError(f"US3服务端未按Range返回数据: {key}")
+            for chunk in response.iter_content(1024 * 1024):
+                size = min(len(chunk), len(view) - position)
+                view[position:position + size] = chunk[:size]
+                position += size
+                if position >= len(view):
+                    break
+        return position
+
+    def iter_object_lines(self, key, encoding='utf-8', part_size=None):
+        # 边下载边按行解码，返回不含换行符的文本行；多字节字符跨块时由增量解码器拼接
+        decoder = codecs.getincrementaldecoder(encoding)()
+        pending = ''
+        for chunk in self.iter_object(key, part_size=part_size):
+            pending += decoder.decode(chunk)
+            lines = pending.split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line
+        pending += decoder.decode(b'', final=True)
+        yield pending
+
+    def head_file(self, key):
+        # 获取文件的ETag，文件不存在或请求失败时返回None
+        ret, resp = self.ufile_handler.head_file(self.bucket, key)
+        if resp.status_code != 200 or not resp.etag:
+            return None
+        return resp.etag.strip('"')
+
+    def download_file_atomic(self, key, localfile):
+        # 先下载到同目录临时文件再重命名，避免其他进程读到下载了一半的文件
+        tmp_file = f"{localfile}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            status_code = self.download_file(key, tmp_file)
+            if status_code == 200:
+                os.replace(tmp_file, localfile)
+            return status_code
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
 # if __name__ == '__main__':
 #     us3_client = US3Client()
 #     us3_client.download_file("md/2025-04-30/windanno_9656dbb1-6c35-5f70-8e66-b0f4c8627c62.md","windanno_9656dbb1-6c35-5f70-8e66-b0f4c8627c62.md")
\ No newline at end of file